@@ -1,19 +1,50 @@
 #!/usr/bin/env python
 # encoding: utf-8
 # pylint: disable=missing-docstring
-from dataclasses import dataclass, field
-from typing import List, Optional, Union
+from dataclasses import dataclass, field, fields
+from typing import Any, List, Optional, Tuple, Union
+from weakref import WeakValueDictionary
 
 from environment import Environment
 
 
+def _slotted(cls=None, *, extra: Tuple[str, ...] = ()):
+    """
+    The dataclass cls, its instances keeping their fields in __slots__
+    instead of a __dict__, as dataclass(slots=True) does from python 3.10
+    on, along with extra, attributes that are not fields. Declared in the
+    class body, __slots__ would clash with the fields for linters.
+    """
+    if cls is None:
+        return lambda cls: _slotted(cls, extra=extra)
+    inherited = {name for base in cls.__mro__[1:]
+                 for name in getattr(base, '__slots__', ())}
+    names = tuple(f.name for f in fields(cls) if f.name not in inherited)
+    namespace = dict(cls.__dict__)
+    # class attributes holding field defaults would shadow the slots;
+    # __init__ keeps its own references to the defaults.
+    for name in names + ('__dict__', '__weakref__'):
+        namespace.pop(name, None)
+    namespace['__slots__'] = names + extra
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
 class Ast:
-    env: Optional[Environment] = None
+    __slots__ = ('env',)
+    env: Optional[Environment]
+
+    def __getattr__(self, name):
+        # env is only set on the asts reached by scope analysis
+        if name == 'env':
+            return None
+        raise AttributeError(
+            f"{type(self).__name__!r} object has no attribute {name!r}")
 
     def __bool__(self):
         return True
 
 
+@_slotted
 @dataclass
 class VarDefine:
     refs: List['VarAst'] = field(default_factory=list)
@@ -26,11 +57,13 @@ class VarDefine:
     current_value: Optional[Ast] = None
 
 
+@_slotted
 @dataclass
 class JsAst(Ast):
     js_code: str
 
 
+@_slotted(extra=('__weakref__',))
 @dataclass
 class LiteralAst(Ast):
     value: Union[float, bool, str]
@@ -39,18 +72,44 @@ class LiteralAst(Ast):
         return self.value is not False
 
 
+_LITERALS: 'WeakValueDictionary[Tuple[type, Any], LiteralAst]' = \
+    WeakValueDictionary()
+
+
+def literal(value: Union[float, bool, str]) -> LiteralAst:
+    """
+    The shared LiteralAst of value. Literals are never mutated, so one
+    instance serves every occurrence of a value while any is alive.
+    :param value:
+    :return:
+    """
+    # True == 1.0 and 0.0 == -0.0, but they are different literals
+    key = (type(value), repr(value) if isinstance(value, float) else value)
+    ast = _LITERALS.get(key)
+    if ast is None:
+        ast = _LITERALS[key] = LiteralAst(value)
+    return ast
+
+
+# extra set by resolver.resolve, cache being the inline cache of a global
+# variable: (global environment, its version, value)
+@_slotted(extra=('depth', 'slot', 'boxed', 'cache'))
 @dataclass
 class VarAst(Ast):
     name: str
     define: Optional[VarDefine] = None
 
 
+# extra set by resolver.resolve
+@_slotted(extra=('slot', 'boxed'))
 @dataclass
 class VarDefAst(Ast):
     name: str
     define: Optional[Ast]
 
 
+# extra set by resolver.resolve
+@_slotted(extra=('captures', 'boxed', 'frame_size'))
 @dataclass
 class LambdaAst(Ast):
     name: str
@@ -60,23 +119,27 @@ class LambdaAst(Ast):
     # never_executed: bool = True
 
 
+@_slotted
 @dataclass
 class LetAst(Ast):
     vardefs: List[VarDefAst]
     body: Ast
 
 
+@_slotted
 @dataclass
 class CallAst(Ast):
     func: Ast
     args: List[Ast]
 
 
+@_slotted
 @dataclass
 class ProgAst(Ast):
     prog: List[Ast]
 
 
+@_slotted
 @dataclass
 class IfAst(Ast):
     cond: Ast
@@ -84,6 +147,9 @@ class IfAst(Ast):
     else_: Ast
 
 
+# extra set by resolver.resolve, site being the quickening.BinarySite of
+# the ast when evaluator.py evaluates it quickened, else None
+@_slotted(extra=('site',))
 @dataclass
 class BinaryAst(Ast):
     operator: str
@@ -91,6 +157,7 @@ class BinaryAst(Ast):
     right: Ast
 
 
+@_slotted
 @dataclass
 class AssignAst(Ast):
     left: Ast
@@ -0,0 +1,465 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Compact binary serialization of asts, for shipping pre-parsed programs.
+
+A stream is a header, any number of trees, a string table and a footer:
+
+    header        b'LAMB', format version as a varint
+    trees         nodes in depth first order, see below
+    string table  varint count, then per string a varint byte length and
+                  its utf-8 bytes
+    footer        offset of the string table from the start of the stream,
+                  8 bytes little endian
+
+Varints are unsigned LEB128: 7 bits per byte, low bits first, the high bit
+set on all bytes but the last. Names, operators, strings and js code are
+varint indexes into the string table, and lists of names are a varint
+count followed by the names. A node is a varint tag followed by its
+fields, then its children:
+
+    tag           fields                children
+    NONE          -                     -, a missing define or else
+    FALSE, TRUE   -                     -
+    STRING        string                -
+    FLOAT         little endian double  -
+    INTEGRAL      varint                -, a float such as 3.0
+    INT           zigzag varint         -, a python int
+    VAR           name
+    JS            js code
+    VARDEF        name                  define
+    LAMBDA        name, params          body
+    IIFE_LAMBDA   name, params, iife_params
+                                        body
+    LET           varint count          vardefs, body
+    CALL          varint count of args  func, args
+    PROG          varint count          expressions
+    IF                                  cond, then, else
+    BINARY        operator              left, right
+    ASSIGN                              left, right
+
+AstReader reads trees from a memoryview of bytes or of an mmap, and
+decodes a string only when a node using it is first built.
+"""
+import gc
+import io
+import math
+import struct
+import sys
+from array import array
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+from ast import (AssignAst, Ast, BinaryAst, CallAst, IfAst, JsAst, LambdaAst,
+                 LetAst, LiteralAst, ProgAst, VarAst, VarDefAst, literal)
+from parse import parse_files
+
+MAGIC = b'LAMB'
+FORMAT_VERSION = 1
+
+NONE = 0
+FALSE = 1
+TRUE = 2
+STRING = 3
+FLOAT = 4
+INTEGRAL = 5
+INT = 6
+VAR = 7
+JS = 8
+VARDEF = 9
+LAMBDA = 10
+IIFE_LAMBDA = 11
+LET = 12
+CALL = 13
+PROG = 14
+IF = 15
+BINARY = 16
+ASSIGN = 17
+
+_FLOAT = struct.Struct('<d')
+_FOOTER = struct.Struct('<Q')
+# flush the writer's buffer to its file beyond this size
+_BUFFER_SIZE = 1 << 16
+
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    while value >= 0x80:
+        buffer.append(value & 0x7f | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data, pos: int) -> Tuple[int, int]:
+    """
+    :param data:
+    :param pos:
+    :return: the varint at pos and the position after it
+    """
+    byte = data[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    value = byte & 0x7f
+    shift = 7
+    while True:
+        pos += 1
+        byte = data[pos]
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos + 1
+        shift += 7
+
+
+class AstWriter:
+    """
+    Write asts to a binary file as they come; the string table is written
+    by close.
+    """
+
+    def __init__(self, file: BinaryIO):
+        self._file = file
+        self._buffer = bytearray(MAGIC)
+        _write_varint(self._buffer, FORMAT_VERSION)
+        # bytes flushed to file
+        self._offset = 0
+        self._strings: Dict[str, int] = {}
+
+    def __enter__(self) -> 'AstWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _string(self, string: str) -> None:
+        index = self._strings.get(string)
+        if index is None:
+            index = self._strings[string] = len(self._strings)
+        _write_varint(self._buffer, index)
+
+    def _flush(self) -> None:
+        self._file.write(self._buffer)
+        self._offset += len(self._buffer)
+        self._buffer = bytearray()
+
+    def _literal(self, value: Union[float, bool, str]) -> None:
+        buffer = self._buffer
+        if value is False:
+            buffer.append(FALSE)
+        elif value is True:
+            buffer.append(TRUE)
+        elif isinstance(value, str):
+            buffer.append(STRING)
+            self._string(value)
+        elif isinstance(value, int):
+            buffer.append(INT)
+            # zigzag: small negative ints stay short
+            _write_varint(buffer, value * 2 if value >= 0 else -value * 2 - 1)
+        elif (value.is_integer() and 0 <= value < 2 ** 53
+              and math.copysign(1, value) > 0):
+            buffer.append(INTEGRAL)
+            _write_varint(buffer, int(value))
+        else:
+            buffer.append(FLOAT)
+            buffer += _FLOAT.pack(value)
+
+    def write(self, ast: Ast) -> None:
+        """
+        append one tree to the stream
+        :param ast:
+        :return:
+        """
+        # pylint: disable=too-many-branches
+        buffer = self._buffer
+        stack: List[Optional[Ast]] = [ast]
+        while stack:
+            ast = stack.pop()
+            ast_type = type(ast)
+            if ast is None:
+                buffer.append(NONE)
+            elif ast_type is VarAst:
+                buffer.append(VAR)
+                self._string(ast.name)
+            elif ast_type is LiteralAst:
+                self._literal(ast.value)
+            elif ast_type is CallAst:
+                buffer.append(CALL)
+                _write_varint(buffer, len(ast.args))
+                stack.extend(reversed(ast.args))
+                stack.append(ast.func)
+            elif ast_type is BinaryAst:
+                buffer.append(BINARY)
+                self._string(ast.operator)
+                stack.append(ast.right)
+                stack.append(ast.left)
+            elif ast_type is LambdaAst:
+                buffer.append(IIFE_LAMBDA if ast.iife_params else LAMBDA)
+                self._string(ast.name)
+                _write_varint(buffer, len(ast.params))
+                for param in ast.params:
+                    self._string(param)
+                if ast.iife_params:
+                    _write_varint(buffer, len(ast.iife_params))
+                    for param in ast.iife_params:
+                        self._string(param)
+                stack.append(ast.body)
+            elif ast_type is IfAst:
+                buffer.append(IF)
+                stack.append(ast.else_)
+                stack.append(ast.then)
+                stack.append(ast.cond)
+            elif ast_type is AssignAst:
+                buffer.append(ASSIGN)
+                stack.append(ast.right)
+                stack.append(ast.left)
+            elif ast_type is ProgAst:
+                buffer.append(PROG)
+                _write_varint(buffer, len(ast.prog))
+                stack.extend(reversed(ast.prog))
+            elif ast_type is LetAst:
+                buffer.append(LET)
+                _write_varint(buffer, len(ast.vardefs))
+                stack.append(ast.body)
+                stack.extend(reversed(ast.vardefs))
+            elif ast_type is VarDefAst:
+                buffer.append(VARDEF)
+                self._string(ast.name)
+                stack.append(ast.define)
+            elif ast_type is JsAst:
+                buffer.append(JS)
+                self._string(ast.js_code)
+            else:
+                raise Exception(f"Dunno how to serialize {ast}")
+            if len(buffer) > _BUFFER_SIZE:
+                self._flush()
+                buffer = self._buffer
+
+    def close(self) -> None:
+        """
+        write the string table and the footer
+        """
+        table_offset = self._offset + len(self._buffer)
+        _write_varint(self._buffer, len(self._strings))
+        # dicts keep insertion order, which is the order of indexes
+        for string in self._strings:
+            data = string.encode()
+            _write_varint(self._buffer, len(data))
+            self._buffer += data
+            if len(self._buffer) > _BUFFER_SIZE:
+                self._flush()
+        self._buffer += _FOOTER.pack(table_offset)
+        self._flush()
+
+
+class StringTable:
+    """
+    strings of a stream, each decoded when first accessed
+    """
+
+    def __init__(self, data: memoryview, offset: int):
+        count, pos = _read_varint(data, offset)
+        self._data = data
+        # start and end of each string
+        self._bounds = array('Q')
+        for _ in range(count):
+            size, pos = _read_varint(data, pos)
+            self._bounds.append(pos)
+            self._bounds.append(pos + size)
+            pos += size
+        self._strings: List[Optional[str]] = [None] * count
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def __getitem__(self, index: int) -> str:
+        string = self._strings[index]
+        if string is None:
+            start, end = self._bounds[2 * index], self._bounds[2 * index + 1]
+            string = self._strings[index] = str(self._data[start:end],
+                                                'utf-8')
+        return string
+
+    def decoded(self) -> int:
+        """
+        number of strings decoded so far
+        """
+        return len(self._strings) - self._strings.count(None)
+
+
+class AstReader:
+    """
+    Read the trees of a stream from bytes, a memoryview or an mmap,
+    one at a time.
+    """
+
+    def __init__(self, buffer):
+        self._data = memoryview(buffer).cast('B')
+        if bytes(self._data[:len(MAGIC)]) != MAGIC:
+            raise Exception("Not a binary ast stream")
+        version, self._pos = _read_varint(self._data, len(MAGIC))
+        if version != FORMAT_VERSION:
+            raise Exception(f"Unsupported binary ast version {version}")
+        self._end, = _FOOTER.unpack_from(
+            self._data, len(self._data) - _FOOTER.size)
+        self.strings = StringTable(self._data, self._end)
+
+    def __iter__(self) -> Iterator[Ast]:
+        while self._pos < self._end:
+            # asts are acyclic, collections while building them are wasted
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                ast, self._pos = self._read_tree(self._pos)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+            yield ast
+
+    def _read_literal(self, tag: int, pos: int) -> Tuple[LiteralAst, int]:
+        data = self._data
+        if tag == FALSE:
+            return literal(False), pos
+        if tag == TRUE:
+            return literal(True), pos
+        if tag == FLOAT:
+            return literal(_FLOAT.unpack_from(data, pos)[0]), pos + 8
+        value, pos = _read_varint(data, pos)
+        if tag == STRING:
+            return literal(self.strings[value]), pos
+        if tag == INTEGRAL:
+            return literal(float(value)), pos
+        if value % 2:
+            return literal(-(value + 1) // 2), pos
+        return literal(value // 2), pos
+
+    def _read_names(self, pos: int) -> Tuple[List[str], int]:
+        data, strings = self._data, self.strings
+        count, pos = _read_varint(data, pos)
+        names = []
+        for _ in range(count):
+            index, pos = _read_varint(data, pos)
+            names.append(strings[index])
+        return names, pos
+
+    def _read_tree(self, pos: int) -> Tuple[Ast, int]:
+        """
+        :param pos:
+        :return: the tree at pos and the position after it
+        """
+        # pylint: disable=too-many-branches,too-many-statements
+        data, strings = self._data, self.strings
+        # nodes waiting for children: tag, fields, number of children,
+        # children read so far
+        stack: List[list] = []
+        while True:
+            tag = data[pos]
+            pos += 1
+            if tag >= 0x80:
+                tag, pos = _read_varint(data, pos - 1)
+            if tag == VAR:
+                index, pos = _read_varint(data, pos)
+                node = VarAst(strings[index])
+            elif FALSE <= tag <= INT:
+                node, pos = self._read_literal(tag, pos)
+            elif tag == NONE:
+                node = None
+            elif tag == JS:
+                index, pos = _read_varint(data, pos)
+                node = JsAst(strings[index])
+            elif tag in (IF, ASSIGN):
+                stack.append([tag, None, 3 if tag == IF else 2, []])
+                continue
+            elif tag == BINARY:
+                index, pos = _read_varint(data, pos)
+                stack.append([tag, strings[index], 2, []])
+                continue
+            elif tag == VARDEF:
+                index, pos = _read_varint(data, pos)
+                stack.append([tag, strings[index], 1, []])
+                continue
+            elif tag in (LAMBDA, IIFE_LAMBDA):
+                index, pos = _read_varint(data, pos)
+                params, pos = self._read_names(pos)
+                iife_params: List[str] = []
+                if tag == IIFE_LAMBDA:
+                    iife_params, pos = self._read_names(pos)
+                stack.append([LAMBDA, (strings[index], params, iife_params),
+                              1, []])
+                continue
+            elif tag in (CALL, LET, PROG):
+                count, pos = _read_varint(data, pos)
+                if tag != PROG:
+                    count += 1
+                if count:
+                    stack.append([tag, None, count, []])
+                    continue
+                node = ProgAst([])
+            else:
+                raise Exception(f"Unknown binary ast tag {tag} at {pos - 1}")
+            # hand node to its parent, building the parents it completes
+            while stack:
+                frame = stack[-1]
+                children = frame[3]
+                children.append(node)
+                if len(children) < frame[2]:
+                    break
+                stack.pop()
+                node = _build(frame[0], frame[1], children)
+            else:
+                return node, pos
+
+
+def _build(tag: int, value, children: List[Optional[Ast]]) -> Ast:
+    # pylint: disable=too-many-return-statements
+    if tag == CALL:
+        return CallAst(children[0], children[1:])
+    if tag == BINARY:
+        return BinaryAst(value, children[0], children[1])
+    if tag == LAMBDA:
+        name, params, iife_params = value
+        return LambdaAst(name, params, children[0], iife_params)
+    if tag == IF:
+        return IfAst(children[0], children[1], children[2])
+    if tag == ASSIGN:
+        return AssignAst(children[0], children[1])
+    if tag == PROG:
+        return ProgAst(children)
+    if tag == LET:
+        return LetAst(children[:-1], children[-1])
+    return VarDefAst(value, children[0])
+
+
+def dump(ast: Ast, file: BinaryIO) -> None:
+    """
+    write a stream holding ast to file
+    :param ast:
+    :param file:
+    :return:
+    """
+    with AstWriter(file) as writer:
+        writer.write(ast)
+
+
+def dumps(ast: Ast) -> bytes:
+    """
+    :param ast:
+    :return: a stream holding ast
+    """
+    file = io.BytesIO()
+    dump(ast, file)
+    return file.getvalue()
+
+
+def load(buffer) -> Ast:
+    """
+    :param buffer: a stream written by dump
+    :return: the first tree of the stream
+    """
+    return next(iter(AstReader(buffer)))
+
+
+# pylint: disable=C0111
+def main():
+    with open(sys.argv[2], 'wb') as file:
+        dump(parse_files([sys.argv[1]]), file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Content-addressed on-disk cache of parsed and transformed asts.
+
+An entry is keyed by the sha256 of the source text, the pipeline stage
+that produced the ast and the source code of the modules implementing
+that stage, so editing either the program or the compiler misses the
+cache. Entries are pickled and zlib-compressed, and the least recently
+used ones are evicted when the cache grows beyond its size bound.
+"""
+import hashlib
+import io
+import os
+import pickle
+import sys
+import zlib
+from typing import (Any, BinaryIO, Callable, Dict, Iterable, List, Optional,
+                    Tuple)
+
+from ast import Ast, VarDefine
+from environment import Environment
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DIRECTORY = os.path.join(
+    os.path.expanduser('~'), '.cache', 'pylambda')
+DEFAULT_MAX_BYTES = 64 * 2 ** 20
+# modules whose code determines the ast produced by each stage
+STAGE_MODULES: Dict[str, List[str]] = {
+    'parse': ['ast.py', 'input_stream.py', 'parse.py', 'token_stream.py'],
+    'optimize': ['ast.py', 'input_stream.py', 'parse.py', 'token_stream.py',
+                 'cps_transformer.py', 'optimize.py', 'utils.py',
+                 'environment.py'],
+}
+_SUFFIX = '.ast'
+_CHUNK_SIZE = 1 << 16
+# the objects asts are graphs of, pickled by _dumps one at a time
+_NODE_TYPES = (Ast, VarDefine, Environment)
+
+
+def source_digest(paths: Iterable[str]) -> str:
+    """
+    hash the concatenated content of files without holding it in memory
+    :param paths:
+    :return: hex digest
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _Pickler(pickle.Pickler):
+    """
+    Pickler of the records of _dumps, pickling the nodes they refer to as
+    persistent ids, and queueing them to be pickled as records in turn
+    """
+
+    def __init__(self, file: BinaryIO, nodes: List[Any]):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.nodes: List[Any] = nodes
+        self.indexes: Dict[int, int] = {id(node): index
+                                        for index, node in enumerate(nodes)}
+
+    def persistent_id(self, obj: Any) -> Optional[Tuple[int, type]]:
+        if not isinstance(obj, _NODE_TYPES):
+            return None
+        index = self.indexes.get(id(obj))
+        if index is None:
+            index = self.indexes[id(obj)] = len(self.nodes)
+            self.nodes.append(obj)
+        return index, type(obj)
+
+
+class _Unpickler(pickle.Unpickler):
+    """
+    Unpickler of the records of _dumps, making the node of a persistent id
+    the first time it is met, to be filled once its record is read
+    """
+
+    def __init__(self, file: BinaryIO):
+        super().__init__(file)
+        self.nodes: Dict[int, Any] = {}
+
+    def persistent_load(self, pid: Tuple[int, type]) -> Any:
+        index, cls = pid
+        node = self.nodes.get(index)
+        if node is None:
+            node = self.nodes[index] = cls.__new__(cls)
+        return node
+
+
+def _dumps(ast: Ast) -> bytes:
+    """
+    Pickle ast one node at a time: the record of a node is its class and
+    its state, in which the nodes it refers to are persistent ids, so that
+    pickling recurses no deeper for deeply nested asts, such as cps
+    transformed ones
+    :param ast:
+    :return:
+    """
+    file = io.BytesIO()
+    nodes: List[Any] = [ast]
+    pickler = _Pickler(file, nodes)
+    index = 0
+    # nodes grows as the records refer to nodes not met before
+    while index < len(nodes):
+        node = nodes[index]
+        pickler.dump((type(node),
+                      node.__reduce_ex__(pickle.HIGHEST_PROTOCOL)[2]))
+        index += 1
+    pickler.dump(None)
+    return file.getvalue()
+
+
+def _loads(data: bytes) -> Ast:
+    """
+    Unpickle an ast pickled by _dumps
+    :param data:
+    :return:
+    """
+    unpickler = _Unpickler(io.BytesIO(data))
+    index = 0
+    record = unpickler.load()
+    while record is not None:
+        cls, state = record
+        node = unpickler.persistent_load((index, cls))
+        # as pickle sets the state of an object without __setstate__
+        if isinstance(state, tuple):
+            state, slots = state
+        else:
+            slots = {}
+        if state:
+            node.__dict__.update(state)
+        for name, value in slots.items():
+            setattr(node, name, value)
+        index += 1
+        record = unpickler.load()
+    return unpickler.persistent_load((0, Ast))
+
+
+def _stage_version(stage: str) -> str:
+    """
+    :param stage:
+    :return: hex digest of the python version and the modules of stage
+    """
+    digest = hashlib.sha256(f'{stage} {sys.version_info[:2]}'.encode())
+    for name in STAGE_MODULES[stage]:
+        with open(os.path.join(ROOT, name), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+class AstCache:
+    """
+    Directory of serialized asts bounded to max_bytes in total.
+    The directory defaults to $PYLAMBDA_CACHE_DIR or ~/.cache/pylambda.
+    A disabled cache misses every get and stores nothing; the cache is
+    disabled by default when $PYLAMBDA_NO_CACHE is set to anything but ''.
+    """
+
+    def __init__(self, directory: Optional[str] = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 enabled: Optional[bool] = None):
+        if directory is None:
+            directory = os.environ.get('PYLAMBDA_CACHE_DIR',
+                                       DEFAULT_DIRECTORY)
+        if enabled is None:
+            enabled = not os.environ.get('PYLAMBDA_NO_CACHE')
+        self.directory: str = directory
+        self.max_bytes: int = max_bytes
+        self.enabled: bool = enabled
+        self._versions: Dict[str, str] = {}
+
+    def _path(self, digest: str, stage: str) -> str:
+        if stage not in self._versions:
+            self._versions[stage] = _stage_version(stage)
+        key = hashlib.sha256(
+            f'{self._versions[stage]} {digest}'.encode()).hexdigest()
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, digest: str, stage: str) -> Optional[Ast]:
+        """
+        :param digest: source_digest of the source
+        :param stage:
+        :return: the cached ast, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        path = self._path(digest, stage)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+        try:
+            ast = _loads(zlib.decompress(data))
+        # a truncated or stale entry is a miss
+        except Exception:  # pylint: disable=broad-except
+            self._remove(path)
+            return None
+        try:
+            # mark as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return ast
+
+    def put(self, digest: str, stage: str, ast: Ast) -> bool:
+        """
+        Store ast, then evict least recently used entries beyond max_bytes.
+        :param digest: source_digest of the source
+        :param stage:
+        :param ast:
+        :return: whether ast is stored
+        """
+        if not self.enabled:
+            return False
+        try:
+            data = zlib.compress(_dumps(ast))
+        except (pickle.PicklingError, TypeError, RecursionError):
+            return False
+        path = self._path(digest, stage)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, 'wb') as file:
+                file.write(data)
+            # readers never see a partially written entry
+            os.replace(temp_path, path)
+        except OSError:
+            self._remove(temp_path)
+            return False
+        self.evict()
+        return True
+
+    def load(self, digest: str, stage: str, build: Callable[[], Ast]) -> Ast:
+        """
+        :param digest: source_digest of the source
+        :param stage:
+        :param build: produce the ast on a miss
+        :return: the cached ast, or the ast built and stored on a miss
+        """
+        ast = self.get(digest, stage)
+        if ast is None:
+            ast = build()
+            self.put(digest, stage, ast)
+        return ast
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        """
+        :return: mtime, size and path of entries, least recently used first
+        """
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    def evict(self) -> None:
+        """
+        remove least recently used entries until the total size of entries
+        is at most max_bytes
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self) -> None:
+        """
+        remove all entries
+        """
+        for _, _, path in self.entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
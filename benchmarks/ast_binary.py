@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Size and speed of the binary ast format against pickle, on the repo's
+.lambda samples scaled up.
+
+usage: python -m benchmarks.ast_binary [scale]
+"""
+import pickle
+import sys
+
+from ast_binary import dumps, load
+from benchmarks.common import best_of, run_deep, sample_source
+from input_stream import InputStream
+from parse import Parser
+from token_stream import RegexTokenStream
+
+
+# pylint: disable=C0111
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    ast = Parser(RegexTokenStream(InputStream(sample_source(scale))))()
+    print(f"samples x{scale}")
+    dump_seconds, data = best_of(lambda: dumps(ast))
+    load_seconds, copy = best_of(lambda: load(data))
+    assert copy == ast
+    pickle_dump_seconds, pickled = best_of(
+        lambda: run_deep(pickle.dumps, ast, pickle.HIGHEST_PROTOCOL))
+    pickle_load_seconds, _ = best_of(lambda: run_deep(pickle.loads, pickled))
+    print(f"{'':>7} {'bytes':>9} {'dump':>8} {'load':>8}")
+    print(f"{'binary':>7} {len(data):>9} {dump_seconds * 1000:>6.0f}ms "
+          f"{load_seconds * 1000:>6.0f}ms")
+    print(f"{'pickle':>7} {len(pickled):>9} "
+          f"{pickle_dump_seconds * 1000:>6.0f}ms "
+          f"{pickle_load_seconds * 1000:>6.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+pcc pipeline time with a cold and a warm AstCache, on primitive.lambda as
+prelude followed by list.lambda repeated as app, and parsing time of the
+evaluators on the repo's .lambda samples scaled up.
+to_cps itself exceeds the recursion limit on apps of more than a few
+copies of list.lambda.
+
+usage: python -m benchmarks.ast_cache [app scale] [samples scale]
+"""
+import os
+import sys
+import tempfile
+
+from ast_cache import AstCache, source_digest
+from benchmarks.common import ROOT, best_of, sample_source
+from compiler import to_js
+from optimize import compile_files
+from parse import parse_files
+
+
+# pylint: disable=C0111
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    samples_scale = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(ROOT, 'list.lambda')) as file:
+            code = file.read()
+        app_path = os.path.join(directory, 'app.lambda')
+        with open(app_path, 'w') as file:
+            file.write(';\n'.join(['{\n' + code + '\n}'] * scale))
+        paths = [os.path.join(ROOT, 'primitive.lambda'), app_path]
+        cache = AstCache(os.path.join(directory, 'cache'), enabled=True)
+
+        def cold():
+            cache.clear()
+            return to_js(compile_files(paths, cache))
+
+        def warm():
+            return to_js(compile_files(paths, cache))
+
+        cold_seconds, cold_js = best_of(cold)
+        warm_seconds, warm_js = best_of(warm)
+        assert cold_js == warm_js
+        size = sum(size for _, size, _ in cache.entries())
+        print(f"pcc, {sum(map(os.path.getsize, paths))} bytes of source, "
+              f"{size} bytes cached")
+        print(f"cold: {cold_seconds * 1000:.1f}ms")
+        print(f"warm: {warm_seconds * 1000:.1f}ms")
+
+        samples_path = os.path.join(directory, 'samples.lambda')
+        with open(samples_path, 'w') as file:
+            file.write(sample_source(samples_scale))
+        paths = [samples_path]
+        digest = source_digest(paths)
+
+        def parse():
+            return cache.load(digest, 'parse', lambda: parse_files(paths))
+
+        cache.clear()
+        cold_seconds, _ = best_of(parse, repeat=1)
+        warm_seconds, _ = best_of(parse)
+        print(f"parse, {os.path.getsize(samples_path)} bytes of source")
+        print(f"cold: {cold_seconds * 1000:.1f}ms")
+        print(f"warm: {warm_seconds * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Memory held by the asts of the repo's .lambda samples scaled up, after
+parsing, cps transforming and optimizing them: traced bytes per node of
+the live tree, and the peak RSS of the process after each stage.
+The stages run with a raised recursion limit, since to_cps and the
+optimizer recurse once per top-level expression.
+
+usage: python -m benchmarks.ast_memory [scale]
+"""
+import resource
+import sys
+import tracemalloc
+from dataclasses import fields
+from typing import Callable, Iterator, Tuple
+
+from ast import Ast, CallAst, VarAst
+from benchmarks.common import run_deep, sample_source
+from cps_transformer import to_cps
+from input_stream import InputStream
+from optimize import Optimizer
+from parse import Parser
+from token_stream import RegexTokenStream
+
+
+def _stages(code: str) -> Iterator[Tuple[str, Callable[[Ast], Ast]]]:
+    yield 'parse', lambda _: Parser(RegexTokenStream(InputStream(code)))()
+    yield 'cps', lambda ast: to_cps(
+        ast, lambda ast: CallAst(VarAst('β_TOPLEVEL'), [ast]))
+    yield 'optimize', Optimizer().optimize
+
+
+def _count_nodes(ast: Ast) -> int:
+    seen = set()
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, Ast) and id(node) not in seen:
+            seen.add(id(node))
+            stack.extend(getattr(node, f.name) for f in fields(node))
+    return len(seen)
+
+
+def _max_rss() -> int:
+    # kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _run(code: str) -> None:
+    ast = None
+    for stage, func in _stages(code):
+        ast = run_deep(func, ast)
+        print(f"{stage:>8}: peak RSS {_max_rss() / 2 ** 20:.1f} MB")
+    ast = None
+    tracemalloc.start()
+    for stage, func in _stages(code):
+        # the previous tree is freed once replaced, so the traced memory
+        # is what the current tree and its scopes hold
+        ast = run_deep(func, ast)
+        size, _ = tracemalloc.get_traced_memory()
+        nodes = _count_nodes(ast)
+        print(f"{stage:>8}: {nodes} nodes, {size / 2 ** 20:.1f} MB traced, "
+              f"{size / nodes:.0f} bytes/node")
+    tracemalloc.stop()
+
+
+# pylint: disable=C0111
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    code = sample_source(scale)
+    print(f"samples x{scale}: {len(code)} characters")
+    _run(code)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Heap kept alive by a closure made next to a large list under evaluator.py:
+a list of n cons cells is built, a callback referring only to a number is
+made in a frame holding the list, and the list is dropped. A closure
+holding its whole defining frame would keep the list alive.
+
+usage: python -m benchmarks.closure_memory [n]
+"""
+import gc
+import sys
+import tracemalloc
+
+import evaluator
+from environment import Environment
+from input_stream import InputStream
+from parse import Parser
+from token_stream import RegexTokenStream
+
+CODE = '''
+cons = λ(a, b) λ(f) f(a, b);
+NIL = λ(f) f(NIL, NIL);
+keep = λ(list, n) λ() n;
+'''
+
+
+# pylint: disable=C0111
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    env = Environment()
+    evaluator.evaluate(Parser(RegexTokenStream(InputStream(CODE)))(), env)
+    cons = env.get('cons')
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    head = env.get('NIL')
+    for i in range(number):
+        head = cons(i, head)
+    built = tracemalloc.get_traced_memory()[0] - baseline
+    callback = env.get('keep')(head, 3)
+    head = None
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    assert callback() == 3
+    print(f"list of {number} cells: {built / 2 ** 20:.1f}MiB")
+    print(f"retained by the callback: {retained / 2 ** 20:.3f}MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+helpers shared by benchmarks
+"""
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the recursive walkers recurse a few times per level of nested asts, and
+# cps transformed asts nest about as deep as the program is long
+_STACK_SIZE = 512 * 2 ** 20
+_RECURSION_LIMIT = 1000000
+
+
+def sample_paths() -> List[str]:
+    """
+    paths of the .lambda samples shipped with the repo
+    """
+    return [os.path.join(ROOT, name) for name in sorted(os.listdir(ROOT))
+            if name.endswith('.lambda')]
+
+
+def sample_source(scale: int = 1) -> str:
+    """
+    The .lambda samples joined into one program and repeated scale times.
+    Each sample is wrapped in a block so that the result still parses.
+    """
+    codes = []
+    for path in sample_paths():
+        with open(path) as file:
+            codes.append('{\n' + file.read() + '\n}')
+    return ';\n'.join(codes * scale)
+
+
+def best_of(func: Callable[[], Any], repeat: int = 3) -> Tuple[float, Any]:
+    """
+    run func repeat times
+    :return: the best wall time in seconds and the result of the last run
+    """
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start_time)
+    return best, result
+
+
+def run_deep(func: Callable, *args: Any) -> Any:
+    """
+    call func in a thread with a large stack, the recursion limit raised
+    for the time of the call
+    :param func:
+    :param args:
+    :return: the value returned by func
+    """
+    results: List[Any] = []
+    errors: List[BaseException] = []
+
+    def target() -> None:
+        try:
+            results.append(func(*args))
+        except BaseException as error:  # pylint: disable=broad-except
+            errors.append(error)
+
+    recursion_limit = sys.getrecursionlimit()
+    stack_size = threading.stack_size(_STACK_SIZE)
+    sys.setrecursionlimit(max(recursion_limit, _RECURSION_LIMIT))
+    try:
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+    finally:
+        sys.setrecursionlimit(recursion_limit)
+        threading.stack_size(stack_size)
+    if errors:
+        raise errors[0]
+    return results[0]
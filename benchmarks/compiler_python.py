@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Time of fib(n) as how_fast.lambda defines it, under the tree walking
+evaluator.py and compiled by compiler_python, against the fibPY primitive
+written in python. how_fast.lambda itself calls fibpy, defined by the
+javascript primitives only, so its definition of fib is run alone.
+
+usage: python -m benchmarks.compiler_python [n]
+"""
+import os
+import sys
+
+import compiler_python
+import evaluator
+from ast import CallAst, LiteralAst, ProgAst, VarAst
+from benchmarks.common import ROOT, best_of
+from environment import Environment
+from parse import parse_files
+from primitive import primitive
+
+
+def _global_env() -> Environment:
+    env = Environment()
+    for name, func in primitive.items():
+        env.define(name, func)
+    return env
+
+
+# pylint: disable=C0111
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 22
+    fib = parse_files([os.path.join(ROOT, 'how_fast.lambda')]).prog[0]
+    ast = ProgAst([fib, CallAst(VarAst('fib'), [LiteralAst(float(number))])])
+    walk_seconds, result = best_of(
+        lambda: evaluator.evaluate(ast, _global_env()))
+    compile_seconds, _ = best_of(lambda: compiler_python.compile_python(ast))
+    python_seconds, python_result = best_of(
+        lambda: compiler_python.evaluate(ast, _global_env()))
+    fib_py_seconds, fib_py_result = best_of(
+        lambda: primitive['fibPY'](number))
+    assert result == python_result == fib_py_result
+    print(f"fib({number}) = {result:.0f}")
+    print(f"{'evaluator':>15}: {walk_seconds:.3f}s")
+    print(f"{'compiler_python':>15}: {python_seconds:.3f}s, "
+          f"{compile_seconds * 1e6:.0f}us of which to compile")
+    print(f"{'fibPY':>15}: {fib_py_seconds:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
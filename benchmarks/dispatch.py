@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Node visits per second of each ast walker: the three evaluators, the
+optimizer, scope analysis and has_side_effect. evaluator_callback never
+unwinds its stack, so it runs with a raised recursion limit.
+
+A visit is a call of a function of the walker's module on an ast, unless
+its caller is already handling that same ast, so that a dispatching
+function and the handler it calls count once.
+
+usage: python -m benchmarks.dispatch
+"""
+import sys
+import threading
+from dataclasses import fields
+from typing import Callable, List
+
+import evaluator
+import evaluator_callback
+import evaluator_callback_stack_guard
+import optimize
+import utils
+from ast import Ast, CallAst, VarAst
+from benchmarks.common import best_of, run_deep, sample_source
+from callback_primitive import primitive as callback_primitive
+from cps_transformer import to_cps
+from environment import Environment
+from input_stream import InputStream
+from parse import Parser
+from primitive import primitive
+from token_stream import RegexTokenStream
+
+FIB = 'fib = λ(n) if n < 2 then n else fib(n - 1) + fib(n - 2);'
+
+
+def _parse(code: str) -> Ast:
+    return Parser(RegexTokenStream(InputStream(code)))()
+
+
+def _cps(ast: Ast) -> Ast:
+    return to_cps(ast, lambda ast: CallAst(VarAst('β_TOPLEVEL'), [ast]))
+
+
+def _global_env(functions) -> Environment:
+    env = Environment()
+    for name, func in functions.items():
+        env.define(name, func)
+    return env
+
+
+def _visited_ast(frame) -> Ast:
+    code = frame.f_code
+    for name in code.co_varnames[:min(code.co_argcount, 2)]:
+        value = frame.f_locals.get(name)
+        if isinstance(value, Ast):
+            return value
+    return None
+
+
+def _count_visits(module, func: Callable, *args) -> int:
+    visits = 0
+
+    def profile(frame, event, _):
+        nonlocal visits
+        if event == 'call' and frame.f_globals is module.__dict__:
+            ast = _visited_ast(frame)
+            if ast is not None and (frame.f_back is None
+                                    or _visited_ast(frame.f_back) is not ast):
+                visits += 1
+
+    sys.setprofile(profile)
+    # for walkers run by run_deep
+    threading.setprofile(profile)
+    try:
+        func(*args)
+    finally:
+        sys.setprofile(None)
+        threading.setprofile(None)
+    return visits
+
+
+def _nodes(ast: Ast) -> List[Ast]:
+    nodes = []
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, Ast):
+            nodes.append(node)
+            stack.extend(getattr(node, f.name) for f in fields(node))
+    return nodes
+
+
+def _has_side_effects(asts: List[Ast]) -> List[bool]:
+    return [utils.has_side_effect(ast) for ast in asts]
+
+
+# pylint: disable=C0111
+def main():
+    fib = _parse(FIB + 'fib(17)')
+    callback_fib = _parse(FIB + 'fib(14)')
+    cps = run_deep(_cps, _parse(sample_source(4)))
+    list_cps = run_deep(_cps, _parse(sample_source(1)))
+    nodes = _nodes(_parse(sample_source(4)))
+    walkers = [
+        ('evaluator', evaluator,
+         lambda: evaluator.evaluate(fib, _global_env(primitive))),
+        ('evaluator_callback', evaluator_callback,
+         lambda: run_deep(
+             evaluator_callback.evaluate, callback_fib,
+             _global_env(callback_primitive), lambda _: None)),
+        ('stack_guard', evaluator_callback_stack_guard,
+         lambda: evaluator_callback_stack_guard.execute(
+             evaluator_callback_stack_guard.evaluate,
+             (callback_fib, _global_env(callback_primitive),
+              lambda _: None))),
+        ('_make_scope', optimize,
+         lambda: run_deep(optimize._make_scope, cps)),
+        ('Optimizer', optimize,
+         lambda: run_deep(optimize.Optimizer().optimize, list_cps)),
+        ('has_side_effect', utils, lambda: _has_side_effects(nodes)),
+    ]
+    for name, module, walk in walkers:
+        visits = _count_visits(module, walk)
+        seconds, _ = best_of(walk, repeat=5)
+        print(f"{name:>18}: {visits:>8} visits, "
+              f"{visits / seconds / 1e6:.2f} M visits/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Startup of a request under evaluator.py: building a global environment
+from the primitives and a prelude against forking a frozen one, in
+forks/s and heap per fork, and the time of a request in either.
+
+usage: python -m benchmarks.environment_fork [n]
+"""
+import sys
+import timeit
+import tracemalloc
+
+import evaluator
+from benchmarks.common import best_of
+from environment import Environment
+from input_stream import InputStream
+from parse import Parser
+from primitive import primitive
+from token_stream import RegexTokenStream
+
+PRELUDE = '''
+cons = λ(a, b) λ(f) f(a, b);
+car = λ(cell) cell(λ(a, b) a);
+cdr = λ(cell) cell(λ(a, b) b);
+NIL = λ(f) f(NIL, NIL);
+range = λ(a, b) if a <= b then cons(a, range(a + 1, b)) else NIL;
+map = λ(list, f) if list == NIL then NIL
+                 else cons(f(car(list)), map(cdr(list), f));
+foldl = λ(list, f, acc) if list == NIL then acc
+                        else foldl(cdr(list), f, f(acc, car(list)));
+sum = λ(list) foldl(list, λ(a, b) a + b, 0);
+fib = λ(n) if n < 2 then n else fib(n - 1) + fib(n - 2);
+'''
+REQUEST = 'sum(map(range(1, 100), λ(x) x * x)) + fib(12)'
+
+
+def _parse(code: str):
+    return Parser(RegexTokenStream(InputStream(code)))()
+
+
+def _fresh(prelude) -> Environment:
+    env = Environment()
+    for name, func in primitive.items():
+        env.define(name, func)
+    evaluator.evaluate(prelude, env)
+    return env
+
+
+# pylint: disable=C0111
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    prelude, request = _parse(PRELUDE), _parse(REQUEST)
+    snapshot = _fresh(prelude).freeze()
+    fresh = min(timeit.repeat(lambda: _fresh(prelude), number=1000,
+                              repeat=5)) / 1000
+    fork = min(timeit.repeat(snapshot.fork, number=number, repeat=5)) / number
+    print(f"{'fresh':>6}: {fresh * 1e6:>8.2f}us {1 / fresh:>10.0f}/s")
+    print(f"{'fork':>6}: {fork * 1e6:>8.2f}us {1 / fork:>10.0f}/s")
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    forks = [snapshot.fork() for _ in range(number)]
+    per_fork = (tracemalloc.get_traced_memory()[0] - baseline) / number
+    del forks
+    baseline = tracemalloc.get_traced_memory()[0]
+    envs = [_fresh(prelude) for _ in range(1000)]
+    per_fresh = (tracemalloc.get_traced_memory()[0] - baseline) / 1000
+    del envs
+    tracemalloc.stop()
+    print(f"heap per environment: fresh {per_fresh:.0f}B, "
+          f"fork {per_fork:.0f}B")
+    fresh_seconds, result = best_of(
+        lambda: evaluator.evaluate(request, _fresh(prelude)))
+    fork_seconds, fork_result = best_of(
+        lambda: evaluator.evaluate(request, snapshot.fork()))
+    assert result == fork_result
+    print(f"request in a fresh environment {fresh_seconds * 1000:.2f}ms, "
+          f"in a fork {fork_seconds * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Time of fib(n), the benchmark of how_fast.lambda, under the tree walking
+evaluator.py against evaluator_closure, whose compilation to closures is
+timed apart.
+
+usage: python -m benchmarks.evaluator_closure [n]
+"""
+import sys
+
+import evaluator
+import evaluator_closure
+from benchmarks.common import best_of
+from environment import Environment
+from input_stream import InputStream
+from parse import Parser
+from primitive import primitive
+from token_stream import RegexTokenStream
+
+FIB = 'fib = λ(n) if n < 2 then n else fib(n - 1) + fib(n - 2); fib({})'
+
+
+def _global_env() -> Environment:
+    env = Environment()
+    for name, func in primitive.items():
+        env.define(name, func)
+    return env
+
+
+# pylint: disable=C0111
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 22
+    ast = Parser(RegexTokenStream(InputStream(FIB.format(number))))()
+    walk_seconds, result = best_of(
+        lambda: evaluator.evaluate(ast, _global_env()))
+    compile_seconds, run = best_of(
+        lambda: evaluator_closure.compile_ast(ast))
+    run_seconds, closure_result = best_of(lambda: run(_global_env()))
+    assert closure_result == result
+    print(f"fib({number}) = {result:.0f}")
+    print(f"{'evaluator':>17}: {walk_seconds:.3f}s")
+    print(f"{'evaluator_closure':>17}: {run_seconds:.3f}s "
+          f"(+{compile_seconds * 1e6:.0f}us to compile), "
+          f"{walk_seconds / run_seconds:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
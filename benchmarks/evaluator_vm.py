@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Time of no_stackoverflow.lambda, counting down from n rather than 1e8,
+and of fib(22) under the cps evaluator_callback_stack_guard against
+evaluator_vm, whose compilation to bytecode is timed with its run.
+
+usage: python -m benchmarks.evaluator_vm [n]
+"""
+import os
+import sys
+from typing import Any, Callable
+
+import evaluator_callback_stack_guard
+import evaluator_vm
+from ast import Ast, LiteralAst
+from benchmarks.common import ROOT, best_of
+from callback_primitive import primitive
+from environment import Environment
+from input_stream import InputStream
+from parse import Parser, parse_files
+from token_stream import RegexTokenStream
+
+FIB = 'fib = λ(n) if n < 2 then n else fib(n - 1) + fib(n - 2); fib(22)'
+
+
+def _global_env() -> Environment:
+    env = Environment()
+    for name, func in primitive.items():
+        env.define(name, func)
+    return env
+
+
+def _runner(module) -> Callable[[Ast], Any]:
+    def run(ast: Ast) -> Any:
+        results = []
+        module.execute(module.evaluate, (ast, _global_env(), results.append))
+        return results[-1]
+
+    return run
+
+
+def _compare(name: str, ast: Ast) -> None:
+    guard_seconds, result = best_of(
+        lambda: _runner(evaluator_callback_stack_guard)(ast))
+    vm_seconds, vm_result = best_of(lambda: _runner(evaluator_vm)(ast))
+    assert vm_result == result
+    print(f"{name}: stack guard {guard_seconds:.3f}s, vm {vm_seconds:.3f}s, "
+          f"{guard_seconds / vm_seconds:.2f}x")
+
+
+# pylint: disable=C0111
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    ast = parse_files([os.path.join(ROOT, 'no_stackoverflow.lambda')])
+    # λ foo(n) if n > 0 then foo(n - 1), called with number
+    ast.prog[0].args[0] = LiteralAst(float(number))
+    _compare(f"no_stackoverflow({number})", ast)
+    _compare("fib(22)", Parser(RegexTokenStream(InputStream(FIB)))())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Size of the repo's .lambda samples scaled up as asts and as a FlatAst,
+time of scope analysis and code generation over both forms, and time to
+send them to another process by pickle or as a buffer.
+
+usage: python -m benchmarks.flat_ast [scale]
+"""
+import pickle
+import sys
+import tracemalloc
+
+from benchmarks.common import best_of, run_deep, sample_source
+from compiler import to_js
+from flat_ast import FlatAst, flatten, make_scope
+from flat_ast import to_js as flat_to_js
+from input_stream import InputStream
+from optimize import _make_scope
+from parse import Parser
+from token_stream import RegexTokenStream
+
+
+def _report(name: str, seconds: float, flat_seconds: float) -> None:
+    print(f"{name:>12}: ast {seconds * 1000:.0f}ms, "
+          f"flat {flat_seconds * 1000:.0f}ms, "
+          f"speedup {seconds / flat_seconds:.2f}x")
+
+
+# pylint: disable=C0111
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    code = sample_source(scale)
+    tracemalloc.start()
+    ast = Parser(RegexTokenStream(InputStream(code)))()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    seconds, flat = best_of(lambda: flatten(ast))
+    data = flat.to_bytes()
+    print(f"samples x{scale}: {len(flat)} nodes, flatten {seconds:.2f}s")
+    print(f"ast {size / len(flat):.0f} bytes/node, "
+          f"flat {len(data) / len(flat):.1f} bytes/node")
+
+    seconds, _ = best_of(lambda: run_deep(_make_scope, ast))
+    flat_seconds, scope = best_of(lambda: make_scope(flat))
+    _report('scope', seconds, flat_seconds)
+    seconds, js_code = best_of(lambda: run_deep(to_js, ast))
+    flat_seconds, flat_js_code = best_of(lambda: flat_to_js(flat, scope))
+    assert js_code == flat_js_code
+    _report('to_js', seconds, flat_seconds)
+    pickled = run_deep(pickle.dumps, ast, pickle.HIGHEST_PROTOCOL)
+    seconds, _ = best_of(lambda: run_deep(pickle.loads, pickled))
+    flat_seconds, _ = best_of(lambda: FlatAst.from_buffer(data))
+    _report('load', seconds, flat_seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Edit-to-AST latency of IncrementalParser against a full re-parse.
+
+usage: python -m benchmarks.incremental [lines]
+"""
+import sys
+import time
+
+from incremental import IncrementalParser
+from input_stream import InputStream
+from parse import Parser
+from token_stream import RegexTokenStream
+
+
+def _source(lines: int) -> str:
+    return ''.join(f'f{i} = λ(x, y) if x < y then x + {i} else y * {i};\n'
+                   for i in range(lines))
+
+
+# pylint: disable=C0111
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    code = _source(lines)
+    start_time = time.perf_counter()
+    Parser(RegexTokenStream(InputStream(code)))()
+    full = time.perf_counter() - start_time
+    print(f"{lines} lines, full parse: {full * 1000:.1f}ms")
+    incremental_parser = IncrementalParser(code)
+    for label, line in (('start', 0), ('middle', lines // 2),
+                        ('end', lines - 1)):
+        offset = code.index('<', code.index(f'f{line} ='))
+        start_time = time.perf_counter()
+        incremental_parser.edit(offset, offset + 1, '>')
+        incremental_parser.edit(offset, offset + 1, '<')
+        seconds = (time.perf_counter() - start_time) / 2
+        print(f"edit at {label:>6}: {seconds * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
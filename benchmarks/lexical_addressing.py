@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Cost of a variable lookup by name in an Environment chain against a
+resolved lookup in a flat Frame, for variables 0 to 3 scopes up and for a
+global (through its inline cache), and the time of fib(n) under
+evaluator.py with the hits and misses of the global inline caches.
+
+usage: python -m benchmarks.lexical_addressing [n]
+"""
+import sys
+import timeit
+
+import evaluator
+from ast import VarAst
+from benchmarks.common import best_of
+from environment import GLOBAL_CACHE_STATS, Environment, Frame
+from input_stream import InputStream
+from parse import Parser
+from primitive import primitive
+from token_stream import RegexTokenStream
+
+FIB = 'fib = λ(n) if n < 2 then n else fib(n - 1) + fib(n - 2); fib({})'
+NUMBER = 200000
+
+
+def _per_lookup(stmt: str, **names) -> float:
+    return min(timeit.repeat(stmt, number=NUMBER, repeat=5,
+                             globals=names)) / NUMBER
+
+
+def _fib(number: int) -> float:
+    env = Environment()
+    for name, func in primitive.items():
+        env.define(name, func)
+    ast = Parser(RegexTokenStream(InputStream(FIB.format(number))))()
+    return evaluator.evaluate(ast, env)
+
+
+# pylint: disable=C0111
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 25
+    env = global_env = Environment()
+    env.define('g', 0)
+    # one variable per scope, v0 in the innermost
+    for depth in range(3, -1, -1):
+        env = env.extend()
+        env.define(f'v{depth}', depth)
+    # closure conversion copies them all into the frame
+    frame = Frame(list(range(4)), global_env)
+    print(f"{'':>8} {'Environment':>12} {'Frame':>8}")
+    evaluate_var = evaluator._evaluate_var
+    for name, depth, slot in [('v0', 0, 0), ('v1', 1, 1), ('v2', 2, 2),
+                              ('v3', 3, 3), ('g', 4, None)]:
+        var = VarAst(name)
+        var.depth, var.slot, var.boxed, var.cache = depth, slot, False, None
+        assert env.get(name) == evaluate_var(var, frame)
+        by_name = _per_lookup('get(name)', get=env.get, name=name)
+        by_address = _per_lookup('evaluate_var(var, frame)',
+                                 evaluate_var=evaluate_var, var=var,
+                                 frame=frame)
+        print(f"{name:>8} {by_name * 1e9:>10.0f}ns "
+              f"{by_address * 1e9:>6.0f}ns")
+    GLOBAL_CACHE_STATS.reset()
+    seconds, result = best_of(lambda: _fib(number))
+    print(f"fib({number}) = {result:.0f} in {seconds:.2f}s")
+    print(f"global inline caches: {GLOBAL_CACHE_STATS.hits} hits, "
+          f"{GLOBAL_CACHE_STATS.misses} misses")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Number of ast nodes allocated by parsing, cps transforming and optimizing
+each of the repo's .lambda samples, with the share of LiteralAst.
+
+usage: python -m benchmarks.node_counts
+"""
+import os
+from collections import Counter
+from typing import Callable
+
+import ast
+from benchmarks.common import run_deep, sample_paths
+from cps_transformer import to_cps
+from input_stream import InputStream
+from optimize import Optimizer
+from parse import Parser
+from token_stream import RegexTokenStream
+
+ALLOCATIONS: Counter = Counter()
+
+
+def _count_allocations(cls: type) -> None:
+    init = cls.__init__
+
+    def counting_init(self, *args, **kwargs):
+        ALLOCATIONS[cls.__name__] += 1
+        init(self, *args, **kwargs)
+
+    cls.__init__ = counting_init
+
+
+def _allocations(func: Callable, *args):
+    ALLOCATIONS.clear()
+    result = run_deep(func, *args)
+    return result, sum(ALLOCATIONS.values()), ALLOCATIONS['LiteralAst']
+
+
+# pylint: disable=C0111
+def main():
+    for cls in ast.Ast.__subclasses__():
+        _count_allocations(cls)
+    print(f"{'sample':>28} {'parse':>13} {'cps':>13} {'optimize':>13}")
+    totals = Counter()
+    for path in sample_paths():
+        with open(path) as file:
+            code = file.read()
+        counts = []
+        tree, *count = _allocations(
+            lambda: Parser(RegexTokenStream(InputStream(code)))())
+        counts.append(count)
+        tree, *count = _allocations(to_cps, tree, lambda tree: ast.CallAst(
+            ast.VarAst('β_TOPLEVEL'), [tree]))
+        counts.append(count)
+        try:
+            _, *count = _allocations(Optimizer().optimize, tree)
+        # some samples use names the optimizer cannot resolve
+        except Exception:  # pylint: disable=broad-except
+            count = [0, 0]
+        counts.append(count)
+        for stage, (nodes, literals) in zip(('parse', 'cps', 'optimize'),
+                                            counts):
+            totals[stage] += nodes
+            totals[stage + ' literals'] += literals
+        print(f"{os.path.basename(path):>28} " + ' '.join(
+            f"{nodes:>6} ({literals:>4})" for nodes, literals in counts))
+    print(f"{'total':>28} " + ' '.join(
+        f"{totals[stage]:>6} ({totals[stage + ' literals']:>4})"
+        for stage in ('parse', 'cps', 'optimize')))
+
+
+if __name__ == '__main__':
+    main()
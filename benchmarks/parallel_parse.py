@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Speedup of parse_parallel over the sequential parser against the number of
+worker processes, on a synthetic program of independent definitions.
+
+usage: python -m benchmarks.parallel_parse [megabytes]
+"""
+import os
+import sys
+import time
+
+from input_stream import InputStream
+from parallel_parse import parse_parallel
+from parse import Parser
+from token_stream import RegexTokenStream
+
+
+def _source(megabytes: float) -> str:
+    lines = []
+    size = 0
+    i = 0
+    while size < megabytes * 2 ** 20:
+        line = (f'f{i} = λ(x, y) if x < y || x == {i} then {{ println(x); '
+                f'x + {i} }} else y * "s{i}";\n')
+        lines.append(line)
+        size += len(line)
+        i += 1
+    return ''.join(lines)
+
+
+def _seconds(func) -> float:
+    start_time = time.perf_counter()
+    func()
+    return time.perf_counter() - start_time
+
+
+# pylint: disable=C0111
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    code = _source(megabytes)
+    cores = os.cpu_count() or 1
+    print(f"source: {megabytes} MB, {cores} cores")
+    sequential = _seconds(
+        lambda: Parser(RegexTokenStream(InputStream(code)))())
+    print(f"{'sequential':>10}: {sequential:.2f}s")
+    workers = 2
+    while workers <= max(cores, 2):
+        seconds = _seconds(lambda: parse_parallel(code, workers))
+        print(f"{workers:>2} workers: {seconds:.2f}s, "
+              f"speedup {sequential / seconds:.2f}x")
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Parsing throughput on the repo's .lambda samples scaled up.
+
+usage: python -m benchmarks.parser [scale]
+"""
+import sys
+
+from benchmarks.common import best_of, sample_source
+from input_stream import InputStream
+from parse import Parser
+from token_stream import RegexTokenStream, TokenStream
+
+
+# pylint: disable=C0111
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    code = sample_source(scale)
+    megabytes = len(code.encode()) / 2 ** 20
+    print(f"source: {megabytes:.2f} MB")
+    for token_stream_class in (TokenStream, RegexTokenStream):
+        seconds, _ = best_of(
+            lambda: Parser(token_stream_class(InputStream(code)))(), repeat=1)
+        print(f"{token_stream_class.__name__:>18}: {seconds:.2f}s, "
+              f"{megabytes / seconds:.2f} MB/s")
+    seconds, buffer = best_of(
+        lambda: RegexTokenStream(InputStream(code)).tokenize_all(), repeat=1)
+    print(f"{'tokenize_all':>18}: {seconds:.2f}s, "
+          f"{megabytes / seconds:.2f} MB/s")
+    seconds, _ = best_of(lambda: Parser(buffer)(), repeat=1)
+    print(f"{'TokenBuffer':>18}: {seconds:.2f}s, "
+          f"{megabytes / seconds:.2f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Lexing speed with and without eager line/column tracking.
+
+InputStream only tracks an offset and computes (line, col) on demand.
+_TrackingInputStream restores the previous behaviour of updating line and
+column on every character read, for comparison.
+
+usage: python -m benchmarks.positions [scale]
+"""
+import sys
+
+from benchmarks.common import best_of, sample_source
+from input_stream import InputStream
+from token_stream import RegexTokenStream, TokenStream
+
+
+class _TrackingInputStream(InputStream):
+    def __init__(self, input_: str):
+        super().__init__(input_)
+        self._line = 1
+        self._col = 0
+
+    def next(self) -> str:
+        char = super().next()
+        if char == "\n":
+            self._line += 1
+            self._col = 0
+        else:
+            self._col += 1
+        return char
+
+    def match(self, pattern):
+        start = self._pos
+        match = super().match(pattern)
+        if match is not None:
+            newline = self._input.rfind("\n", start, self._pos)
+            if newline == -1:
+                self._col += self._pos - start
+            else:
+                self._line += self._input.count("\n", start, self._pos)
+                self._col = self._pos - newline - 1
+        return match
+
+
+def _lex(token_stream: TokenStream) -> None:
+    while not token_stream.eof():
+        token_stream.next()
+
+
+# pylint: disable=C0111
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    code = sample_source(scale)
+    megabytes = len(code.encode()) / 2 ** 20
+    print(f"source: {megabytes:.2f} MB")
+    for token_stream_class in (TokenStream, RegexTokenStream):
+        for input_stream_class, label in ((_TrackingInputStream, 'tracking'),
+                                          (InputStream, 'offset only')):
+            seconds, _ = best_of(lambda: _lex(
+                token_stream_class(input_stream_class(code))))
+            print(f"{token_stream_class.__name__:>18} {label:>12}: "
+                  f"{megabytes / seconds:.2f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Parsing throughput of Parser against PrattParser on the repo's .lambda
+samples scaled up, from a pre-lexed TokenBuffer and from source.
+
+usage: python -m benchmarks.pratt [scale]
+"""
+import sys
+
+from benchmarks.common import best_of, sample_source
+from input_stream import InputStream
+from parse import Parser, PrattParser
+from token_stream import RegexTokenStream
+
+
+# pylint: disable=C0111
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    code = sample_source(scale)
+    megabytes = len(code.encode()) / 2 ** 20
+    buffer = RegexTokenStream(InputStream(code)).tokenize_all()
+    print(f"source: {megabytes:.2f} MB, {len(buffer)} tokens")
+    for parser_class in (Parser, PrattParser):
+        def parse_buffer():
+            buffer.seek(0)
+            return parser_class(buffer)()
+
+        seconds, _ = best_of(parse_buffer)
+        print(f"{parser_class.__name__:>12} on TokenBuffer: {seconds:.2f}s, "
+              f"{len(buffer) / seconds / 1e6:.2f} M tokens/s")
+        seconds, _ = best_of(
+            lambda: parser_class(RegexTokenStream(InputStream(code)))())
+        print(f"{parser_class.__name__:>12} on source: {seconds:.2f}s, "
+              f"{megabytes / seconds:.2f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
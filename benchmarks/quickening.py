@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Time of fib(n) and of print_range.lambda, run number times, under
+evaluator.py with and without quickening, and the specialization
+statistics of the quickened sites of fib.
+
+usage: python -m benchmarks.quickening [n] [number]
+"""
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+from typing import Any
+
+import evaluator
+import quickening
+from ast import Ast
+from benchmarks.common import ROOT, best_of
+from environment import Environment
+from input_stream import InputStream
+from parse import Parser, parse_files
+from primitive import primitive
+from token_stream import RegexTokenStream
+
+FIB = 'fib = λ(n) if n < 2 then n else fib(n - 1) + fib(n - 2); fib({})'
+
+
+def _evaluate(ast: Ast, quicken: bool) -> Any:
+    env = Environment()
+    for name, func in primitive.items():
+        env.define(name, func)
+    return evaluator.evaluate(ast, env, quicken=quicken)
+
+
+def _print_range(ast: Ast, number: int, quicken: bool) -> str:
+    output = io.StringIO()
+    with redirect_stdout(output):
+        for _ in range(number):
+            _evaluate(ast, quicken)
+    return output.getvalue()
+
+
+def _compare(name: str, generic_seconds: float,
+             quickened_seconds: float) -> None:
+    print(f"{name}: generic {generic_seconds:.3f}s, "
+          f"quickened {quickened_seconds:.3f}s, "
+          f"{generic_seconds / quickened_seconds:.2f}x")
+
+
+# pylint: disable=C0111
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 22
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    fib = Parser(RegexTokenStream(InputStream(FIB.format(number))))()
+    generic_seconds, result = best_of(lambda: _evaluate(fib, False))
+    quickened_seconds, quickened = best_of(lambda: _evaluate(fib, True))
+    assert quickened == result
+    _compare(f"fib({number})", generic_seconds, quickened_seconds)
+    print(quickening.report(fib))
+    print_range = parse_files([os.path.join(ROOT, 'print_range.lambda')])
+    generic_seconds, output = best_of(
+        lambda: _print_range(print_range, runs, False))
+    quickened_seconds, quickened = best_of(
+        lambda: _print_range(print_range, runs, True))
+    assert quickened == output
+    _compare(f"print_range.lambda x{runs}", generic_seconds,
+             quickened_seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Parsing time of StackParser against the recursive parsers, on the repo's
+.lambda samples scaled up and on long and deeply nested expressions.
+The recursive parsers are only timed at depths they survive.
+
+usage: python -m benchmarks.stack_parser [scale]
+"""
+import sys
+
+from benchmarks.common import best_of, sample_source
+from input_stream import InputStream
+from parse import Parser, PrattParser, StackParser
+from token_stream import RegexTokenStream, TokenBuffer
+
+NESTED = {
+    'binary': lambda depth: ' + '.join(['1'] * (depth + 1)),
+    'parentheses': lambda depth: '(' * depth + '1' + ')' * depth,
+    'if': lambda depth: 'if a then ' * depth + 'b',
+    'lambda': lambda depth: 'λ(x) ' * depth + 'x',
+    'call': lambda depth: 'f(' * depth + 'x' + ')' * depth,
+}
+
+
+def _time(parser_class, buffer: TokenBuffer) -> float:
+    def parse():
+        buffer.seek(0)
+        return parser_class(buffer)()
+
+    seconds, _ = best_of(parse)
+    return seconds
+
+
+# pylint: disable=C0111
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    code = sample_source(scale)
+    buffer = RegexTokenStream(InputStream(code)).tokenize_all()
+    print(f"samples x{scale}: {len(buffer)} tokens")
+    for parser_class in (Parser, PrattParser, StackParser):
+        seconds = _time(parser_class, buffer)
+        print(f"{parser_class.__name__:>12}: {seconds:.2f}s, "
+              f"{len(buffer) / seconds / 1e6:.2f} M tokens/s")
+    for name, make_code in NESTED.items():
+        for depth in (200, 100000):
+            buffer = RegexTokenStream(
+                InputStream(make_code(depth))).tokenize_all()
+            for parser_class in (Parser, PrattParser, StackParser):
+                try:
+                    seconds = _time(parser_class, buffer)
+                except RecursionError:
+                    continue
+                print(f"{name:>12} depth {depth:>6} "
+                      f"{parser_class.__name__:>12}: "
+                      f"{seconds * 1e6 / depth:.1f}us per level")
+
+
+if __name__ == '__main__':
+    main()
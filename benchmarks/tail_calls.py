@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Time of the tail recursive sum of 1..n under evaluator.py, whose calls in
+tail position run in constant python stack, against the cps
+evaluator_callback_stack_guard.
+
+usage: python -m benchmarks.tail_calls [n]
+"""
+import sys
+from typing import Any
+
+import callback_primitive
+import evaluator
+import evaluator_callback_stack_guard
+import primitive
+from ast import Ast
+from benchmarks.common import best_of
+from environment import Environment
+from input_stream import InputStream
+from parse import Parser
+from token_stream import RegexTokenStream
+
+SUM = 'sum = λ(n, ret) if n == 0 then ret else sum(n - 1, ret + n); ' \
+      'sum({}, 0)'
+
+
+def _global_env(primitives) -> Environment:
+    env = Environment()
+    for name, func in primitives.items():
+        env.define(name, func)
+    return env
+
+
+def _stack_guard(ast: Ast) -> Any:
+    results = []
+    evaluator_callback_stack_guard.execute(
+        evaluator_callback_stack_guard.evaluate,
+        (ast, _global_env(callback_primitive.primitive), results.append))
+    return results[-1]
+
+
+# pylint: disable=C0111
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    ast = Parser(RegexTokenStream(InputStream(SUM.format(number))))()
+    guard_seconds, result = best_of(lambda: _stack_guard(ast))
+    direct_seconds, direct_result = best_of(
+        lambda: evaluator.evaluate(ast, _global_env(primitive.primitive)))
+    assert direct_result == result
+    print(f"sum({number}, 0) = {result:.0f}")
+    print(f"evaluator_callback_stack_guard: {guard_seconds:.3f}s")
+    print(f"{'evaluator':>30}: {direct_seconds:.3f}s, "
+          f"{guard_seconds / direct_seconds:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
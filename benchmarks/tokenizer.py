@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Lexing throughput of TokenStream against RegexTokenStream.
+
+usage: python -m benchmarks.tokenizer [scale]
+"""
+import sys
+
+from benchmarks.common import best_of, sample_source
+from input_stream import InputStream
+from token_stream import RegexTokenStream, TokenStream
+
+
+def _count_tokens(token_stream: TokenStream) -> int:
+    count = 0
+    while not token_stream.eof():
+        token_stream.next()
+        count += 1
+    return count
+
+
+# pylint: disable=C0111
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    code = sample_source(scale)
+    megabytes = len(code.encode()) / 2 ** 20
+    print(f"source: {megabytes:.2f} MB")
+    for token_stream_class in (TokenStream, RegexTokenStream):
+        seconds, count = best_of(
+            lambda: _count_tokens(token_stream_class(InputStream(code))))
+        print(f"{token_stream_class.__name__:>18}: {count} tokens, "
+              f"{count / seconds:,.0f} tokens/s, "
+              f"{megabytes / seconds:.2f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,444 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Compile ast to the register bytecode run by evaluator_vm.
+
+A lambda, or top level code, compiles to a Code: its instructions, four
+ints each (an opcode and three operands) in an array, and a pool of the
+constants that do not fit in an int, such as the global variables and the
+Code of the lambdas it makes.
+
+Operands of most instructions are registers of the frame running the
+code. The registers are laid out as
+1. the slots resolver.resolve gives the variables of the code: the name
+   of a named lambda, params, captured variables and variables of lets
+2. temporaries holding intermediate values
+3. the literals of the code, copied into each frame from Code.template
+   together with the initial False of lets and temporaries, so that an
+   instruction reads a literal like any other register.
+
+A call finds the function in a register and its args in the registers
+following it; a call in tail position of a lambda replaces the frame of
+the lambda rather than returning to it.
+"""
+from array import array
+from ast import (AssignAst, Ast, BinaryAst, CallAst, IfAst, LambdaAst, LetAst,
+                 LiteralAst, ProgAst, VarAst)
+from typing import Any, Dict, List, Optional, Tuple
+
+from resolver import resolve
+from utils import Dispatcher
+
+# registers[a] = registers[b]
+MOVE = 0
+# registers[a] = registers[b].value
+LOAD_BOX = 1
+# registers[a].value = registers[b]
+STORE_BOX = 2
+# registers[a] = Box(registers[a])
+BOX = 3
+# registers[a] = the global variable consts[b], a VarAst
+LOAD_GLOBAL = 4
+# set the global variable consts[b] to registers[a]
+STORE_GLOBAL = 5
+# registers[a] = registers[b] op registers[c]
+ADD = 6
+SUB = 7
+MUL = 8
+DIV = 9
+MOD = 10
+LT = 11
+GT = 12
+LE = 13
+GE = 14
+EQ = 15
+NE = 16
+AND = 17
+OR = 18
+# pc = a
+JUMP = 19
+# pc = b if registers[a] is False
+JUMP_IF_FALSE = 20
+# registers[a] = a closure of consts[b], a Code
+MAKE_CLOSURE = 21
+# registers[a] = registers[b](registers[b + 1], ..., registers[b + c])
+CALL = 22
+# return registers[a](registers[a + 1], ..., registers[a + b])
+TAIL_CALL = 23
+# return registers[a]
+RETURN = 24
+# raise Exception(consts[a])
+RAISE = 25
+
+BINARY_OPCODES = {
+    '+': ADD, '-': SUB, '*': MUL, '/': DIV, '%': MOD, '<': LT, '>': GT,
+    '<=': LE, '>=': GE, '==': EQ, '!=': NE, '&&': AND, '||': OR,
+}
+OPCODE_NAMES = {
+    value: name for name, value in globals().items()
+    if name.isupper() and isinstance(value, int)
+}
+# number of operands of each opcode
+_OPERAND_COUNTS: Dict[int, int] = {
+    MOVE: 2, LOAD_BOX: 2, STORE_BOX: 2, BOX: 1, LOAD_GLOBAL: 2,
+    STORE_GLOBAL: 2, JUMP: 1, JUMP_IF_FALSE: 2, MAKE_CLOSURE: 2, CALL: 3,
+    TAIL_CALL: 2, RETURN: 1, RAISE: 1,
+}
+_OPERAND_COUNTS.update((opcode, 3) for opcode in BINARY_OPCODES.values())
+# operands of each opcode that are registers, to relocate literals
+_REGISTER_OPERANDS: Dict[int, Tuple[int, ...]] = {
+    MOVE: (1, 2), LOAD_BOX: (1, 2), STORE_BOX: (1, 2), BOX: (1,),
+    LOAD_GLOBAL: (1,), STORE_GLOBAL: (1,), JUMP: (), JUMP_IF_FALSE: (1,),
+    MAKE_CLOSURE: (1,), CALL: (1, 2), TAIL_CALL: (1,), RETURN: (1,),
+    RAISE: (),
+}
+_REGISTER_OPERANDS.update(
+    (opcode, (1, 2, 3)) for opcode in BINARY_OPCODES.values())
+
+
+class Code:
+    """
+    Compiled lambda, or top level code
+    """
+    __slots__ = ('name', 'instructions', 'consts', 'template', 'named',
+                 'param_count', 'boxed', 'captures')
+
+    def __init__(self, name: str, instructions: array, consts: List[Any],
+                 template: List[Any], named: bool, param_count: int,
+                 boxed: Tuple[int, ...], captures: Tuple[int, ...]):
+        self.name: str = name
+        self.instructions: array = instructions
+        self.consts: List[Any] = consts
+        # registers following the captured variables in a new frame
+        self.template: List[Any] = template
+        # whether the lambda is bound to its name in register 0
+        self.named: bool = named
+        self.param_count: int = param_count
+        # slots of params to box on a call
+        self.boxed: Tuple[int, ...] = boxed
+        # registers of the frame making a closure to copy into it
+        self.captures: Tuple[int, ...] = captures
+
+
+def compile_ast(ast: Ast) -> Code:
+    """
+    Compile ast, evaluated outside of any lambda or let
+    :param ast:
+    :return:
+    """
+    # the vm binds the name of a named lambda in each call frame, and
+    # resumes continuations in copies of frames, which must share the
+    # variables assigned after the continuation was made
+    frame_size = resolve(ast, name_in_call_frame=True, box_assigned=True)
+    return _Compiler(frame_size).compile_code('', ast, False, 0, (), ())
+
+
+def disassemble(code: Code) -> str:
+    """
+    Instructions of code, one per line
+    :param code:
+    :return:
+    """
+    instructions = code.instructions
+    lines = []
+    for pc in range(0, len(instructions), 4):
+        opcode, *operands = instructions[pc:pc + 4]
+        operands = operands[:_OPERAND_COUNTS[opcode]]
+        lines.append(f"{pc:>4} {OPCODE_NAMES[opcode]:<13} "
+                     + ' '.join(str(operand) for operand in operands))
+    return '\n'.join(lines)
+
+
+class _Compiler:
+    """
+    Compiler of one Code
+    """
+
+    def __init__(self, frame_size: int):
+        self.frame_size: int = frame_size
+        self.instructions: array = array('l')
+        self.consts: List[Any] = []
+        self.literals: List[Any] = []
+        # literal registers, keyed by type and repr since 1 == 1.0 == True
+        # and 0.0 == -0.0
+        self.literal_registers: Dict[Tuple[type, str], int] = {}
+        self.temps: int = 0
+        self.max_temps: int = 0
+
+    # pylint: disable=too-many-arguments
+    def compile_code(self, name: str, body: Ast, named: bool,
+                     param_count: int, boxed: Tuple[int, ...],
+                     captures: Tuple[int, ...]) -> Code:
+        lets = self.frame_size - param_count - named - len(captures)
+        self.tail(body)
+        # literals follow temporaries, whose number is known only now
+        base = self.frame_size + self.max_temps
+        instructions = self.instructions
+        for pc in range(0, len(instructions), 4):
+            for operand in _REGISTER_OPERANDS[instructions[pc]]:
+                if instructions[pc + operand] < 0:
+                    instructions[pc + operand] = \
+                        base - 1 - instructions[pc + operand]
+        template = [False] * (lets + self.max_temps) + self.literals
+        return Code(name, instructions, self.consts, template, named,
+                    param_count, boxed, captures)
+
+    def emit(self, opcode: int, a: int = 0, b: int = 0, c: int = 0) -> int:
+        self.instructions.extend((opcode, a, b, c))
+        return len(self.instructions) - 4
+
+    def patch(self, pc: int, operand: int, value: int) -> None:
+        self.instructions[pc + operand] = value
+
+    def here(self) -> int:
+        return len(self.instructions)
+
+    def const(self, value: Any) -> int:
+        self.consts.append(value)
+        return len(self.consts) - 1
+
+    def literal(self, value: Any) -> int:
+        """
+        register of a literal, negative until relocated by compile_code
+        """
+        key = (type(value), repr(value))
+        if key not in self.literal_registers:
+            self.literals.append(value)
+            self.literal_registers[key] = -len(self.literals)
+        return self.literal_registers[key]
+
+    def alloc(self, count: int = 1) -> int:
+        register = self.frame_size + self.temps
+        self.temps += count
+        self.max_temps = max(self.max_temps, self.temps)
+        return register
+
+    def free(self, register: int) -> None:
+        self.temps = register - self.frame_size
+
+    def tail(self, ast: Ast) -> None:
+        """
+        emit code returning the value of ast
+        """
+        if isinstance(ast, ProgAst) and ast.prog:
+            for expr in ast.prog[:-1]:
+                self.effect(expr)
+            self.tail(ast.prog[-1])
+        elif isinstance(ast, LetAst):
+            self.let_vardefs(ast)
+            self.tail(ast.body)
+        elif isinstance(ast, IfAst) and ast.else_ is not None:
+            self.branch(ast, self.tail)
+        elif isinstance(ast, CallAst):
+            func = self.call_block(ast)
+            self.emit(TAIL_CALL, func, len(ast.args))
+            self.free(func)
+        else:
+            register = self.operand(ast)
+            self.emit(RETURN, register)
+            self.free_temp(register)
+
+    def effect(self, ast: Ast) -> None:
+        """
+        emit code evaluating ast for its side effects
+        """
+        if isinstance(ast, (LiteralAst, LambdaAst)):
+            return
+        if isinstance(ast, AssignAst) and isinstance(ast.left, VarAst) \
+                and ast.left.slot is not None and not ast.left.boxed:
+            self.expression(ast.right, ast.left.slot)
+            return
+        register = self.alloc()
+        self.expression(ast, register)
+        self.free(register)
+
+    def expression(self, ast: Ast, target: int) -> None:
+        """
+        emit code putting the value of ast in register target
+        """
+        _EXPRESSION[type(ast)](self, ast, target)
+
+    def operand(self, ast: Ast, later: Tuple[Ast, ...] = ()) -> int:
+        """
+        a register holding the value of ast: the register of a literal or
+        of a local variable that later asts do not assign, else a new
+        temporary
+        """
+        if isinstance(ast, LiteralAst):
+            return self.literal(ast.value)
+        if isinstance(ast, VarAst) and ast.slot is not None \
+                and not ast.boxed \
+                and not any(_assigns(later_ast, ast.slot)
+                            for later_ast in later):
+            return ast.slot
+        register = self.alloc()
+        self.expression(ast, register)
+        return register
+
+    def free_temp(self, register: int) -> None:
+        if register >= self.frame_size:
+            self.free(register)
+
+    def branch(self, ast: IfAst, compile_branch) -> None:
+        if isinstance(ast.cond, LiteralAst):
+            compile_branch(ast.then if ast.cond.value is not False
+                           else ast.else_)
+            return
+        cond = self.operand(ast.cond)
+        self.free_temp(cond)
+        jump_else = self.emit(JUMP_IF_FALSE, cond)
+        compile_branch(ast.then)
+        # a branch in tail position returns, so needs no jump to the end
+        if compile_branch == self.tail:
+            self.patch(jump_else, 2, self.here())
+            compile_branch(ast.else_)
+            return
+        jump_end = self.emit(JUMP)
+        self.patch(jump_else, 2, self.here())
+        compile_branch(ast.else_)
+        self.patch(jump_end, 1, self.here())
+
+    def let_vardefs(self, ast: LetAst) -> None:
+        for vardef in ast.vardefs:
+            if vardef.define is None:
+                self.emit(MOVE, vardef.slot, self.literal(False))
+            else:
+                self.expression(vardef.define, vardef.slot)
+            if vardef.boxed:
+                self.emit(BOX, vardef.slot)
+
+    def call_block(self, ast: CallAst) -> int:
+        """
+        emit code putting the function and args of a call in consecutive
+        temporaries
+        :return: the register of the function
+        """
+        func = self.alloc(len(ast.args) + 1)
+        for i, expr in enumerate([ast.func] + ast.args):
+            self.expression(expr, func + i)
+        return func
+
+    def move(self, target: int, register: int) -> None:
+        if target != register:
+            self.emit(MOVE, target, register)
+
+
+def _compile_literal(compiler: _Compiler, ast: LiteralAst,
+                     target: int) -> None:
+    compiler.emit(MOVE, target, compiler.literal(ast.value))
+
+
+def _compile_var(compiler: _Compiler, ast: VarAst, target: int) -> None:
+    if ast.slot is None:
+        compiler.emit(LOAD_GLOBAL, target, compiler.const(ast))
+    elif ast.boxed:
+        compiler.emit(LOAD_BOX, target, ast.slot)
+    else:
+        compiler.move(target, ast.slot)
+
+
+def _compile_assign(compiler: _Compiler, ast: AssignAst, target: int) -> None:
+    left = ast.left
+    if not isinstance(left, VarAst):
+        _compile_raise(compiler, f"Cannot assign to {ast.left}")
+        return
+    if left.slot is not None and not left.boxed:
+        compiler.expression(ast.right, left.slot)
+        compiler.move(target, left.slot)
+        return
+    register = compiler.operand(ast.right)
+    if left.slot is None:
+        compiler.emit(STORE_GLOBAL, register, compiler.const(left))
+    else:
+        compiler.emit(STORE_BOX, left.slot, register)
+    compiler.move(target, register)
+    compiler.free_temp(register)
+
+
+def _compile_binary(compiler: _Compiler, ast: BinaryAst, target: int) -> None:
+    left = compiler.operand(ast.left, (ast.right,))
+    right = compiler.operand(ast.right)
+    opcode = BINARY_OPCODES.get(ast.operator)
+    if opcode is None:
+        _compile_raise(compiler, f"Can't apply operator {ast.operator}")
+    else:
+        compiler.emit(opcode, target, left, right)
+    compiler.free_temp(right)
+    compiler.free_temp(left)
+
+
+def _compile_lambda(compiler: _Compiler, ast: LambdaAst,
+                    target: int) -> None:
+    named = bool(ast.name)
+    code = _Compiler(ast.frame_size).compile_code(
+        ast.name, ast.body, named, len(ast.params), ast.boxed,
+        ast.captures)
+    compiler.emit(MAKE_CLOSURE, target, compiler.const(code))
+
+
+def _compile_if(compiler: _Compiler, ast: IfAst, target: int) -> None:
+    if ast.else_ is None:
+        ast = IfAst(ast.cond, ast.then, LiteralAst(False))
+    compiler.branch(ast, lambda branch: compiler.expression(branch, target))
+
+
+def _compile_prog(compiler: _Compiler, ast: ProgAst, target: int) -> None:
+    if not ast.prog:
+        compiler.emit(MOVE, target, compiler.literal(False))
+        return
+    for expr in ast.prog[:-1]:
+        compiler.effect(expr)
+    compiler.expression(ast.prog[-1], target)
+
+
+def _compile_call(compiler: _Compiler, ast: CallAst, target: int) -> None:
+    func = compiler.call_block(ast)
+    compiler.emit(CALL, target, func, len(ast.args))
+    compiler.free(func)
+
+
+def _compile_let(compiler: _Compiler, ast: LetAst, target: int) -> None:
+    compiler.let_vardefs(ast)
+    compiler.expression(ast.body, target)
+
+
+def _compile_raise(compiler: _Compiler, message: str) -> None:
+    compiler.emit(RAISE, compiler.const(message))
+
+
+def _compile_unknown(compiler: _Compiler, ast: Ast, _: int) -> None:
+    _compile_raise(compiler, f"I don't know how to evaluate {ast}")
+
+
+_EXPRESSION = Dispatcher({
+    LiteralAst: _compile_literal,
+    VarAst: _compile_var,
+    AssignAst: _compile_assign,
+    BinaryAst: _compile_binary,
+    LambdaAst: _compile_lambda,
+    IfAst: _compile_if,
+    ProgAst: _compile_prog,
+    CallAst: _compile_call,
+    LetAst: _compile_let,
+}, default=_compile_unknown)
+
+
+def _assigns(ast: Optional[Ast], slot: int) -> bool:
+    """
+    Whether ast assigns the unboxed variable in slot of the frame it is
+    evaluated in. Nested lambdas cannot: a variable they assign is boxed.
+    """
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, LambdaAst):
+            continue
+        elif isinstance(node, AssignAst) and isinstance(node.left, VarAst) \
+                and node.left.slot == slot:
+            return True
+        elif hasattr(node, '__dataclass_fields__'):
+            stack.extend(getattr(node, field)
+                         for field in node.__dataclass_fields__)
+    return False
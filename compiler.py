@@ -9,10 +9,11 @@ import sys
 from typing import Union
 
 from ast import Ast, LiteralAst, BinaryAst, VarAst, AssignAst, LetAst, \
-    LambdaAst, IfAst, CallAst, ProgAst, JsAst
-from input_stream import InputStream
+    LambdaAst, IfAst, CallAst, ProgAst, JsAst, literal
+from input_stream import ChunkedInputStream
 from parse import Parser
 from token_stream import TokenStream
+from utils import Dispatcher
 
 
 # pylint: disable=C0111
@@ -26,13 +27,13 @@ def to_js(ast: Ast) -> str:
     return js_code
 
 
+def expression_to_js(ast: Ast) -> str:
+    # the code of ast alone, which unlike to_js needs no scope annotations
+    return _to_js(ast)
+
+
 def _to_js(ast: Ast) -> str:
-    try:
-        function = _MAPPING[type(ast)]
-    except Exception:
-        raise Exception(f"Dunno how to make_js for {ast}")
-    else:
-        return function(ast)
+    return _MAPPING[type(ast)](ast)
 
 
 def _js_atom(ast: LiteralAst) -> str:
@@ -79,7 +80,7 @@ def _js_let(ast: LetAst) -> str:
             LetAst(
                 ast.vardefs[1:],
                 ast.body)),
-        [ast.vardefs[0].define or LiteralAst(False)])
+        [ast.vardefs[0].define or literal(False)])
     return f'({_to_js(iife)})'
 
 
@@ -117,7 +118,11 @@ def _js_raw(ast: JsAst) -> str:
     return f'({ast.js_code})'
 
 
-_MAPPING = {
+def _js_unknown(ast: Ast) -> str:
+    raise Exception(f"Dunno how to make_js for {ast}")
+
+
+_MAPPING = Dispatcher({
     LiteralAst: _js_atom,
     BinaryAst: _js_binary,
     VarAst: _js_var,
@@ -128,19 +133,19 @@ _MAPPING = {
     CallAst: _js_call,
     ProgAst: _js_prog,
     JsAst: _js_raw,
-}
+}, default=_js_unknown)
 
 
 # pylint: disable=C0111
 
 
 def main():
-    with open(sys.argv[1]) as file:
-        code = file.read()
     # code = 'let foo(x = 1, y = 1) foo(x + y)'
     # code = 'lambda foo(x) x'
-    parser = Parser(TokenStream(InputStream(code)))
-    js_code = to_js(parser())
+    with open(sys.argv[1]) as file:
+        parser = Parser(TokenStream(ChunkedInputStream(file)))
+        ast = parser()
+    js_code = to_js(ast)
     print(js_code)
 
 
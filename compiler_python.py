@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Compile ast to python code, the sibling of compiler.py for hosts without
+node, and run it in process.
+
+Lambdas become python functions, defined at the top of the function, or
+of the main function of top level code, whose body evaluates them. Code
+in tail or statement position becomes statements (if statements, local
+assignments for lets, return) and other code expressions: conditional
+expressions for if, assignment expressions for assignments and lets,
+tuples for progs. As in the evaluators, False is the only falsy value, so
+a condition is tested with `is not False` unless it is a comparison.
+
+Every variable bound by a lambda or let gets a python name of its own, so
+that shadowing needs no care; functions assigning a variable of an
+enclosing function declare it nonlocal. Global variables are the
+globals of the python code, prefixed with g_ so that neither python
+builtins nor helpers are reachable from lambda code.
+
+The python code is made as source text and compiled by the builtin
+compile: the repo's ast.py shadows the standard library ast module, which
+is therefore neither needed nor imported.
+
+Unlike the evaluators, the compiled code leaves operand checks to python:
+"a" + "b" concatenates, 1 / 0 raises ZeroDivisionError, an undefined
+variable NameError, and assigning an undefined global from a lambda
+defines it.
+"""
+import linecache
+import math
+import re
+import sys
+from ast import (AssignAst, Ast, BinaryAst, CallAst, IfAst, JsAst, LambdaAst,
+                 LetAst, LiteralAst, ProgAst, VarAst)
+from itertools import count
+from types import CodeType
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from compiler import _is_bool
+from environment import Environment
+from input_stream import ChunkedInputStream
+from parse import Parser
+from primitive import primitive
+from token_stream import TokenStream
+from utils import Dispatcher
+
+MAIN = 'β_main'
+INDENT = '    '
+_OPERATORS = {
+    '+': '+', '-': '-', '*': '*', '/': '/', '%': '%', '<': '<', '>': '>',
+    '<=': '<=', '>=': '>=', '==': '==', '!=': '!=',
+}
+
+
+def _and(left: Any, right: Any) -> Any:
+    return False if left is False else right
+
+
+def _or(left: Any, right: Any) -> Any:
+    return right if left is False else left
+
+
+# both operands of && and || left to apply_op by the parser are evaluated
+_HELPERS = {'β_and': _and, 'β_or': _or}
+
+
+def global_name(name: str) -> str:
+    """
+    the python name of the global variable name
+    :param name:
+    :return:
+    """
+    return 'g_' + _mangle(name)
+
+
+def _mangle(name: str) -> str:
+    # _ is doubled, so that _ and two hex digits stand for any other char
+    # that python does not allow in names
+    return re.sub(r'[^0-9A-Za-zλβ]',
+                  lambda match: '__' if match.group() == '_'
+                  else f'_{ord(match.group()):02x}', name)
+
+
+# pylint: disable=C0111
+class _Function:
+    """
+    a python function being made: of a lambda, or of top level code
+    """
+
+    def __init__(self):
+        self.defs: List[str] = []
+        self.globals: Set[str] = set()
+        self.nonlocals: Set[str] = set()
+
+    def header(self) -> List[str]:
+        lines = []
+        if self.globals:
+            lines.append('global ' + ', '.join(sorted(self.globals)))
+        if self.nonlocals:
+            lines.append('nonlocal ' + ', '.join(sorted(self.nonlocals)))
+        return lines + self.defs
+
+
+# python name of a variable and the function binding it, by name
+_Names = Dict[str, Tuple[str, _Function]]
+
+
+class _Scope:
+    """
+    python names, and the functions binding them, of the variables bound
+    around an ast
+    """
+
+    def __init__(self, function: _Function, names: _Names, counter: count):
+        self.function: _Function = function
+        self.names: _Names = names
+        self.counter: count = counter
+
+    def extend(self, function: Optional[_Function] = None) -> '_Scope':
+        return _Scope(function or self.function, dict(self.names),
+                      self.counter)
+
+    def bind(self, name: str) -> str:
+        python_name = f'v{next(self.counter)}_{_mangle(name)}'
+        self.names[name] = (python_name, self.function)
+        return python_name
+
+    def assign(self, name: str) -> str:
+        """
+        the python name to assign to variable name, declared global or
+        nonlocal if need be
+        """
+        if name not in self.names:
+            python_name = global_name(name)
+            self.function.globals.add(python_name)
+            return python_name
+        python_name, function = self.names[name]
+        if function is not self.function:
+            self.function.nonlocals.add(python_name)
+        return python_name
+
+
+def to_python(ast: Ast) -> str:
+    """
+    The python code of ast, defining a function MAIN that evaluates it
+    :param ast:
+    :return:
+    """
+    function = _Function()
+    body = _tail(ast, _Scope(function, {}, count()))
+    return '\n'.join(_def(MAIN, [], function, body)) + '\n'
+
+
+def compile_python(ast: Ast, filename: str = '<lambda>') -> CodeType:
+    """
+    Compile the python code of ast, keeping its source for tracebacks
+    :param ast:
+    :param filename:
+    :return: code object defining MAIN
+    """
+    source = to_python(ast)
+    linecache.cache[filename] = (len(source), None,
+                                 source.splitlines(True), filename)
+    return compile(source, filename, 'exec')
+
+
+def evaluate(ast: Ast, env: Environment) -> Any:
+    """
+    Run ast with the global variables of env, as the evaluators do, and set
+    the globals it assigned in env
+    :param ast:
+    :param env:
+    :return:
+    """
+    namespace = dict(_HELPERS)
+    scope = env
+    while scope is not None:
+        for name, value in scope.vars.items():
+            namespace.setdefault(global_name(name), value)
+        scope = scope.parent
+    exec(compile_python(ast), namespace)  # pylint: disable=exec-used
+    result = namespace[MAIN]()
+    for name, python_name in _global_names(ast).items():
+        if python_name in namespace:
+            env.set(name, namespace[python_name])
+    return result
+
+
+def _global_names(ast: Ast) -> Dict[str, str]:
+    names = {}
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, AssignAst) and isinstance(node.left, VarAst):
+            names[node.left.name] = global_name(node.left.name)
+            stack.append(node.right)
+        elif hasattr(node, '__dataclass_fields__'):
+            stack.extend(getattr(node, field)
+                         for field in node.__dataclass_fields__)
+    return names
+
+
+def _def(name: str, params: List[str], function: _Function,
+         body: List[str]) -> List[str]:
+    lines = [f"def {name}({', '.join(params)}):"]
+    lines.extend(INDENT + line for line in function.header() + body)
+    return lines
+
+
+def _tail(ast: Ast, scope: _Scope) -> List[str]:
+    """
+    statements returning the value of ast
+    """
+    if isinstance(ast, ProgAst) and ast.prog:
+        lines = []
+        for expr in ast.prog[:-1]:
+            lines.extend(_statement(expr, scope))
+        return lines + _tail(ast.prog[-1], scope)
+    if isinstance(ast, LetAst):
+        lines, scope = _let(ast, scope)
+        return lines + _tail(ast.body, scope)
+    if isinstance(ast, IfAst) and ast.else_ is not None:
+        return _if(ast, scope, _tail)
+    return [f'return {_expression(ast, scope)}']
+
+
+def _statement(ast: Ast, scope: _Scope) -> List[str]:
+    """
+    statements evaluating ast for its side effects
+    """
+    if isinstance(ast, ProgAst):
+        lines = []
+        for expr in ast.prog:
+            lines.extend(_statement(expr, scope))
+        return lines
+    if isinstance(ast, LetAst):
+        lines, scope = _let(ast, scope)
+        return lines + _statement(ast.body, scope)
+    if isinstance(ast, IfAst) and ast.else_ is not None:
+        return _if(ast, scope, _statement)
+    if isinstance(ast, AssignAst) and isinstance(ast.left, VarAst):
+        value = _expression(ast.right, scope)
+        return [f'{scope.assign(ast.left.name)} = {value}']
+    if isinstance(ast, (LiteralAst, LambdaAst)):
+        return []
+    return [_expression(ast, scope)]
+
+
+def _let(ast: LetAst, scope: _Scope) -> Tuple[List[str], _Scope]:
+    lines = []
+    scope = scope.extend()
+    for vardef in ast.vardefs:
+        value = _expression(vardef.define, scope) \
+            if vardef.define is not None else 'False'
+        lines.append(f'{scope.bind(vardef.name)} = {value}')
+    return lines, scope
+
+
+def _if(ast: IfAst, scope: _Scope, branch) -> List[str]:
+    lines = [f'if {_condition(ast.cond, scope)}:']
+    lines.extend(INDENT + line
+                 for line in branch(ast.then, scope) or ['pass'])
+    else_ = branch(ast.else_, scope)
+    if isinstance(ast.else_, IfAst) and ast.else_.else_ is not None:
+        # an else if chain stays at one level of indentation, which python
+        # limits to 100
+        lines.append('el' + else_[0])
+        lines.extend(else_[1:])
+    elif else_:
+        lines.append('else:')
+        lines.extend(INDENT + line for line in else_)
+    return lines
+
+
+def _condition(ast: Ast, scope: _Scope) -> str:
+    if isinstance(ast, LiteralAst):
+        return repr(ast.value is not False)
+    if _is_bool(ast):
+        return _expression(ast, scope)
+    return f'{_expression(ast, scope)} is not False'
+
+
+def _expression(ast: Ast, scope: _Scope) -> str:
+    return _EXPRESSION[type(ast)](ast, scope)
+
+
+def _py_literal(ast: LiteralAst, _: _Scope) -> str:
+    value = ast.value
+    if isinstance(value, float) and not math.isfinite(value):
+        return f'float({str(value)!r})'
+    return f'({value!r})' if isinstance(value, (int, float)) \
+        and value < 0 else repr(value)
+
+
+def _py_var(ast: VarAst, scope: _Scope) -> str:
+    if ast.name in scope.names:
+        return scope.names[ast.name][0]
+    return global_name(ast.name)
+
+
+def _py_assign(ast: AssignAst, scope: _Scope) -> str:
+    if not isinstance(ast.left, VarAst):
+        raise Exception(f"Cannot assign to {ast.left}")
+    value = _expression(ast.right, scope)
+    return f'({scope.assign(ast.left.name)} := {value})'
+
+
+def _py_binary(ast: BinaryAst, scope: _Scope) -> str:
+    left = _expression(ast.left, scope)
+    right = _expression(ast.right, scope)
+    if ast.operator == '&&':
+        return f'β_and({left}, {right})'
+    if ast.operator == '||':
+        return f'β_or({left}, {right})'
+    if ast.operator not in _OPERATORS:
+        raise Exception(f"Can't apply operator {ast.operator}")
+    return f'({left} {_OPERATORS[ast.operator]} {right})'
+
+
+def _py_lambda(ast: LambdaAst, scope: _Scope) -> str:
+    outer = scope.function
+    function = _Function()
+    # the name is bound in the scope the function is defined in, so that
+    # the function reads it, or assigns it, from there
+    scope = scope.extend()
+    name = scope.bind(ast.name) if ast.name else f'λ{next(scope.counter)}'
+    scope = scope.extend(function)
+    params = [f'{scope.bind(param)}=False' for param in ast.params]
+    outer.defs.extend(_def(name, params, function, _tail(ast.body, scope)))
+    return name
+
+
+def _py_if(ast: IfAst, scope: _Scope) -> str:
+    else_ = _expression(ast.else_, scope) if ast.else_ is not None \
+        else 'False'
+    return (f'({_expression(ast.then, scope)} '
+            f'if {_condition(ast.cond, scope)} else {else_})')
+
+
+def _py_prog(ast: ProgAst, scope: _Scope) -> str:
+    if not ast.prog:
+        return 'False'
+    if len(ast.prog) == 1:
+        return _expression(ast.prog[0], scope)
+    exprs = ', '.join(_expression(expr, scope) for expr in ast.prog)
+    return f'({exprs})[-1]'
+
+
+def _py_call(ast: CallAst, scope: _Scope) -> str:
+    func = _expression(ast.func, scope)
+    args = ', '.join(_expression(arg, scope) for arg in ast.args)
+    return f'{func}({args})'
+
+
+def _py_let(ast: LetAst, scope: _Scope) -> str:
+    if not ast.vardefs:
+        # binds nothing, and opens no scope
+        return _expression(ast.body, scope)
+    scope = scope.extend()
+    exprs = []
+    for vardef in ast.vardefs:
+        value = _expression(vardef.define, scope) \
+            if vardef.define is not None else 'False'
+        exprs.append(f'({scope.bind(vardef.name)} := {value})')
+    exprs.append(_expression(ast.body, scope))
+    return f"({', '.join(exprs)})[-1]"
+
+
+def _py_raw(ast: JsAst, _: _Scope) -> str:
+    raise Exception(f"Cannot compile javascript to python: {ast}")
+
+
+def _py_unknown(ast: Ast, _: _Scope) -> str:
+    raise Exception(f"Dunno how to make python for {ast}")
+
+
+_EXPRESSION = Dispatcher({
+    LiteralAst: _py_literal,
+    VarAst: _py_var,
+    AssignAst: _py_assign,
+    BinaryAst: _py_binary,
+    LambdaAst: _py_lambda,
+    IfAst: _py_if,
+    ProgAst: _py_prog,
+    CallAst: _py_call,
+    LetAst: _py_let,
+    JsAst: _py_raw,
+}, default=_py_unknown)
+
+
+# pylint: disable=C0111
+def main():
+    with open(sys.argv[1]) as file:
+        ast = Parser(TokenStream(ChunkedInputStream(file)))()
+    if len(sys.argv) > 2 and sys.argv[2] == '--run':
+        global_env = Environment()
+        for name, func in primitive.items():
+            global_env.define(name, func)
+        evaluate(ast, global_env)
+    else:
+        print(to_python(ast))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,25 +6,20 @@ compiled from lambda.
 """
 import sys
 from ast import (AssignAst, Ast, BinaryAst, CallAst, IfAst, LambdaAst, LetAst,
-                 LiteralAst, ProgAst, VarAst, JsAst)
+                 LiteralAst, ProgAst, VarAst, JsAst, literal)
 from typing import Callable, Dict, List, Union
 
-from input_stream import InputStream
+from input_stream import ChunkedInputStream
 from parse import Parser
 from token_stream import TokenStream
-from utils import gensym
+from utils import Dispatcher, gensym
 
 
 # pylint: disable=missing-docstring
 
 
 def to_cps(ast: Ast, k: Callable[[Ast], Ast]) -> Ast:
-    try:
-        function = _MAPPING[type(ast)]
-    except Exception:
-        raise Exception(f"Dunno how to CPS {ast}")
-    else:
-        return function(ast, k)
+    return _MAPPING[type(ast)](ast, k)
 
 
 def _cps_let(let_ast: LetAst, k: Callable[[Ast], Ast]) -> Ast:
@@ -36,7 +31,7 @@ def _cps_let(let_ast: LetAst, k: Callable[[Ast], Ast]) -> Ast:
                 '',
                 [let_ast.vardefs[0].name],
                 LetAst(let_ast.vardefs[1:], let_ast.body)),
-            [let_ast.vardefs[0].define if let_ast.vardefs[0].define else LiteralAst(
+            [let_ast.vardefs[0].define if let_ast.vardefs[0].define else literal(
                 False)]),
         k)
 
@@ -44,7 +39,7 @@ def _cps_let(let_ast: LetAst, k: Callable[[Ast], Ast]) -> Ast:
 def _cps_prog(ast: ProgAst, k: Callable[[Ast], Ast]) -> Ast:
     def cps_body(body: List[Ast]) -> Ast:
         if not body:
-            return k(LiteralAst(False))
+            return k(literal(False))
         if len(body) == 1:
             return to_cps(body[0], k)
         return to_cps(
@@ -146,7 +141,11 @@ def _cps_js_raw(ast: JsAst, k: Callable[[Ast], Ast]) -> Ast:
     return k(ast)
 
 
-_MAPPING: Dict[Ast, Callable] = {
+def _cps_unknown(ast: Ast, _: Callable[[Ast], Ast]) -> Ast:
+    raise Exception(f"Dunno how to CPS {ast}")
+
+
+_MAPPING: Dict[type, Callable] = Dispatcher({
     LiteralAst: _cps_atom,
     VarAst: _cps_atom,
     AssignAst: _cps_binary,
@@ -157,14 +156,14 @@ _MAPPING: Dict[Ast, Callable] = {
     CallAst: _cps_call,
     IfAst: _cps_if,
     JsAst: _cps_js_raw,
-}
+}, default=_cps_unknown)
 
 
 def main():
     with open(sys.argv[1]) as file:
-        code = file.read()
-    parser = Parser(TokenStream(InputStream(code)))
-    cps_code = to_cps(parser(), lambda ast: CallAst(
+        parser = Parser(TokenStream(ChunkedInputStream(file)))
+        ast = parser()
+    cps_code = to_cps(ast, lambda ast: CallAst(
         VarAst('β_TOPLEVEL'),
         [ast],
     ))
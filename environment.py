@@ -3,15 +3,23 @@
 """
 Sturcture to hold variable info when we run program and optimize the program
 """
-from typing import Optional, Any, Dict, TypeVar
+from collections import ChainMap
+from types import MappingProxyType
+from typing import Optional, Any, List, MutableMapping, TypeVar
 
 T = TypeVar('T')
 
 
 class Environment:
     def __init__(self, parent: Optional['Environment'] = None):
-        self.vars: Dict[str, Any] = {}
+        # a read only mapping once frozen, a ChainMap over the frozen
+        # variables in a fork
+        self.vars: MutableMapping[str, Any] = {}
         self.parent: Optional['Environment'] = parent
+        # bumped whenever a variable of self is defined or set, so that
+        # inline caches of the global variables of self know their values
+        # are stale
+        self.version: int = 0
 
     def is_global(self):
         """
@@ -48,6 +56,7 @@ class Environment:
         :param value:
         :return:
         """
+        self.version += 1
         self.vars[var_name] = value
         return value
 
@@ -77,11 +86,136 @@ class Environment:
         """
         scope = self.lookup(var_name)
         if scope is not None:
+            scope.version += 1
             scope.vars[var_name] = value
         # not global environment
         elif self.parent is not None:
             raise Exception(f"Undefined variable {var_name}")
         # No parent, so current scope is global scope
         else:
+            self.version += 1
             self.vars[var_name] = value
         return value
+
+    def freeze(self) -> 'Environment':
+        """
+        Make the global environment self read only, typically once it holds
+        the primitives and the definitions of a prelude, so that it can be
+        forked. Defining or setting a variable in it raises TypeError from
+        then on.
+        Functions it holds keep their globals in it rather than in the forks
+        calling them, and values such as boxed variables of closures are
+        shared by every fork, not copied.
+        :return: self
+        """
+        if not self.is_global():
+            raise Exception("Only a global environment can be frozen")
+        if not self.is_frozen():
+            self.vars = MappingProxyType(dict(self.vars))
+        return self
+
+    def is_frozen(self) -> bool:
+        """
+        whether self is read only
+        :return:
+        """
+        return isinstance(self.vars, MappingProxyType)
+
+    def fork(self) -> 'Environment':
+        """
+        Create a global environment holding the variables of the frozen
+        environment self without copying them: defining or setting a
+        variable in the fork copies it into the fork, leaving self and
+        other forks unchanged.
+        :return:
+        """
+        if not self.is_frozen():
+            raise Exception("Only a frozen environment can be forked")
+        fork = Environment()
+        fork.vars = ChainMap({}, self.vars)
+        return fork
+
+
+class InlineCacheStats:
+    """
+    Hits and misses of the inline caches of global variables
+    """
+
+    def __init__(self):
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def reset(self) -> None:
+        """
+        zero the counters
+        :return:
+        """
+        self.hits = self.misses = 0
+
+    def hit_rate(self) -> float:
+        """
+        hits over lookups, or 0 before any lookup
+        :return:
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+GLOBAL_CACHE_STATS = InlineCacheStats()
+
+
+class Box:
+    """
+    A variable that is both captured by closures and assigned, shared by
+    the frames and closures holding it
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any):
+        self.value: Any = value
+
+
+class Frame:
+    """
+    Variables of one lambda call, or of top level code, in the slots the
+    resolver assigned to them: params, variables captured by the closure
+    and variables of lets. Variables bound by no lambda or let are kept by
+    name in the global environment that every frame of a run shares.
+    """
+    __slots__ = ('values', 'globals')
+
+    def __init__(self, values: List[Any], globals_: Environment):
+        self.values: List[Any] = values
+        self.globals: Environment = globals_
+
+    def get_global(self, var_ast: 'VarAst') -> Any:
+        """
+        Get the value of a global variable, from the inline cache of
+        var_ast if neither the global environment nor any of its variables
+        has changed since var_ast last looked it up.
+        :param var_ast:
+        :return:
+        """
+        cache = var_ast.cache
+        globals_ = self.globals
+        if cache is not None and cache[0] is globals_ and \
+                cache[1] == globals_.version:
+            GLOBAL_CACHE_STATS.hits += 1
+            return cache[2]
+        GLOBAL_CACHE_STATS.misses += 1
+        value = globals_.get(var_ast.name)
+        var_ast.cache = (globals_, globals_.version, value)
+        return value
+
+    def set_global(self, var_ast: 'VarAst', value: Any) -> Any:
+        """
+        Set a global variable. Outside of any lambda or let the variable is
+        defined if need be, as Environment.set does in a global environment;
+        inside one, it must already be defined.
+        :param var_ast:
+        :param value:
+        :return:
+        """
+        if var_ast.depth and self.globals.lookup(var_ast.name) is None:
+            raise Exception(f"Undefined variable {var_ast.name}")
+        return self.globals.set(var_ast.name, value)
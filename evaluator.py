@@ -6,18 +6,19 @@ evaluate ast to result
 import sys
 from ast import (AssignAst, Ast, BinaryAst, CallAst, IfAst, LambdaAst, LetAst,
                  LiteralAst, ProgAst, VarAst)
-from itertools import zip_longest
-from typing import Any, Callable
+from itertools import repeat
+from typing import Any, Callable, Sequence
 
-from environment import Environment
-from input_stream import InputStream
-from parse import Parser
+import quickening
+from ast_cache import AstCache, source_digest
+from environment import GLOBAL_CACHE_STATS, Box, Environment, Frame
+from parse import parse_files
 from primitive import primitive
-from token_stream import TokenStream
-from utils import apply_op
+from resolver import capture, resolve
+from utils import Dispatcher, apply_op
 
 
-def evaluate(ast: Ast, env: Environment) -> Any:
+def evaluate(ast: Ast, env: Environment, quicken: bool = False) -> Any:
     """
     For num, str, bool nodes, return their value;
     variable are fetched from the environment;
@@ -45,64 +46,213 @@ def evaluate(ast: Ast, env: Environment) -> Any:
     A named let of a form like 'let foo(var = value) body' is equivalent to
     '(lambda foo(var) body)(value)'
 
+    Before evaluation, resolver.resolve gives every variable bound by a
+    lambda or let its slot in the Frame of a lambda call, or of top level
+    code; other variables are global and live in env.
+
+    A call in tail position, that is the body of a lambda, the last
+    expression of a prog or of a let body and either branch of an if in
+    tail position, is a proper tail call: a call of a lambda there returns
+    the function and args to the loop running the lambda it is made from,
+    which calls it in place, so that tail recursion runs in constant
+    python stack. Other calls are python calls.
+
+    Quickened, every binary node specializes on the types of its operands,
+    as quickening.py describes, rather than applying its operator with
+    apply_op each time.
+
     :param ast:
     :param env:
+    :param quicken:
     :return:
     """
+    frame = Frame([False] * resolve(ast), env)
+    if quicken:
+        quickening.quicken(ast)
+    result = _EVALUATE_TAIL[type(ast)](ast, frame)
+    while type(result) is _TailCall:
+        result = result.enter(result.args)
+    return result
 
-    if isinstance(ast, LiteralAst):
-        return ast.value
-    if isinstance(ast, VarAst):
-        return env.get(ast.name)
-    if isinstance(ast, AssignAst):
-        left = ast.left
-        if not isinstance(left, VarAst):
-            raise Exception(f"Cannot assign to {ast.left}")
-        return env.set(left.name, evaluate(ast.right, env))
-    if isinstance(ast, BinaryAst):
-        return apply_op(ast.operator, evaluate(ast.left, env),
-                        evaluate(ast.right, env))
-    if isinstance(ast, LambdaAst):
-        return make_lambda(env, ast)
-    if isinstance(ast, IfAst):
-        cond = evaluate(ast.cond, env)
-        if cond is not False:
-            return evaluate(ast.then, env)
-        return evaluate(ast.else_, env)
-    if isinstance(ast, ProgAst):
-        result = False
-        for expr in ast.prog:
-            result = evaluate(expr, env)
-        return result
-    if isinstance(ast, CallAst):
-        func = evaluate(ast.func, env)
-        return func(*[evaluate(arg, env) for arg in ast.args])
-    if isinstance(ast, LetAst):
-        for var in ast.vardefs:
-            scope = env.extend()
-            # if an arg is not assigned some value,
-            # then False is assigned to the arg by the evaluator.
-            scope.define(var.name,
-                         evaluate(var.define, env) if var.define else False)
-            env = scope
-        return evaluate(ast.body, env)
+
+class _TailCall:
+    """
+    A call in tail position of a lambda made by make_lambda, left to the
+    loop of the caller: enter runs the body of the lambda with args, in
+    tail position.
+    """
+    __slots__ = ('enter', 'args')
+
+    def __init__(self, enter: Callable[[Sequence[Any]], Any],
+                 args: Sequence[Any]):
+        self.enter: Callable[[Sequence[Any]], Any] = enter
+        self.args: Sequence[Any] = args
+
+
+# Subexpressions are dispatched directly rather than through evaluate,
+# so that evaluating a node takes one python frame.
+def _evaluate_literal(ast: LiteralAst, _: Frame) -> Any:
+    return ast.value
+
+
+def _evaluate_var(ast: VarAst, frame: Frame) -> Any:
+    slot = ast.slot
+    if slot is None:
+        # the hit path of Frame.get_global, inlined
+        cache = ast.cache
+        globals_ = frame.globals
+        if cache is not None and cache[0] is globals_ and \
+                cache[1] == globals_.version:
+            GLOBAL_CACHE_STATS.hits += 1
+            return cache[2]
+        return frame.get_global(ast)
+    value = frame.values[slot]
+    return value.value if ast.boxed else value
+
+
+def _evaluate_assign(ast: AssignAst, frame: Frame) -> Any:
+    left = ast.left
+    if not isinstance(left, VarAst):
+        raise Exception(f"Cannot assign to {ast.left}")
+    right = ast.right
+    value = _EVALUATE[type(right)](right, frame)
+    if left.slot is None:
+        return frame.set_global(left, value)
+    if left.boxed:
+        frame.values[left.slot].value = value
+    else:
+        frame.values[left.slot] = value
+    return value
+
+
+def _evaluate_binary(ast: BinaryAst, frame: Frame) -> Any:
+    left, right = ast.left, ast.right
+    left_value = _EVALUATE[type(left)](left, frame)
+    right_value = _EVALUATE[type(right)](right, frame)
+    site = ast.site
+    if site is not None:
+        return site.handler(left_value, right_value)
+    return apply_op(ast.operator, left_value, right_value)
+
+
+def _evaluate_if(ast: IfAst, frame: Frame) -> Any:
+    cond = _EVALUATE[type(ast.cond)](ast.cond, frame)
+    branch = ast.then if cond is not False else ast.else_
+    return _EVALUATE[type(branch)](branch, frame)
+
+
+def _evaluate_prog(ast: ProgAst, frame: Frame) -> Any:
+    result = False
+    for expr in ast.prog:
+        result = _EVALUATE[type(expr)](expr, frame)
+    return result
+
+
+def _evaluate_call(ast: CallAst, frame: Frame) -> Any:
+    func = _EVALUATE[type(ast.func)](ast.func, frame)
+    return func(*[_EVALUATE[type(arg)](arg, frame) for arg in ast.args])
+
+
+def _evaluate_let(ast: LetAst, frame: Frame) -> Any:
+    _bind_let(ast, frame)
+    return _EVALUATE[type(ast.body)](ast.body, frame)
+
+
+def _bind_let(ast: LetAst, frame: Frame) -> None:
+    values = frame.values
+    for var in ast.vardefs:
+        # if an arg is not assigned some value,
+        # then False is assigned to the arg by the evaluator.
+        value = _EVALUATE[type(var.define)](var.define, frame) \
+            if var.define else False
+        values[var.slot] = Box(value) if var.boxed else value
+
+
+def _evaluate_unknown(ast: Ast, _: Frame) -> Any:
     raise Exception(f"I don't know how to evaluate {ast}")
 
 
+_EVALUATE = Dispatcher({
+    LiteralAst: _evaluate_literal,
+    VarAst: _evaluate_var,
+    AssignAst: _evaluate_assign,
+    BinaryAst: _evaluate_binary,
+    LambdaAst: lambda ast, frame: make_lambda(frame, ast),
+    IfAst: _evaluate_if,
+    ProgAst: _evaluate_prog,
+    CallAst: _evaluate_call,
+    LetAst: _evaluate_let,
+}, default=_evaluate_unknown)
+
+
+# Nodes in tail position, which return a _TailCall for a call of a lambda
+# made by make_lambda rather than calling it.
+def _evaluate_tail_if(ast: IfAst, frame: Frame) -> Any:
+    cond = _EVALUATE[type(ast.cond)](ast.cond, frame)
+    branch = ast.then if cond is not False else ast.else_
+    return _EVALUATE_TAIL[type(branch)](branch, frame)
+
+
+def _evaluate_tail_prog(ast: ProgAst, frame: Frame) -> Any:
+    if not ast.prog:
+        return False
+    *init, last = ast.prog
+    for expr in init:
+        _EVALUATE[type(expr)](expr, frame)
+    return _EVALUATE_TAIL[type(last)](last, frame)
+
+
+def _evaluate_tail_call(ast: CallAst, frame: Frame) -> Any:
+    func = _EVALUATE[type(ast.func)](ast.func, frame)
+    args = [_EVALUATE[type(arg)](arg, frame) for arg in ast.args]
+    enter = getattr(func, 'enter', None)
+    if enter is None:
+        # a primitive
+        return func(*args)
+    return _TailCall(enter, args)
+
+
+def _evaluate_tail_let(ast: LetAst, frame: Frame) -> Any:
+    _bind_let(ast, frame)
+    return _EVALUATE_TAIL[type(ast.body)](ast.body, frame)
+
+
+_EVALUATE_TAIL = Dispatcher({
+    **_EVALUATE,
+    IfAst: _evaluate_tail_if,
+    ProgAst: _evaluate_tail_prog,
+    CallAst: _evaluate_tail_call,
+    LetAst: _evaluate_tail_let,
+}, default=_evaluate_unknown)
+
+
 # pylint: disable=C0111
-def make_lambda(env: Environment, ast: LambdaAst) -> Callable:
-    def lambda_function(*args):
-        names = ast.params
-        assert len(names) >= len(args)
-        scope = env.extend()
-        for name, value in zip_longest(names, args, fillvalue=False):
-            scope.define(name, value)
-        return evaluate(ast.body, scope)
+def make_lambda(frame: Frame, ast: LambdaAst) -> Callable:
+    params, body, boxed = ast.params, ast.body, ast.boxed
+    globals_ = frame.globals
+
+    def enter(args: Sequence[Any]) -> Any:
+        assert len(params) >= len(args)
+        values = list(args)
+        # params without an arg are False
+        if len(values) < len(params):
+            values.extend(repeat(False, len(params) - len(values)))
+        values.extend(captured)
+        for slot in boxed:
+            values[slot] = Box(values[slot])
+        return _EVALUATE_TAIL[type(body)](body, Frame(values, globals_))
 
-    if ast.name:
-        env = env.extend()
-        env.define(ast.name, lambda_function)
+    def lambda_function(*args):
+        result = enter(args)
+        # run the calls in tail position in place
+        while type(result) is _TailCall:
+            result = result.enter(result.args)
+        return result
 
+    lambda_function.enter = enter
+    # the closure keeps only what it captures of frame
+    captured = capture(frame.values, ast.captures, ast.frame_size,
+                       lambda_function, len(params))
     return lambda_function
 
 # pylint: disable=C0111
@@ -112,11 +262,10 @@ def main():
     global_env = Environment()
     for name, func in primitive.items():
         global_env.define(name, func)
-    lambda_file_path = sys.argv[1]
-    with open(lambda_file_path) as file:
-        code = file.read()
-    parser = Parser(TokenStream(InputStream(code)))
-    evaluate(parser(), global_env)
+    paths = sys.argv[1:2]
+    ast = AstCache().load(source_digest(paths), 'parse',
+                          lambda: parse_files(paths))
+    evaluate(ast, global_env)
 
 
 if __name__ == '__main__':
@@ -6,94 +6,122 @@ continuation-passing style evaluator
 cps ensures that when we enter evaluate, all preceding function are tail calls,
 so all function stacks are garbage and can be thrown away.
 """
-from itertools import zip_longest
+from itertools import repeat
 from typing import Callable, Any, cast, List
 from ast import Ast, LiteralAst, VarAst, AssignAst, BinaryAst, LambdaAst, \
-    IfAst, ProgAst, CallAst, LetAst
+    IfAst, ProgAst, CallAst, LetAst, VarDefAst
 from callback_primitive import primitive
-from environment import Environment
+from environment import Box, Environment, Frame
 from input_stream import InputStream
 from parse import Parser
+from resolver import capture, resolve
 from token_stream import TokenStream
-from utils import apply_op
+from utils import Dispatcher, apply_op
 
 
 # pylint: disable=C0111
 def evaluate(
         ast: Ast, env: Environment, callback: Callable[[Any], Any]) -> None:
-    if isinstance(ast, LiteralAst):
-        callback(ast.value)
-    elif isinstance(ast, VarAst):
-        callback(env.get(ast.name))
-    elif isinstance(ast, AssignAst):
-        if not isinstance(ast.left, VarAst):
-            raise Exception(f"Cannot assign to {ast.left}")
-        left_ast: VarAst = cast(VarAst, ast.left)
-        evaluate(ast.right, env, lambda right: callback(
-            env.set(left_ast.name, right)))
-    elif isinstance(ast, BinaryAst):
-
-        def left_callback(left: Any) -> None:
-            def right_callback(right: Any) -> None:
-                callback(apply_op(binary_ast.operator, left, right))
-
-            evaluate(binary_ast.right, env, right_callback)
-
-        binary_ast = cast(BinaryAst, ast)
-        evaluate(binary_ast.left, env, left_callback)
-    elif isinstance(ast, LambdaAst):
-        callback(_make_lambda(env, ast))
-    elif isinstance(ast, IfAst):
-        if_ast = cast(IfAst, ast)
-
-        def if_callback(cond: Any) -> None:
-            if cond is not False:
-                evaluate(if_ast.then, env, callback)
-            else:
-                evaluate(if_ast.else_, env, callback)
+    _evaluate(ast, Frame([False] * resolve(ast), env), callback)
 
-        evaluate(if_ast.cond, env, if_callback)
-    elif isinstance(ast, LetAst):
-        _evaluate_let(ast, env, callback)
-    elif isinstance(ast, ProgAst):
 
-        def loop(last: Any, i: int) -> None:
-            if i < len(prog_ast.prog):
-                evaluate(prog_ast.prog[i], env,
-                         lambda value: loop(value, i + 1))
-            else:
-                callback(last)
+def _evaluate(
+        ast: Ast, frame: Frame, callback: Callable[[Any], Any]) -> None:
+    _EVALUATE[type(ast)](ast, frame, callback)
+
+
+def _evaluate_literal(ast: LiteralAst, _: Frame,
+                      callback: Callable[[Any], Any]) -> None:
+    callback(ast.value)
 
-        prog_ast = cast(ProgAst, ast)
-        loop(False, 0)
-    elif isinstance(ast, CallAst):
-        _evaluate_call(ast, env, callback)
 
+def _evaluate_var(ast: VarAst, frame: Frame,
+                  callback: Callable[[Any], Any]) -> None:
+    if ast.slot is None:
+        callback(frame.get_global(ast))
     else:
-        raise Exception(f"I don't know how to evaluate {ast}")
+        value = frame.values[ast.slot]
+        callback(value.value if ast.boxed else value)
 
 
-def _evaluate_let(let_ast: LetAst, env: Environment, callback: [[Any], Any]) -> None:
-    def loop(env: Environment, i: int) -> None:
+def _evaluate_assign(ast: AssignAst, frame: Frame,
+                     callback: Callable[[Any], Any]) -> None:
+    if not isinstance(ast.left, VarAst):
+        raise Exception(f"Cannot assign to {ast.left}")
+    left_ast: VarAst = cast(VarAst, ast.left)
+
+    def right_callback(right: Any) -> None:
+        if left_ast.slot is None:
+            callback(frame.set_global(left_ast, right))
+        else:
+            if left_ast.boxed:
+                frame.values[left_ast.slot].value = right
+            else:
+                frame.values[left_ast.slot] = right
+            callback(right)
+
+    _evaluate(ast.right, frame, right_callback)
+
+
+def _evaluate_binary(binary_ast: BinaryAst, frame: Frame,
+                     callback: Callable[[Any], Any]) -> None:
+    def left_callback(left: Any) -> None:
+        def right_callback(right: Any) -> None:
+            callback(apply_op(binary_ast.operator, left, right))
+
+        _evaluate(binary_ast.right, frame, right_callback)
+
+    _evaluate(binary_ast.left, frame, left_callback)
+
+
+def _evaluate_if(if_ast: IfAst, frame: Frame,
+                 callback: Callable[[Any], Any]) -> None:
+    def if_callback(cond: Any) -> None:
+        if cond is not False:
+            _evaluate(if_ast.then, frame, callback)
+        else:
+            _evaluate(if_ast.else_, frame, callback)
+
+    _evaluate(if_ast.cond, frame, if_callback)
+
+
+def _evaluate_prog(prog_ast: ProgAst, frame: Frame,
+                   callback: Callable[[Any], Any]) -> None:
+    def loop(last: Any, i: int) -> None:
+        if i < len(prog_ast.prog):
+            _evaluate(prog_ast.prog[i], frame,
+                      lambda value: loop(value, i + 1))
+        else:
+            callback(last)
+
+    loop(False, 0)
+
+
+def _evaluate_let(let_ast: LetAst, frame: Frame,
+                  callback: Callable[[Any], Any]) -> None:
+    def define(vardef: VarDefAst, value: Any) -> None:
+        frame.values[vardef.slot] = Box(value) if vardef.boxed else value
+
+    def loop(i: int) -> None:
         if i < len(let_ast.vardefs):
             vardef = let_ast.vardefs[i]
-            scope = env.extend()
             if vardef.define:
                 def define_callback(value: Any) -> None:
-                    scope.define(vardef.name, value)
-                    loop(scope, i + 1)
+                    define(vardef, value)
+                    loop(i + 1)
 
-                evaluate(vardef.define, env, define_callback)
+                _evaluate(vardef.define, frame, define_callback)
             else:
-                scope.define(vardef.name, False)
-                loop(scope, i + 1)
+                define(vardef, False)
+                loop(i + 1)
         else:
-            evaluate(let_ast.body, env, callback)
+            _evaluate(let_ast.body, frame, callback)
 
-    loop(env, 0)
+    loop(0)
 
 
-def _evaluate_call(call_ast: CallAst, env: Environment, callback: [[Any], Any]) -> None:
+def _evaluate_call(call_ast: CallAst, frame: Frame,
+                   callback: Callable[[Any], Any]) -> None:
     def call_callback(func: Callable[..., None]) -> None:
         def loop(i: int) -> None:
             def arg_callback(arg: Any) -> None:
@@ -101,33 +129,55 @@ def _evaluate_call(call_ast: CallAst, env: Environment, callback: [[Any], Any])
                 loop(i + 1)
 
             if i < len(call_ast.args):
-                evaluate(call_ast.args[i], env, arg_callback)
+                _evaluate(call_ast.args[i], frame, arg_callback)
             else:
                 func(*args)
 
         args: List[Callable, ...] = [callback] * (len(call_ast.args) + 1)
         loop(0)
 
-    evaluate(call_ast.func, env, call_callback)
+    _evaluate(call_ast.func, frame, call_callback)
+
+
+def _evaluate_unknown(ast: Ast, *_: Any) -> None:
+    raise Exception(f"I don't know how to evaluate {ast}")
 
 
 # pylint: disable=C0111
 
 
-def _make_lambda(env: Environment, ast: LambdaAst):
+def _make_lambda(frame: Frame, ast: LambdaAst):
+    globals_ = frame.globals
+
     def lambda_function(callback: Callable, *args: Any) -> None:
         assert len(ast.params) >= len(args)
-        scope = env.extend()
-        for name, value in zip_longest(ast.params, args, fillvalue=False):
-            scope.define(name, value)
-        evaluate(ast.body, scope, callback)
-
-    if ast.name:
-        env = env.extend()
-        env.define(ast.name, lambda_function)
+        values = list(args)
+        # params without an arg are False
+        values.extend(repeat(False, len(ast.params) - len(args)))
+        values.extend(captured)
+        for slot in ast.boxed:
+            values[slot] = Box(values[slot])
+        _evaluate(ast.body, Frame(values, globals_), callback)
+
+    # the closure keeps only what it captures of frame
+    captured = capture(frame.values, ast.captures, ast.frame_size,
+                       lambda_function, len(ast.params))
     return lambda_function
 
 
+_EVALUATE = Dispatcher({
+    LiteralAst: _evaluate_literal,
+    VarAst: _evaluate_var,
+    AssignAst: _evaluate_assign,
+    BinaryAst: _evaluate_binary,
+    LambdaAst: lambda ast, frame, callback: callback(_make_lambda(frame, ast)),
+    IfAst: _evaluate_if,
+    LetAst: _evaluate_let,
+    ProgAst: _evaluate_prog,
+    CallAst: _evaluate_call,
+}, default=_evaluate_unknown)
+
+
 def main():
     # code = "sum = lambda(x, y) x + y; print(sum(2, 3));"
     code = """
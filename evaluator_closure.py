@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+evaluate ast to result by compiling it to python closures first
+
+Where evaluator.py dispatches on the type of a node and reads its fields
+each time the node is evaluated, compile_ast does both once: every node
+becomes a closure taking the Frame to evaluate it in, with the closures
+of its children, its slots and its constants bound in its cells, and
+specialized on what is known before evaluation, such as the operator of a
+binary node, the number of args of a call or whether a variable is
+global, local or boxed. Evaluation then calls the closure of the root.
+
+The semantics are those of evaluator.py, down to the exceptions raised
+and when they are raised: nodes that cannot be evaluated compile to
+closures raising when they are.
+"""
+import sys
+from ast import (AssignAst, Ast, BinaryAst, CallAst, IfAst, LambdaAst, LetAst,
+                 LiteralAst, ProgAst, VarAst)
+from itertools import repeat
+from typing import Any, Callable
+
+from ast_cache import AstCache, source_digest
+from environment import GLOBAL_CACHE_STATS, Box, Environment, Frame
+from parse import parse_files
+from primitive import primitive
+from resolver import capture, resolve
+from utils import DIVISION_OPERATORS, NUMERIC_OPERATORS, Dispatcher, num
+
+Code = Callable[[Frame], Any]
+
+
+def evaluate(ast: Ast, env: Environment) -> Any:
+    """
+    Compile ast and run it in the global environment env
+    :param ast:
+    :param env:
+    :return:
+    """
+    return compile_ast(ast)(env)
+
+
+def compile_ast(ast: Ast) -> Callable[[Environment], Any]:
+    """
+    Compile ast, to be run in as many global environments as need be
+    :param ast:
+    :return: function running ast in a global environment
+    """
+    frame_size = resolve(ast)
+    code = _compile(ast)
+
+    def run(env: Environment) -> Any:
+        return code(Frame([False] * frame_size, env))
+
+    return run
+
+
+def _compile(ast: Ast) -> Code:
+    return _COMPILE[type(ast)](ast)
+
+
+def _compile_literal(ast: LiteralAst) -> Code:
+    value = ast.value
+    return lambda _: value
+
+
+def _compile_var(ast: VarAst) -> Code:
+    slot = ast.slot
+    if slot is not None:
+        if ast.boxed:
+            return lambda frame: frame.values[slot].value
+        return lambda frame: frame.values[slot]
+
+    def global_var(frame: Frame) -> Any:
+        # the hit path of Frame.get_global, inlined
+        cache = ast.cache
+        globals_ = frame.globals
+        if cache is not None and cache[0] is globals_ and \
+                cache[1] == globals_.version:
+            GLOBAL_CACHE_STATS.hits += 1
+            return cache[2]
+        return frame.get_global(ast)
+
+    return global_var
+
+
+def _compile_assign(ast: AssignAst) -> Code:
+    left = ast.left
+    if not isinstance(left, VarAst):
+        return _raise(f"Cannot assign to {ast.left}")
+    right = _compile(ast.right)
+    slot = left.slot
+    if slot is None:
+        return lambda frame: frame.set_global(left, right(frame))
+    if left.boxed:
+        def assign_boxed(frame: Frame) -> Any:
+            value = frame.values[slot].value = right(frame)
+            return value
+
+        return assign_boxed
+
+    def assign(frame: Frame) -> Any:
+        value = frame.values[slot] = right(frame)
+        return value
+
+    return assign
+
+
+def _compile_binary(ast: BinaryAst) -> Code:
+    left, right = _compile(ast.left), _compile(ast.right)
+    # both operands are evaluated whatever the operator, as apply_op has
+    # them evaluated
+    if ast.operator in NUMERIC_OPERATORS:
+        function = NUMERIC_OPERATORS[ast.operator]
+
+        def numeric(frame: Frame) -> Any:
+            left_operand, right_operand = left(frame), right(frame)
+            return function(num(left_operand), num(right_operand))
+
+        return numeric
+    if ast.operator in DIVISION_OPERATORS:
+        function = DIVISION_OPERATORS[ast.operator]
+
+        def division(frame: Frame) -> Any:
+            left_operand, right_operand = left(frame), right(frame)
+            left_operand = num(left_operand)
+            if num(right_operand) == 0:
+                raise Exception("Divide by zero")
+            return function(left_operand, right_operand)
+
+        return division
+    if ast.operator == '&&':
+        def and_(frame: Frame) -> Any:
+            left_operand, right_operand = left(frame), right(frame)
+            return False if left_operand is False else right_operand
+
+        return and_
+    if ast.operator == '||':
+        def or_(frame: Frame) -> Any:
+            left_operand, right_operand = left(frame), right(frame)
+            return right_operand if left_operand is False else left_operand
+
+        return or_
+    if ast.operator == '==':
+        return lambda frame: left(frame) == right(frame)
+    if ast.operator == '!=':
+        return lambda frame: left(frame) != right(frame)
+    message = f"Can't apply operator {ast.operator}"
+
+    def unknown(frame: Frame) -> Any:
+        left(frame)
+        right(frame)
+        raise Exception(message)
+
+    return unknown
+
+
+def _compile_if(ast: IfAst) -> Code:
+    cond, then = _compile(ast.cond), _compile(ast.then)
+    else_ = _compile(ast.else_)
+
+    def if_(frame: Frame) -> Any:
+        if cond(frame) is not False:
+            return then(frame)
+        return else_(frame)
+
+    return if_
+
+
+def _compile_prog(ast: ProgAst) -> Code:
+    if not ast.prog:
+        return lambda _: False
+    if len(ast.prog) == 1:
+        return _compile(ast.prog[0])
+    *init, last = [_compile(expr) for expr in ast.prog]
+
+    def prog(frame: Frame) -> Any:
+        for expr in init:
+            expr(frame)
+        return last(frame)
+
+    return prog
+
+
+def _compile_call(ast: CallAst) -> Code:
+    func = _compile(ast.func)
+    args = [_compile(arg) for arg in ast.args]
+    # the function is evaluated before its args, as in evaluator.py
+    if not args:
+        return lambda frame: func(frame)()
+    if len(args) == 1:
+        arg0, = args
+        return lambda frame: func(frame)(arg0(frame))
+    if len(args) == 2:
+        arg0, arg1 = args
+        return lambda frame: func(frame)(arg0(frame), arg1(frame))
+    if len(args) == 3:
+        arg0, arg1, arg2 = args
+        return lambda frame: func(frame)(arg0(frame), arg1(frame),
+                                         arg2(frame))
+    return lambda frame: func(frame)(*[arg(frame) for arg in args])
+
+
+def _compile_let(ast: LetAst) -> Code:
+    # if an arg is not assigned some value,
+    # then False is assigned to the arg by the evaluator.
+    vardefs = [(var.slot, var.boxed,
+                _compile(var.define) if var.define else None)
+               for var in ast.vardefs]
+    body = _compile(ast.body)
+
+    def let(frame: Frame) -> Any:
+        values = frame.values
+        for slot, boxed, define in vardefs:
+            value = define(frame) if define is not None else False
+            values[slot] = Box(value) if boxed else value
+        return body(frame)
+
+    return let
+
+
+def _compile_lambda(ast: LambdaAst) -> Code:
+    # what resolve laid out, which resolving the ast again may change
+    param_count, boxed = len(ast.params), ast.boxed
+    captures, frame_size = ast.captures, ast.frame_size
+    body = _compile(ast.body)
+
+    def make_lambda(frame: Frame) -> Callable:
+        globals_ = frame.globals
+
+        def lambda_function(*args):
+            assert param_count >= len(args)
+            values = list(args)
+            # params without an arg are False
+            if len(values) < param_count:
+                values.extend(repeat(False, param_count - len(values)))
+            values.extend(captured)
+            for slot in boxed:
+                values[slot] = Box(values[slot])
+            return body(Frame(values, globals_))
+
+        # the closure keeps only what it captures of frame
+        captured = capture(frame.values, captures, frame_size,
+                           lambda_function, param_count)
+        return lambda_function
+
+    return make_lambda
+
+
+def _compile_unknown(ast: Ast) -> Code:
+    return _raise(f"I don't know how to evaluate {ast}")
+
+
+def _raise(message: str) -> Code:
+    def raise_(_: Frame) -> Any:
+        raise Exception(message)
+
+    return raise_
+
+
+_COMPILE = Dispatcher({
+    LiteralAst: _compile_literal,
+    VarAst: _compile_var,
+    AssignAst: _compile_assign,
+    BinaryAst: _compile_binary,
+    LambdaAst: _compile_lambda,
+    IfAst: _compile_if,
+    ProgAst: _compile_prog,
+    CallAst: _compile_call,
+    LetAst: _compile_let,
+}, default=_compile_unknown)
+
+
+# pylint: disable=C0111
+def main():
+    global_env = Environment()
+    for name, func in primitive.items():
+        global_env.define(name, func)
+    paths = sys.argv[1:2]
+    ast = AstCache().load(source_digest(paths), 'parse',
+                          lambda: parse_files(paths))
+    evaluate(ast, global_env)
+
+
+if __name__ == '__main__':
+    main()
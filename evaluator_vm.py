@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Evaluate ast by compiling it to the bytecode of bytecode.py and running
+that in a single loop, whatever the depth of recursion of the program.
+
+The loop keeps the frames to return to as a linked list of records
+(code, pc, registers, target register, globals, next record), so that the
+python stack does not grow with calls and a call in tail position, which
+returns to the record of its caller, leaves the list as it is. The last
+record of a run has no code, and holds the callback receiving the result
+in place of registers.
+
+As in the cps evaluators, the result of a program is passed to a
+callback, and so is the result of a python function, which is called
+with a Continuation as first argument: the callback_primitive functions
+run unchanged. A Continuation is only the record to return to, shared:
+returning to a shared record runs a copy of its registers, and shares the
+record it returns to in turn, so that a Continuation stays valid after
+being called or after the function it was made for has returned, and
+calling it again resumes the same code with another value. The copies
+share the variables the code assigns, which bytecode.compile_ast boxes,
+so that a resumed frame sees the assignments made since the Continuation
+was made.
+It is called either by lambda code, which then goes on with the
+continuation, or by python code, in which case the loop that made it goes
+on with it once the python function has returned: `twice` calls its
+continuation twice and each resumes the rest of the program in turn,
+`halt` never calls it and the program stops.
+
+CallCC, as defined by callback_primitive, is run by the loop itself: its
+argument is called with the Continuation of the call to CallCC.
+"""
+import sys
+from collections import deque
+from itertools import repeat
+from typing import Any, Callable, Deque, List, Optional, Sequence, Tuple
+
+from ast import Ast
+from ast_cache import AstCache, source_digest
+from bytecode import (ADD, AND, BOX, CALL, DIV, EQ, GE, GT, JUMP,
+                      JUMP_IF_FALSE, LE, LOAD_BOX, LOAD_GLOBAL, LT,
+                      MAKE_CLOSURE, MOD, MOVE, MUL, NE, OR, RAISE, RETURN,
+                      STORE_BOX, STORE_GLOBAL, SUB, TAIL_CALL, Code,
+                      compile_ast)
+from callback_primitive import primitive
+from environment import GLOBAL_CACHE_STATS, Box, Environment, Frame
+from parse import parse_files
+from utils import apply_op
+
+CALL_CC = primitive['CallCC']
+_NUMBER = (int, float)
+
+# (code, pc, registers, target, globals, next record),
+# (None, 0, callback, 0, None, None) at the bottom of a run, or
+# (None, 1, record, 0, None, None) for a record shared by Continuations
+Record = Tuple[Optional[Code], int, Any, int, Optional[Frame],
+               Optional[tuple]]
+
+
+class Closure:
+    """
+    a lambda made by the vm, callable from python as the cps primitives
+    call functions: with a callback receiving its result first
+    """
+    __slots__ = ('code', 'captured', 'globals')
+
+    def __init__(self, code: Code, captured: List[Any], globals_: Frame):
+        self.code: Code = code
+        self.captured: List[Any] = captured
+        self.globals: Frame = globals_
+
+    def __call__(self, callback: Callable[[Any], Any], *args: Any) -> None:
+        code, registers, globals_ = _enter(self, list(args))
+        _Run().start(code, registers, globals_, _bottom(callback))
+
+
+class Continuation:
+    """
+    the rest of a computation, waiting for the value of a call
+    """
+    __slots__ = ('run', 'record')
+
+    def __init__(self, run: '_Run', record: Record):
+        self.run: '_Run' = run
+        self.record: Record = record
+
+    def __call__(self, value: Any = False) -> None:
+        run = self.run
+        if not run.active:
+            run = _ACTIVE[-1] if _ACTIVE else _Run()
+        run.pending.append((self.record, value))
+        if not run.active:
+            run.start()
+
+
+# runs whose loop is on the python stack, innermost last
+_ACTIVE: List['_Run'] = []
+
+
+def _bottom(callback: Callable[[Any], Any]) -> Record:
+    return None, 0, callback, 0, None, None
+
+
+def _share(record: Record) -> Record:
+    """
+    record, to be returned to in a copy of its registers
+    """
+    if record[0] is None:
+        return record
+    return None, 1, record, 0, None, None
+
+
+def execute(func: Callable, args: Sequence) -> Any:
+    """
+    Call func with args, as evaluator_callback_stack_guard.execute does:
+    the vm needs no trampoline, so that either evaluate can be run by
+    either execute
+    :param func:
+    :param args:
+    :return:
+    """
+    return func(*args)
+
+
+def evaluate(ast: Ast, env: Environment,
+             callback: Callable[[Any], Any]) -> None:
+    """
+    Compile ast and run it in the global environment env, passing its
+    result to callback
+    :param ast:
+    :param env:
+    :param callback:
+    :return:
+    """
+    code = compile_ast(ast)
+    run = _Run()
+    run.start(code, list(code.template), Frame([], env), _bottom(callback))
+
+
+class _Run:
+    """
+    A loop running code, together with the Continuations called from
+    python code during the run, that it resumes once the python code has
+    returned
+    """
+
+    def __init__(self):
+        self.pending: Deque[Tuple[Record, Any]] = deque()
+        self.active: bool = False
+
+    def start(self, code: Optional[Code] = None,
+              registers: Optional[List[Any]] = None,
+              globals_: Optional[Frame] = None,
+              stack: Optional[Record] = None) -> None:
+        """
+        Run code in a frame of registers, or the pending continuations
+        """
+        self.active = True
+        _ACTIVE.append(self)
+        try:
+            self._loop(code, registers, globals_, stack)
+        finally:
+            self.active = False
+            _ACTIVE.pop()
+
+    # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+    def _loop(self, code: Optional[Code], registers: Optional[List[Any]],
+              globals_: Optional[Frame], stack: Optional[Record]) -> None:
+        pending = self.pending
+        pc = 0
+        value = False
+        while True:
+            if code is None:
+                # return value to stack, or resume a pending continuation
+                # if stack is None
+                while True:
+                    if stack is None:
+                        if not pending:
+                            return
+                        stack, value = pending.popleft()
+                    if stack[0] is not None:
+                        code, pc, registers, target, globals_, stack = stack
+                        break
+                    if not stack[1]:
+                        stack[2](value)
+                        stack = None
+                        continue
+                    # a shared record runs in a copy of its registers,
+                    # and so does the one it returns to
+                    record = stack[2]
+                    if record[0] is None:
+                        stack = record
+                        continue
+                    code, pc, registers, target, globals_, stack = record
+                    registers = list(registers)
+                    stack = _share(stack)
+                    break
+                registers[target] = value
+            instructions = code.instructions
+            consts = code.consts
+            while True:
+                opcode = instructions[pc]
+                a = instructions[pc + 1]
+                b = instructions[pc + 2]
+                c = instructions[pc + 3]
+                pc += 4
+                if opcode == MOVE:
+                    registers[a] = registers[b]
+                elif opcode == LOAD_GLOBAL:
+                    var = consts[b]
+                    cache = var.cache
+                    if cache is not None and \
+                            cache[0] is globals_.globals and \
+                            cache[1] == globals_.globals.version:
+                        GLOBAL_CACHE_STATS.hits += 1
+                        registers[a] = cache[2]
+                    else:
+                        registers[a] = globals_.get_global(var)
+                elif opcode == JUMP_IF_FALSE:
+                    if registers[a] is False:
+                        pc = b
+                elif opcode == LT:
+                    left, right = registers[b], registers[c]
+                    if isinstance(left, _NUMBER) and \
+                            isinstance(right, _NUMBER):
+                        registers[a] = left < right
+                    else:
+                        registers[a] = apply_op('<', left, right)
+                elif opcode == SUB:
+                    left, right = registers[b], registers[c]
+                    if isinstance(left, _NUMBER) and \
+                            isinstance(right, _NUMBER):
+                        registers[a] = left - right
+                    else:
+                        registers[a] = apply_op('-', left, right)
+                elif opcode == ADD:
+                    left, right = registers[b], registers[c]
+                    if isinstance(left, _NUMBER) and \
+                            isinstance(right, _NUMBER):
+                        registers[a] = left + right
+                    else:
+                        registers[a] = apply_op('+', left, right)
+                elif opcode == CALL or opcode == TAIL_CALL:
+                    if opcode == CALL:
+                        func = registers[b]
+                        args = registers[b + 1:b + 1 + c]
+                        ret = (code, pc, registers, a, globals_, stack)
+                    else:
+                        func = registers[a]
+                        args = registers[a + 1:a + 1 + b]
+                        ret = stack
+                    while func is CALL_CC:
+                        ret = _share(ret)
+                        func = args[0] if args else False
+                        args = [Continuation(self, ret)]
+                    if type(func) is Closure:
+                        code, registers, globals_ = _enter(func, args)
+                        stack = ret
+                        pc = 0
+                        instructions = code.instructions
+                        consts = code.consts
+                    elif type(func) is Continuation:
+                        value = args[0] if args else False
+                        stack = func.record
+                        code = None
+                        break
+                    else:
+                        queued = len(pending)
+                        func(Continuation(self, _share(ret)), *args)
+                        # resume the continuations func called, in the
+                        # order it called them, before those queued earlier
+                        pending.rotate(len(pending) - queued)
+                        stack = None
+                        code = None
+                        break
+                elif opcode == RETURN:
+                    value = registers[a]
+                    code = None
+                    break
+                elif opcode == GT:
+                    left, right = registers[b], registers[c]
+                    if isinstance(left, _NUMBER) and \
+                            isinstance(right, _NUMBER):
+                        registers[a] = left > right
+                    else:
+                        registers[a] = apply_op('>', left, right)
+                elif opcode == JUMP:
+                    pc = a
+                elif opcode == LOAD_BOX:
+                    registers[a] = registers[b].value
+                elif opcode == MAKE_CLOSURE:
+                    callee = consts[b]
+                    registers[a] = Closure(
+                        callee, [registers[slot] for slot in callee.captures],
+                        globals_)
+                elif opcode == MUL:
+                    left, right = registers[b], registers[c]
+                    if isinstance(left, _NUMBER) and \
+                            isinstance(right, _NUMBER):
+                        registers[a] = left * right
+                    else:
+                        registers[a] = apply_op('*', left, right)
+                elif opcode == LE:
+                    registers[a] = apply_op('<=', registers[b], registers[c])
+                elif opcode == GE:
+                    registers[a] = apply_op('>=', registers[b], registers[c])
+                elif opcode == EQ:
+                    registers[a] = registers[b] == registers[c]
+                elif opcode == NE:
+                    registers[a] = registers[b] != registers[c]
+                elif opcode == DIV:
+                    registers[a] = apply_op('/', registers[b], registers[c])
+                elif opcode == MOD:
+                    registers[a] = apply_op('%', registers[b], registers[c])
+                elif opcode == AND:
+                    registers[a] = False if registers[b] is False \
+                        else registers[c]
+                elif opcode == OR:
+                    registers[a] = registers[c] if registers[b] is False \
+                        else registers[b]
+                elif opcode == STORE_BOX:
+                    registers[a].value = registers[b]
+                elif opcode == BOX:
+                    registers[a] = Box(registers[a])
+                elif opcode == STORE_GLOBAL:
+                    globals_.set_global(consts[b], registers[a])
+                elif opcode == RAISE:
+                    raise Exception(consts[a])
+                else:
+                    raise Exception(f"Unknown opcode {opcode}")
+
+
+def _enter(func: Closure, args: List[Any]) -> Tuple[Code, List[Any], Frame]:
+    """
+    the code, registers and globals of a call of func with args
+    """
+    code = func.code
+    if len(args) > code.param_count:
+        raise Exception(f"{code.name or 'λ'} takes {code.param_count} "
+                        f"args but got {len(args)}")
+    # params without an arg are False
+    if len(args) < code.param_count:
+        args.extend(repeat(False, code.param_count - len(args)))
+    if code.named:
+        args.insert(0, func)
+    args += func.captured
+    args += code.template
+    for slot in code.boxed:
+        args[slot] = Box(args[slot])
+    return code, args, func.globals
+
+
+# pylint: disable=C0111
+def main():
+    global_env = Environment()
+    for name, func in primitive.items():
+        global_env.define(name, func)
+    paths = sys.argv[1:2]
+    ast = AstCache().load(source_digest(paths), 'parse',
+                          lambda: parse_files(paths))
+    evaluate(ast, global_env,
+             lambda result: print(f"*** Result: {result}"))
+
+
+if __name__ == "__main__":
+    main()
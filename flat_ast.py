@@ -0,0 +1,452 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Flat, struct-of-arrays encoding of an ast for whole-program passes.
+
+Nodes are numbered breadth first from the root 0, so the children of a
+node are the consecutive nodes starts[i] to starts[i + 1] and every child
+comes after its parent. A node is a kind code, a value and its children:
+
+    kind      value                         children
+    LITERAL   value                         -
+    VAR       name                          -
+    JS        js code                       -
+    VARDEF    name                          define
+    LAMBDA    (name, params, iife_params)   body
+    LET       -                             vardef..., body
+    CALL      -                             func, arg...
+    PROG      -                             expression...
+    IF        -                             cond, then, else
+    BINARY    operator                      left, right
+    ASSIGN    -                             left, right
+
+Values are indexes into a pool of distinct values, -1 for none. A missing
+child, e.g. the define of "let (x) ...", is a node of kind NONE.
+
+The arrays and the pool serialize to one buffer that FlatAst.from_buffer
+reads in place, so a tree in multiprocessing.shared_memory is used by
+other processes without unpickling it. Since children follow parents,
+passes that combine the results of children, such as to_js, are a single
+backward sweep over the arrays with no recursion.
+"""
+import json
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ast import (AssignAst, Ast, BinaryAst, CallAst, IfAst, JsAst, LambdaAst,
+                 LetAst, LiteralAst, ProgAst, VarAst, VarDefAst,
+                 literal)
+from environment import Environment
+from input_stream import InputStream
+from parse import Parser
+from token_stream import RegexTokenStream
+
+NONE = 0
+LITERAL = 1
+VAR = 2
+JS = 3
+VARDEF = 4
+LAMBDA = 5
+LET = 6
+CALL = 7
+PROG = 8
+IF = 9
+BINARY = 10
+ASSIGN = 11
+
+_KINDS = {
+    LiteralAst: LITERAL,
+    VarAst: VAR,
+    JsAst: JS,
+    VarDefAst: VARDEF,
+    LambdaAst: LAMBDA,
+    LetAst: LET,
+    CallAst: CALL,
+    ProgAst: PROG,
+    IfAst: IF,
+    BinaryAst: BINARY,
+    AssignAst: ASSIGN,
+}
+# magic, number of nodes, size of the pool
+_HEADER = struct.Struct('=4sII')
+_MAGIC = b'FAST'
+_BOOL_OPERATORS = ('<', '>', '<=', '>=', '==', '!=')
+
+
+def _encode(ast: Optional[Ast]) -> Tuple[int, Any, List[Optional[Ast]]]:
+    """
+    :param ast:
+    :return: kind, value and children of ast
+    """
+    # pylint: disable=too-many-return-statements
+    if ast is None:
+        return NONE, None, []
+    kind = _KINDS.get(type(ast))
+    if kind == LITERAL:
+        return kind, ast.value, []
+    if kind == VAR:
+        return kind, ast.name, []
+    if kind == JS:
+        return kind, ast.js_code, []
+    if kind == VARDEF:
+        return kind, ast.name, [ast.define]
+    if kind == LAMBDA:
+        return (kind, (ast.name, tuple(ast.params), tuple(ast.iife_params)),
+                [ast.body])
+    if kind == LET:
+        return kind, None, [*ast.vardefs, ast.body]
+    if kind == CALL:
+        return kind, None, [ast.func, *ast.args]
+    if kind == PROG:
+        return kind, None, list(ast.prog)
+    if kind == IF:
+        return kind, None, [ast.cond, ast.then, ast.else_]
+    if kind == BINARY:
+        return kind, ast.operator, [ast.left, ast.right]
+    if kind == ASSIGN:
+        return kind, None, [ast.left, ast.right]
+    raise Exception(f"Dunno how to flatten {ast}")
+
+
+def _decode(kind: int, value: Any, children: List[Optional[Ast]]) \
+        -> Optional[Ast]:
+    # pylint: disable=too-many-return-statements
+    if kind == NONE:
+        return None
+    if kind == LITERAL:
+        return literal(value)
+    if kind == VAR:
+        return VarAst(value)
+    if kind == JS:
+        return JsAst(value)
+    if kind == VARDEF:
+        return VarDefAst(value, children[0])
+    if kind == LAMBDA:
+        name, params, iife_params = value
+        return LambdaAst(name, list(params), children[0], list(iife_params))
+    if kind == LET:
+        return LetAst(children[:-1], children[-1])
+    if kind == CALL:
+        return CallAst(children[0], children[1:])
+    if kind == PROG:
+        return ProgAst(children)
+    if kind == IF:
+        return IfAst(*children)
+    if kind == BINARY:
+        return BinaryAst(value, *children)
+    if kind == ASSIGN:
+        return AssignAst(*children)
+    raise Exception(f"Dunno how to unflatten kind {kind}")
+
+
+def _tuples(value: Any) -> Any:
+    # json turns the tuples of lambda values into lists
+    if isinstance(value, list):
+        return tuple(_tuples(item) for item in value)
+    return value
+
+
+class FlatAst:
+    """
+    an ast as arrays of node kinds, values and child ranges
+    """
+
+    def __init__(self, kinds: Sequence[int], values: Sequence[int],
+                 starts: Sequence[int], pool: List[Any]):
+        """
+        :param kinds: kind of each node
+        :param values: pool index of the value of each node, or -1
+        :param starts: children of node i are nodes starts[i] to
+        starts[i + 1], one more item than nodes
+        :param pool:
+        """
+        self.kinds = kinds
+        self.values = values
+        self.starts = starts
+        self.pool = pool
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def kind(self, index: int) -> int:
+        return self.kinds[index]
+
+    def value(self, index: int) -> Any:
+        value = self.values[index]
+        return None if value < 0 else self.pool[value]
+
+    def children(self, index: int) -> range:
+        return range(self.starts[index], self.starts[index + 1])
+
+    def walk(self, root: int = 0) -> Iterator[int]:
+        """
+        nodes of the subtree at root in depth first order, as the recursive
+        passes over ast visit them
+        :param root:
+        :return:
+        """
+        starts = self.starts
+        stack = [root]
+        while stack:
+            index = stack.pop()
+            yield index
+            stack.extend(range(starts[index + 1] - 1, starts[index] - 1, -1))
+
+    def to_ast(self) -> Ast:
+        """
+        build the ast encoded by self
+        """
+        kinds, values, starts, pool = (
+            self.kinds, self.values, self.starts, self.pool)
+        asts: List[Optional[Ast]] = [None] * len(kinds)
+        for index in range(len(kinds) - 1, -1, -1):
+            value = values[index]
+            start, end = starts[index], starts[index + 1]
+            asts[index] = _decode(kinds[index],
+                                  None if value < 0 else pool[value],
+                                  asts[start:end])
+            # children are only needed by their parent
+            asts[start:end] = [None] * (end - start)
+        return asts[0]
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize self in native byte order; FlatAst.from_buffer reads the
+        result in place.
+        """
+        pool = json.dumps(self.pool).encode()
+        # keep the arrays aligned
+        pool += b' ' * (-len(pool) % 4)
+        return b''.join([
+            _HEADER.pack(_MAGIC, len(self), len(pool)), pool,
+            array('i', self.values).tobytes(),
+            array('i', self.starts).tobytes(),
+            array('b', self.kinds).tobytes()])
+
+    @classmethod
+    def from_buffer(cls, buffer) -> 'FlatAst':
+        """
+        read a FlatAst serialized by to_bytes without copying its arrays
+        :param buffer: bytes, or the buf of a SharedMemory
+        :return:
+        """
+        view = memoryview(buffer)
+        magic, size, pool_size = _HEADER.unpack_from(view)
+        if magic != _MAGIC:
+            raise Exception("Not a flat ast")
+        offset = _HEADER.size
+        pool = _tuples(json.loads(bytes(view[offset:offset + pool_size])))
+        offset += pool_size
+        values = view[offset:offset + 4 * size].cast('i')
+        offset += 4 * size
+        starts = view[offset:offset + 4 * (size + 1)].cast('i')
+        offset += 4 * (size + 1)
+        kinds = view[offset:offset + size].cast('b')
+        return cls(kinds, values, starts, pool)
+
+
+def flatten(ast: Ast) -> FlatAst:
+    """
+    encode ast as a FlatAst
+    :param ast:
+    :return:
+    """
+    kinds = array('b')
+    values = array('i')
+    starts = array('i')
+    pool: List[Any] = []
+    # literal True and 1.0 are equal, and so are 0.0 and -0.0
+    pool_indexes: Dict[Tuple[type, str], int] = {}
+    queue: List[Optional[Ast]] = [ast]
+    for index, node in enumerate(queue):
+        kind, value, children = _encode(node)
+        kinds.append(kind)
+        if value is None:
+            values.append(-1)
+        else:
+            key = (type(value), repr(value))
+            pool_index = pool_indexes.get(key)
+            if pool_index is None:
+                pool_index = pool_indexes[key] = len(pool)
+                pool.append(value)
+            values.append(pool_index)
+        starts.append(len(queue))
+        queue.extend(children)
+        queue[index] = None
+    starts.append(len(queue))
+    return FlatAst(kinds, values, starts, pool)
+
+
+class FlatScope:
+    """
+    Variables of a FlatAst, as _make_scope of optimize finds them: each
+    variable has an id, and the arrays below are indexed by that id.
+    """
+
+    def __init__(self, size: int):
+        # variable of each VAR node, -1 for other nodes
+        self.variables = array('i', [-1]) * size
+        self.names: List[str] = []
+        # 1 -> global var, 2 -> lambda param var, 3 -> iife var
+        self.kinds = array('b')
+        self.refs = array('i')
+        self.assigned = array('i')
+        # node last assigned to the variable, -1 if never assigned
+        self.current_values = array('i')
+        self.global_environment = Environment()
+
+    def define(self, env: Environment, name: str, kind: int) -> int:
+        variable = len(self.names)
+        self.names.append(name)
+        self.kinds.append(kind)
+        self.refs.append(0)
+        self.assigned.append(0)
+        self.current_values.append(-1)
+        env.define(name, variable)
+        return variable
+
+
+def make_scope(flat: FlatAst) -> FlatScope:
+    """
+    resolve the variables of flat the way _make_scope of optimize does
+    :param flat:
+    :return:
+    """
+    kinds, values, starts, pool = (
+        flat.kinds, flat.values, flat.starts, flat.pool)
+    scope = FlatScope(len(flat))
+    variables, refs = scope.variables, scope.refs
+    global_environment = scope.global_environment
+    assignments = []
+    stack: List[Tuple[int, Environment]] = [(0, global_environment)]
+    while stack:
+        index, env = stack.pop()
+        kind = kinds[index]
+        if kind == VAR:
+            name = pool[values[index]]
+            defining_env = env.lookup(name)
+            if defining_env is None:
+                variable = scope.define(global_environment, name, 1)
+            else:
+                variable = defining_env.vars[name]
+            variables[index] = variable
+            refs[variable] += 1
+        elif kind == LAMBDA:
+            name, params, iife_params = pool[values[index]]
+            env = env.extend()
+            if name:
+                scope.define(env, name, 2)
+            for param in params:
+                scope.define(env, param, 2)
+            for param in iife_params:
+                scope.define(env, param, 3)
+            stack.append((starts[index], env))
+        elif kind in (ASSIGN, BINARY, IF, PROG, CALL):
+            start = starts[index]
+            if kind == ASSIGN and kinds[start] == VAR:
+                assignments.append(start)
+            stack.extend((child, env) for child in
+                         range(starts[index + 1] - 1, start - 1, -1))
+    # variables are resolved once the whole tree is walked
+    for left in assignments:
+        variable = scope.variables[left]
+        scope.assigned[variable] += 1
+        scope.current_values[variable] = left + 1
+    return scope
+
+
+def to_js(flat: FlatAst, scope: Optional[FlatScope] = None) -> str:
+    """
+    the javascript code compiler.to_js makes of flat.to_ast()
+    :param flat:
+    :param scope: make_scope(flat) if already at hand
+    :return:
+    """
+    # pylint: disable=too-many-locals,too-many-branches
+    if scope is None:
+        scope = make_scope(flat)
+    kinds, values, starts, pool = (
+        flat.kinds, flat.values, flat.starts, flat.pool)
+    size = len(kinds)
+    codes: List[Optional[str]] = [None] * size
+    is_bool = array('b', [0]) * size
+    # literals are pooled, so each one is dumped once
+    literal_codes: Dict[int, str] = {}
+    for index in range(size - 1, -1, -1):
+        kind = kinds[index]
+        value_index = values[index]
+        if kind == VAR:
+            codes[index] = pool[value_index]
+            continue
+        if kind == LITERAL:
+            code = literal_codes.get(value_index)
+            if code is None:
+                code = literal_codes[value_index] = json.dumps(
+                    pool[value_index])
+            codes[index] = code
+            continue
+        value = pool[value_index] if value_index >= 0 else None
+        start, end = starts[index], starts[index + 1]
+        children = codes[start:end]
+        codes[start:end] = [None] * (end - start)
+        if kind == JS:
+            code = f'({value})'
+        elif kind == BINARY:
+            code = f"({children[0]} {value} {children[1]})"
+            if value in _BOOL_OPERATORS:
+                is_bool[index] = 1
+            elif value in ('&&', '||'):
+                is_bool[index] = is_bool[start] and is_bool[start + 1]
+        elif kind == ASSIGN:
+            code = f"({children[0]} = {children[1]})"
+        elif kind == LAMBDA:
+            name, params, iife_params = value
+            name = name or 'β_CC'
+            code = f"(function {name}({', '.join(params)}) {{"
+            if iife_params:
+                code += f"let {', '.join(iife_params)};"
+            code += f'GUARD(arguments, {name});return {children[0]} }})'
+        elif kind == VARDEF:
+            code = children[0] or 'false'
+        elif kind == LET:
+            # immediately invoked functions, as in compiler._js_let
+            code = children[-1]
+            for vardef in range(end - 2, start - 1, -1):
+                code = (f'((function β_CC({pool[values[vardef]]}) {{'
+                        f'GUARD(arguments, β_CC);return {code} }})'
+                        f'({children[vardef - start]}))')
+        elif kind == IF:
+            cond, then, else_ = children
+            if else_ is None:
+                raise Exception(f"Dunno how to make_js for {None}")
+            if not is_bool[start]:
+                cond += ' !== false'
+            code = f'({cond} ? {then} : {else_})'
+        elif kind == PROG:
+            code = f"({', '.join(children)})" if children else '(false)'
+        elif kind == CALL:
+            code = f"{children[0]}({', '.join(children[1:])})"
+        elif kind == NONE:
+            code = None
+        else:
+            raise Exception(f"Dunno how to make_js for kind {kind}")
+        codes[index] = code
+    global_variables = ', '.join(
+        name for name, variable in scope.global_environment.vars.items()
+        if scope.assigned[variable])
+    if global_variables:
+        global_variables = "let " + global_variables + ";"
+    return '"use strict";' + global_variables + codes[0]
+
+
+# pylint: disable=C0111
+def main():
+    with open(sys.argv[1]) as file:
+        flat = flatten(Parser(RegexTokenStream(InputStream(file.read())))())
+    print(f"{len(flat)} nodes, {len(flat.to_bytes())} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Incremental re-lexing and re-parsing of an edited source.
+
+The lexer keeps no state between tokens, so after an edit new tokens are
+lexed from the end of the last token before the edit, only until lexing
+meets, past the edit, the start of an old token. From there on the old
+tokens are reused with shifted offsets.
+
+Likewise the parser keeps no state between top-level expressions, so only
+the top-level expressions from the one touching the edit are re-parsed,
+until parsing meets the start of an old top-level expression. From there
+on the old ASTs in ProgAst.prog are reused.
+
+The new tokens and ASTs are spliced into the arrays of the buffer and
+into ProgAst.prog in place, and the offsets of the tokens after an edit,
+like the token indexes where the top-level expressions after it start,
+are shifted lazily: an edit rewrites only those between it and the
+previous edit. An edit thus takes python work in proportion to the text
+re-lexed and re-parsed and to its distance from the previous edit, plus
+copies of memory in proportion to the source: the new source string, and
+the moves of the tails of the arrays and of ProgAst.prog by the splices.
+"""
+# pylint: disable=W0212
+from array import array
+from typing import List, Tuple
+
+from ast import Ast, ProgAst
+from input_stream import InputStream
+from parse import Parser
+from token_stream import RegexTokenStream, TokenBuffer
+from utils import bisect_shifted, shift_slice
+
+
+class IncrementalParser:
+    """
+    Keep the source, token buffer and ast of a program up to date
+    under text edits.
+    """
+
+    def __init__(self, source: str):
+        self.source: str = source
+        self.buffer: TokenBuffer = RegexTokenStream(
+            InputStream(source)).tokenize_all()
+        self.ast: ProgAst = ProgAst([])
+        # token index where each top-level expression starts; those from
+        # _shifted_from on are _shift short of it, shifted lazily as the
+        # offsets of the buffer are
+        self._starts: array = array('l')
+        self._shifted_from: int = 0
+        self._shift: int = 0
+        prog, starts, _ = self._parse(0, 0, 0)
+        self.ast = ProgAst(prog)
+        self._starts = array('l', starts)
+
+    def edit(self, start: int, end: int, text: str) -> ProgAst:
+        """
+        replace source[start:end] with text, updating the buffer and the
+        ast in place.
+        If the new source does not lex or parse, an exception is raised
+        and the parser is left unchanged.
+        :return: the ast of the new source
+        """
+        source = self.source[:start] + text + self.source[end:]
+        delta = len(text) - (end - start)
+        first, resume, lexed = self._relex(source, start, end + delta, delta)
+        shift = len(lexed) - (resume - first)
+        # re-parse from the top-level expression that peeks the first
+        # changed token
+        index = max(self._bisect(first) - 1, 0)
+        replaced = self.buffer.splice(first, resume, lexed, delta)
+        try:
+            prog, starts, reused = self._parse(
+                self._start(index) if self._starts else 0, resume, shift)
+        except Exception:
+            self.buffer.splice(first, first + len(lexed), replaced, -delta)
+            raise
+        self.source = source
+        self.ast.prog[index:reused] = prog
+        self._shift_from(index)
+        self._starts[index:reused] = array('l', starts)
+        self._shifted_from = index + len(starts)
+        self._shift += shift
+        return self.ast
+
+    def _relex(self, source: str, start: int, end: int, delta: int) \
+            -> Tuple[int, int, TokenBuffer]:
+        """
+        :param source: the new source
+        :param start: start of the edited text in new source
+        :param end: end of the edited text in new source
+        :param delta: change of source length
+        :return: index of the first changed token, index of the first old
+        token that is reused, and the tokens lexed in between
+        """
+        old = self.buffer
+        first = old.bisect_end(start)
+        input_stream = InputStream(source)
+        input_stream.seek(old.end(first - 1) if first else 0)
+        lexed = TokenBuffer(input_stream)
+        resume = len(old)
+        for kind, value, token_start, token_end \
+                in RegexTokenStream(input_stream).scan():
+            if token_start >= end:
+                index = old.bisect_start(token_start - delta, first)
+                if index < len(old) \
+                        and old.start(index) == token_start - delta:
+                    resume = index
+                    break
+            lexed.append(kind, value, token_start, token_end)
+        return first, resume, lexed
+
+    def _parse(self, index: int, resume: int,
+               shift: int) -> Tuple[List[Ast], List[int], int]:
+        """
+        parse top-level expressions from token index until end of buffer,
+        or until meeting the start of an old expression whose tokens are
+        reused, i.e. from old token index resume on.
+        :param shift: new token index minus old token index of reused tokens
+        :return: asts and start token indexes of the expressions, and the
+        index of the first old expression reused
+        """
+        buffer = self.buffer
+        parser = Parser(buffer)
+        buffer.seek(index)
+        prog: List[Ast] = []
+        starts: List[int] = []
+        while not buffer.eof():
+            old_index = buffer.index - shift
+            reused = self._bisect(max(old_index, resume))
+            if reused < len(self._starts) \
+                    and self._start(reused) == old_index:
+                return prog, starts, reused
+            starts.append(buffer.index)
+            prog.append(parser._parse_expression())
+            if not buffer.eof():
+                parser._skip_punc(";")
+        return prog, starts, len(self._starts)
+
+    def _start(self, index: int) -> int:
+        """
+        token index where the top-level expression at index starts
+        """
+        if index >= self._shifted_from:
+            return self._starts[index] + self._shift
+        return self._starts[index]
+
+    def _bisect(self, token_index: int) -> int:
+        """
+        index of the first top-level expression starting at or after
+        token_index
+        """
+        return bisect_shifted(self._starts, token_index, self._shifted_from,
+                              self._shift)
+
+    def _shift_from(self, index: int) -> None:
+        """
+        make the expression starts shifted lazily those from index on
+        """
+        low, high = self._shifted_from, index
+        shift = self._shift
+        if low > high:
+            low, high, shift = high, low, -shift
+        shift_slice(self._starts, low, high, shift)
+        self._shifted_from = index
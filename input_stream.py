@@ -3,18 +3,60 @@
 """
 Input Stream
 """
+from array import array
+from bisect import bisect_left
+from typing import Iterable, List, Match, Optional, Pattern, Sequence, \
+    TextIO, Tuple
+
+
+class ParseError(Exception):
+    """
+    syntax error at a line and column of the source
+    """
+
+    def __init__(self, message: str, line: int, col: int):
+        super().__init__(f"{message} ({line}:{col})")
+        self.message: str = message
+        self.line: int = line
+        self.col: int = col
+
+    def __reduce__(self):
+        return ParseError, (self.message, self.line, self.col)
 
 
 class InputStream:
     """
     Input Stream
+
+    Only the offset of the next character is tracked while reading.
+    Line and column are computed on demand from a newline index that is
+    built the first time a position is asked for.
     """
 
     def __init__(self, input_: str):
         self._pos: int = 0
-        self._line: int = 1
-        self._col: int = 0
         self._input: str = input_
+        self._newlines: Optional[List[int]] = None
+
+    @property
+    def offset(self) -> int:
+        """
+        offset of the next value in the stream
+        """
+        return self._pos
+
+    @property
+    def source(self) -> Optional[str]:
+        """
+        the whole source text, or None if it is not held in memory
+        """
+        return self._input
+
+    def seek(self, offset: int) -> None:
+        """
+        move the stream to offset
+        """
+        self._pos = offset
 
     def next(self) -> str:
         """
@@ -28,11 +70,6 @@ class InputStream:
         except IndexError:
             char = ""
         self._pos += 1
-        if char == "\n":
-            self._line += 1
-            self._col = 0
-        else:
-            self._col += 1
         return char
 
     def peek(self) -> str:
@@ -46,6 +83,18 @@ class InputStream:
         except IndexError:
             return ""
 
+    def match(self, pattern: Pattern[str]) -> Optional[Match[str]]:
+        """
+        match the compiled pattern at current position. On success the
+        matched text is discarded from the stream in one step.
+        :param pattern:
+        :return: the match object, or None if pattern does not match
+        """
+        match = pattern.match(self._input, self._pos)
+        if match is not None:
+            self._pos = match.end()
+        return match
+
     def eof(self) -> bool:
         """
         returns true if and only if there are no more values in the stream.
@@ -53,11 +102,175 @@ class InputStream:
         """
         return self.peek() == ""
 
-    def croak(self, msg: str) -> None:
+    def position(self, offset: Optional[int] = None) -> Tuple[int, int]:
+        """
+        (line, col) of offset, which defaults to the current offset.
+        Line starts from 1, col is the number of characters read since the
+        last newline.
+        :param offset:
+        :return:
+        """
+        if offset is None:
+            offset = self.offset
+        if self._newlines is None:
+            self._newlines = _index_newlines(self._input)
+        line = bisect_left(self._newlines, offset)
+        line_start = self._newlines[line - 1] + 1 if line else 0
+        return line + 1, offset - line_start
+
+    def croak(self, msg: str, offset: Optional[int] = None) -> None:
         """
-        raise exception with error msg and error location
+        raise ParseError with error msg and error location
         whenever encountered error.
         :param msg:
+        :param offset: error location, defaults to the current offset
         :return:
         """
-        raise Exception(f"{msg} ({self._line}:{self._col})")
+        line, col = self.position(offset)
+        raise ParseError(msg, line, col)
+
+
+class ChunkedInputStream(InputStream):
+    """
+    Input stream over a text reader, e.g. an opened file, that keeps only a
+    sliding window of the source in memory instead of the whole text.
+
+    The window is refilled chunk by chunk as it is consumed; the part
+    already read is dropped on each refill. Newline offsets are recorded as
+    chunks are loaded, so positions stay available for any offset.
+    """
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, reader: TextIO, chunk_size: int = CHUNK_SIZE):
+        super().__init__("")
+        self._reader: TextIO = reader
+        self._chunk_size: int = chunk_size
+        # offset of self._input[0] in the whole source
+        self._base: int = 0
+        self._loaded: int = 0
+        self._exhausted: bool = False
+        self._newlines: Sequence[int] = array('l')
+
+    @property
+    def offset(self) -> int:
+        return self._base + self._pos
+
+    @property
+    def source(self) -> Optional[str]:
+        return None
+
+    def seek(self, offset: int) -> None:
+        """
+        Only offsets inside the window can be reached.
+        """
+        index = offset - self._base
+        if not 0 <= index <= len(self._input):
+            raise Exception(f"Cannot seek to {offset} outside of window")
+        self._pos = index
+
+    def _fill(self) -> bool:
+        """
+        drop consumed text from the window and append next chunk of reader,
+        a chunk at least as long as what is left of the window, so that a
+        token spanning many chunks takes as many refills as it has doublings
+        and copying the window costs time linear in the token
+        :return: false if reader is exhausted
+        """
+        if self._exhausted:
+            return False
+        chunk = self._reader.read(
+            max(self._chunk_size, len(self._input) - self._pos))
+        if not chunk:
+            self._exhausted = True
+            return False
+        index = chunk.find("\n")
+        while index != -1:
+            self._newlines.append(self._loaded + index)
+            index = chunk.find("\n", index + 1)
+        self._loaded += len(chunk)
+        self._base += self._pos
+        self._input = self._input[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def next(self) -> str:
+        if self._pos >= len(self._input):
+            self._fill()
+        return super().next()
+
+    def peek(self) -> str:
+        if self._pos >= len(self._input):
+            self._fill()
+        return super().peek()
+
+    def match(self, pattern: Pattern[str]) -> Optional[Match[str]]:
+        """
+        A match that ends at the end of the window, or a failed match near
+        the end of the window, may change once more text is available,
+        so refill and match again before accepting it.
+        """
+        while True:
+            match = pattern.match(self._input, self._pos)
+            if match is None:
+                retry = len(self._input) - self._pos < self._chunk_size
+            else:
+                retry = match.end() == len(self._input)
+            if not (retry and self._fill()):
+                break
+        if match is not None:
+            self._pos = match.end()
+        return match
+
+
+class FileChain:
+    """
+    Reader over several text files in sequence. Each file is opened only
+    when the previous one is used up, so several source files can be fed to
+    ChunkedInputStream without building a concatenated copy.
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        self._paths = iter(paths)
+        self._file: Optional[TextIO] = None
+
+    def read(self, size: int) -> str:
+        """
+        read at most size characters, return empty string when all files are
+        used up.
+        """
+        while True:
+            if self._file is None:
+                path = next(self._paths, None)
+                if path is None:
+                    return ""
+                self._file = open(path)
+            chunk = self._file.read(size)
+            if chunk:
+                return chunk
+            self.close()
+
+    def close(self) -> None:
+        """
+        close the file being read
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'FileChain':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _index_newlines(text: str) -> List[int]:
+    """
+    offsets of all newlines in text, in ascending order
+    """
+    newlines = []
+    index = text.find("\n")
+    while index != -1:
+        newlines.append(index)
+        index = text.find("\n", index + 1)
+    return newlines
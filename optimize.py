@@ -11,19 +11,19 @@ Following means are applied:
    a kind of tail call optimization
 5. If a variable is assigned but never used, we can drop the assignment.
 """
+import operator
 import sys
 from ast import (AssignAst, Ast, BinaryAst, CallAst, IfAst, LambdaAst,
-                 LiteralAst, ProgAst, VarAst, VarDefine)
+                 LiteralAst, ProgAst, VarAst, VarDefine, literal)
 from compiler import to_js
 from itertools import zip_longest
 from typing import List, cast
 
 from cps_transformer import to_cps
+from ast_cache import AstCache, source_digest
 from environment import Environment
-from input_stream import InputStream
-from parse import Parser
-from token_stream import TokenStream
-from utils import apply_op, gensym, has_side_effect
+from parse import parse_files
+from utils import Dispatcher, apply_op, gensym, has_side_effect
 
 
 # pylint: disable=missing-docstring
@@ -37,39 +37,25 @@ class Optimizer:
         entry method
         """
         while True:
+            ast = _unshared(ast)
             self.closure: Ast = ast
             self.changes = 0
             _make_scope(ast)
             ast = self._optimize_aux(ast)
             if not self.changes:
                 break
+        ast = _unshared(ast)
         _make_scope(ast)
         return ast
 
-    # pylint: disable=too-many-return-statements
     def _optimize_aux(self, ast: Ast) -> Ast:
-        if isinstance(ast, (LiteralAst, VarAst)):
-            return ast
-        if isinstance(ast, IfAst):
-            return self._optimize_if_ast(ast)
-        if isinstance(ast, BinaryAst):
-            return self._optimize_binary_ast(ast)
-        if isinstance(ast, LambdaAst):
-            return self._optimize_lambda_ast(ast)
-        if isinstance(ast, AssignAst):
-            return self._optimize_assign_ast(ast)
-        if isinstance(ast, CallAst):
-            return self._optimize_call_ast(ast)
-        if isinstance(ast, ProgAst):
-            return self._optimize_prog_ast(ast)
-
-        return ast
+        return self._OPTIMIZE[type(ast)](self, ast)
 
     def _optimize_prog_ast(self, ast: ProgAst) -> Ast:
         prog = ast.prog
         if not prog:
             self.changes += 1
-            return LiteralAst(False)
+            return literal(False)
         if len(prog) == 1:
             # self.changes += 1
             return self._optimize_aux(prog[0])
@@ -89,6 +75,8 @@ class Optimizer:
 
         func = self._optimize_aux(func)
         args = [self._optimize_aux(arg) for arg in ast.args]
+        if func is ast.func and all(map(operator.is_, args, ast.args)):
+            return ast
         return CallAst(func, args)
 
     def _optimize_if_ast(self, ast: IfAst) -> Ast:
@@ -103,12 +91,14 @@ class Optimizer:
         if isinstance(cond, VarAst) and _is_constant_var(cond):
             # For lambda function params, we don't know its current value,
             # so its current value is assigned None
-            if cond.define.current_value == LiteralAst(False):
+            if cond.define.current_value == literal(False):
                 self.changes += 1
                 return else_
             if isinstance(cond.define.current_value, (LiteralAst, LambdaAst)):
                 self.changes += 1
                 return then
+        if cond is ast.cond and then is ast.then and else_ is ast.else_:
+            return ast
         return IfAst(cond, then, else_)
 
     def _optimize_binary_ast(self, ast: BinaryAst) -> Ast:
@@ -119,7 +109,9 @@ class Optimizer:
         if isinstance(left, LiteralAst) and isinstance(right, LiteralAst):
             self.changes += 1
             result = apply_op(ast.operator, left.value, right.value)
-            return LiteralAst(result)
+            return literal(result)
+        if left is ast.left and right is ast.right:
+            return ast
         return BinaryAst(ast.operator, left, right)
 
     def _unwrap_iife(self, iife_ast: CallAst) -> ProgAst:
@@ -156,7 +148,7 @@ class Optimizer:
         prog: List[Ast] = [AssignAst(
             VarAst(rename_iife_param(param)),
             arg
-        ) for param, arg in zip_longest(iife_func.params, iife_args, fillvalue=LiteralAst(False))]
+        ) for param, arg in zip_longest(iife_func.params, iife_args, fillvalue=literal(False))]
 
         prog.append(self._optimize_aux(iife_func.body))
         return ProgAst(prog)
@@ -180,6 +172,8 @@ class Optimizer:
                     return self._optimize_aux(right)
         left = self._optimize_aux(ast.left)
         right = self._optimize_aux(ast.right)
+        if left is ast.left and right is ast.right:
+            return ast
         return AssignAst(left, right)
 
     def _optimize_lambda_ast(self, ast: LambdaAst) -> Ast:
@@ -226,6 +220,16 @@ class Optimizer:
         self.closure = save
         return ast
 
+    # literals, variables and unknown asts are left as they are
+    _OPTIMIZE = Dispatcher({
+        IfAst: _optimize_if_ast,
+        BinaryAst: _optimize_binary_ast,
+        LambdaAst: _optimize_lambda_ast,
+        AssignAst: _optimize_assign_ast,
+        CallAst: _optimize_call_ast,
+        ProgAst: _optimize_prog_ast,
+    }, default=lambda self, ast: ast)
+
 
 def _is_constant_var(var_ast: VarAst) -> bool:
     """
@@ -239,75 +243,120 @@ def _is_constant_var(var_ast: VarAst) -> bool:
     return var_ast.define.assigned == 0
 
 
+def _unshared(ast: Ast) -> Ast:
+    # _make_scope sets the env of the root, which must not be a LiteralAst
+    # that literal() shares
+    if isinstance(ast, LiteralAst):
+        return LiteralAst(ast.value)
+    return ast
+
+
 def _make_scope(ast: Ast) -> Environment:
     global_environment = Environment()
     ast.env = global_environment
-
-    def _make_scope_aux(ast: Ast, env: Environment) -> None:
-        if isinstance(ast, VarAst):
-            def _make_scope_aux_var_ast():
-                nonlocal env
-                scope = env.lookup(ast.name)
-                if scope is None:
-                    ast.env = global_environment
-                    global_environment.define(ast.name, VarDefine(kind=1))
-                else:
-                    ast.env = scope
-                define: VarDefine = ast.env.get(ast.name)
-                define.refs.append(ast)
-                ast.define = define
-
-            _make_scope_aux_var_ast()
-        if isinstance(ast, LambdaAst):
-            def _make_scope_aux_lambda_ast():
-                nonlocal env
-                ast.env = env = env.extend()
-                if ast.name:
-                    env.define(ast.name, VarDefine(kind=2))
-                for _, param in enumerate(ast.params):
-                    env.define(param, VarDefine(kind=2))
-                for param in ast.iife_params:
-                    env.define(param, VarDefine(kind=3))
-                _make_scope_aux(ast.body, env)
-
-            ast = cast(LambdaAst, ast)
-            _make_scope_aux_lambda_ast()
-        if isinstance(ast, AssignAst):
-            _make_scope_aux(ast.left, env)
-            _make_scope_aux(ast.right, env)
-            if isinstance(ast.left, VarAst):
-                ast.left.define.assigned += 1
-                ast.left.define.current_value = ast.right
-        if isinstance(ast, BinaryAst):
-            _make_scope_aux(ast.left, env)
-            _make_scope_aux(ast.right, env)
-
-        if isinstance(ast, IfAst):
-            _make_scope_aux(ast.cond, env)
-            _make_scope_aux(ast.then, env)
-            if ast.else_:
-                _make_scope_aux(ast.else_, env)
-        if isinstance(ast, ProgAst):
-            for prog in ast.prog:
-                _make_scope_aux(prog, env)
-        if isinstance(ast, CallAst):
-            _make_scope_aux(ast.func, env)
-            for arg in ast.args:
-                _make_scope_aux(arg, env)
-
-    _make_scope_aux(ast, global_environment)
+    _make_scope_aux(ast, global_environment, global_environment)
     return ast.env
 
 
+def _make_scope_aux(ast: Ast, env: Environment,
+                    global_environment: Environment) -> None:
+    _MAKE_SCOPE[type(ast)](ast, env, global_environment)
+
+
+def _make_scope_var(ast: VarAst, env: Environment,
+                    global_environment: Environment) -> None:
+    scope = env.lookup(ast.name)
+    if scope is None:
+        ast.env = global_environment
+        global_environment.define(ast.name, VarDefine(kind=1))
+    else:
+        ast.env = scope
+    define: VarDefine = ast.env.get(ast.name)
+    define.refs.append(ast)
+    ast.define = define
+
+
+def _make_scope_lambda(ast: LambdaAst, env: Environment,
+                       global_environment: Environment) -> None:
+    ast.env = env = env.extend()
+    if ast.name:
+        env.define(ast.name, VarDefine(kind=2))
+    for _, param in enumerate(ast.params):
+        env.define(param, VarDefine(kind=2))
+    for param in ast.iife_params:
+        env.define(param, VarDefine(kind=3))
+    _make_scope_aux(ast.body, env, global_environment)
+
+
+def _make_scope_assign(ast: AssignAst, env: Environment,
+                       global_environment: Environment) -> None:
+    _make_scope_aux(ast.left, env, global_environment)
+    _make_scope_aux(ast.right, env, global_environment)
+    if isinstance(ast.left, VarAst):
+        ast.left.define.assigned += 1
+        ast.left.define.current_value = ast.right
+
+
+def _make_scope_binary(ast: BinaryAst, env: Environment,
+                       global_environment: Environment) -> None:
+    _make_scope_aux(ast.left, env, global_environment)
+    _make_scope_aux(ast.right, env, global_environment)
+
+
+def _make_scope_if(ast: IfAst, env: Environment,
+                   global_environment: Environment) -> None:
+    _make_scope_aux(ast.cond, env, global_environment)
+    _make_scope_aux(ast.then, env, global_environment)
+    if ast.else_:
+        _make_scope_aux(ast.else_, env, global_environment)
+
+
+def _make_scope_prog(ast: ProgAst, env: Environment,
+                     global_environment: Environment) -> None:
+    for prog in ast.prog:
+        _make_scope_aux(prog, env, global_environment)
+
+
+def _make_scope_call(ast: CallAst, env: Environment,
+                     global_environment: Environment) -> None:
+    _make_scope_aux(ast.func, env, global_environment)
+    for arg in ast.args:
+        _make_scope_aux(arg, env, global_environment)
+
+
+_MAKE_SCOPE = Dispatcher({
+    VarAst: _make_scope_var,
+    LambdaAst: _make_scope_lambda,
+    AssignAst: _make_scope_assign,
+    BinaryAst: _make_scope_binary,
+    IfAst: _make_scope_if,
+    ProgAst: _make_scope_prog,
+    CallAst: _make_scope_call,
+}, default=lambda ast, env, global_environment: None)
+
+
+def compile_files(paths: List[str], cache: AstCache) -> Ast:
+    """
+    parse, cps transform and optimize the concatenated content of files,
+    reusing the asts of any stage found in cache
+    :param paths:
+    :param cache:
+    :return: optimized ast ready for to_js
+    """
+    digest = source_digest(paths)
+
+    def optimize() -> Ast:
+        ast = cache.load(digest, 'parse', lambda: parse_files(paths))
+        ast = to_cps(ast, lambda ast: CallAst(VarAst('β_TOPLEVEL'), [ast]))
+        # print(ast)
+        return Optimizer().optimize(ast)
+
+    return cache.load(digest, 'optimize', optimize)
+
+
 # pylint: disable=missing-docstring
 def main():
-    with open(sys.argv[1]) as file:
-        code = file.read()
-    parser = Parser(TokenStream(InputStream(code)))
-    ast = parser()
-    ast = to_cps(ast, lambda ast: CallAst(VarAst('β_TOPLEVEL'), [ast]))
-    # print(ast)
-    ast = Optimizer().optimize(ast)
+    ast = compile_files(sys.argv[1:2], AstCache())
     # print(ast)
     js_code = to_js(ast)
     print(js_code)
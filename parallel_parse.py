@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Parse the top-level expressions of a large source in parallel.
+
+The source is cut into chunks at top-level ";", found by a light scan that
+only tracks brackets, strings and comments. Chunks are parsed as programs
+of their own in a process pool and their expressions are joined into one
+ProgAst. If anything goes wrong, the whole source is parsed sequentially,
+which also reports syntax errors with their position in the whole source.
+"""
+import gc
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from ast import Ast, ProgAst
+from input_stream import InputStream
+from parse import Parser
+from token_stream import RegexTokenStream
+from utils import gensym_counter, set_gensym_counter
+
+# strings, comments, brackets and separators; nothing else can hide or
+# delimit a top-level ";"
+_SCAN = re.compile(r'"(?:[^"\\]|\\.)*"?|#[^\n]*|[;(){}\[\]]', re.DOTALL)
+_OPEN = set('({[')
+_CLOSE = set(')}]')
+CHUNKS_PER_WORKER = 4
+MIN_CHUNK_SIZE = 1 << 16
+
+
+def split_toplevel(source: str, chunks: int) -> List[Tuple[int, int]]:
+    """
+    Cut source into at most chunks pieces of about the same size, each
+    ending right after a top-level ";" except the last one.
+    :param source:
+    :param chunks:
+    :return: start and end offsets of the pieces
+    """
+    size = len(source) // chunks
+    bounds = []
+    start = 0
+    depth = 0
+    for match in _SCAN.finditer(source):
+        char = match.group()
+        if char in _OPEN:
+            depth += 1
+        elif char in _CLOSE:
+            depth -= 1
+        elif char == ';' and depth == 0 and match.end() - start >= size:
+            bounds.append((start, match.end()))
+            start = match.end()
+            if len(bounds) == chunks - 1:
+                break
+    bounds.append((start, len(source)))
+    return bounds
+
+
+def _parse_chunk(code: str, counter: int) -> List[Ast]:
+    """
+    parse code in a worker
+    :param code:
+    :param counter: gensym counter to start from
+    :return: top-level expressions
+    """
+    set_gensym_counter(counter)
+    return Parser(RegexTokenStream(InputStream(code)))().prog
+
+
+def _parse_chunks(source: str, bounds: List[Tuple[int, int]],
+                  workers: int) -> ProgAst:
+    # parsing consumes at least two characters per gensym, so starting
+    # the gensym counter of each chunk at its offset keeps names apart
+    counter = gensym_counter()
+    prog: List[Ast] = []
+    # Unpickled asts are acyclic, but each batch of them would trigger
+    # a collection traversing all the asts received so far.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with ProcessPoolExecutor(workers) as executor:
+            for asts in executor.map(
+                    _parse_chunk,
+                    [source[start:end] for start, end in bounds],
+                    [counter + start for start, _ in bounds]):
+                prog.extend(asts)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    set_gensym_counter(counter + len(source))
+    return ProgAst(prog)
+
+
+def parse_parallel(source: str, workers: Optional[int] = None,
+                   min_chunk_size: int = MIN_CHUNK_SIZE) -> ProgAst:
+    """
+    parse source with a pool of worker processes
+    :param source:
+    :param workers: number of processes, os.cpu_count() by default
+    :param min_chunk_size: smaller pieces of source are not worth a task
+    :return: the same ast as Parser, except that names made by gensym
+    differ
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = min(workers * CHUNKS_PER_WORKER,
+                 max(len(source) // min_chunk_size, 1))
+    bounds = split_toplevel(source, chunks)
+    if workers > 1 and len(bounds) > 1:
+        try:
+            return _parse_chunks(source, bounds, workers)
+        # e.g. a syntax error, reported below with its position in source
+        except Exception:  # pylint: disable=broad-except
+            pass
+    return Parser(RegexTokenStream(InputStream(source)))()
+
+
+if __name__ == '__main__':
+    with open(sys.argv[1]) as f:
+        ast = parse_parallel(f.read())
+    print(ast)
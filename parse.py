@@ -4,15 +4,18 @@
 parse token_stream into ast
 """
 import sys
-from typing import Callable, List, TypeVar, Union, cast
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, \
+    Tuple, TypeVar, Union, cast
 
 from ast import Ast, LiteralAst, VarAst, VarDefAst, LambdaAst, LetAst, \
-    CallAst, ProgAst, IfAst, BinaryAst, AssignAst, JsAst
-from input_stream import InputStream
-from token_stream import TokenStream, Token
+    CallAst, ProgAst, IfAst, BinaryAst, AssignAst, JsAst, literal
+from input_stream import ChunkedInputStream, FileChain, ParseError
+from token_stream import KEYWORD_TOKENS, KW, NULL_TOKEN, NUM, OP, \
+    OPERATOR_TOKENS, PUNC, PUNCTUATION_TOKENS, STR, Token, TokenStream, VAR
 from utils import gensym
 
 T = TypeVar('T')  # Can be anything
+LEFT_PAREN = PUNCTUATION_TOKENS['(']
 
 
 class Parser:
@@ -30,6 +33,8 @@ class Parser:
 
     def __init__(self, token_stream: TokenStream):
         self._token_stream = token_stream
+        # errors recorded so far when parsing with recovery, else None
+        self._diagnostics: Optional[List[ParseError]] = None
 
     def _skip_punc(self, char: str) -> None:
         if self._is_punc(char):
@@ -39,7 +44,7 @@ class Parser:
 
     def _is_punc(self, char: str) -> bool:
         token = self._token_stream.peek()
-        return token == Token('punc', char)
+        return token is PUNCTUATION_TOKENS.get(char)
 
     def _skip_kw(self, char: str) -> None:
         if self._is_kw(char):
@@ -49,7 +54,7 @@ class Parser:
 
     def _is_kw(self, char: str) -> bool:
         token = self._token_stream.peek()
-        return token == Token('kw', char)
+        return token is KEYWORD_TOKENS.get(char)
 
     def _skip_op(self, char: str) -> None:
         if self._is_op(char):
@@ -59,7 +64,7 @@ class Parser:
 
     def _is_op(self, char: str) -> bool:
         token = self._token_stream.peek()
-        return token == Token('op', char)
+        return token is OPERATOR_TOKENS.get(char)
 
     def _delimited(self, start: str, stop: str, separator: str,
                    parser: Callable[[], T]) -> List[T]:
@@ -88,7 +93,7 @@ class Parser:
 
     def _parse_lambda(self, keyword: str) -> LambdaAst:
         self._skip_kw(keyword)
-        if self._token_stream.peek().type == 'var':
+        if self._token_stream.peek().kind == VAR:
             name = self._token_stream.next().value
         else:
             name = ''
@@ -103,11 +108,11 @@ class Parser:
         :return:
         """
         self._skip_kw('let')
-        if self._token_stream.peek().type == 'var':
+        if self._token_stream.peek().kind == VAR:
             name = self._token_stream.next().value
             vardefs = self._delimited('(', ')', ',', self._parse_vardef)
             varnames = [vardef.name for vardef in vardefs]
-            defines = [vardef.define if vardef.define else LiteralAst(False)
+            defines = [vardef.define if vardef.define else literal(False)
                        for vardef in vardefs]
             return CallAst(
                 LambdaAst(
@@ -139,11 +144,13 @@ class Parser:
         :return: varname
         """
         token = self._token_stream.next()
-        if token.type == 'var':
+        if token.kind == VAR:
             return token.value
         return self._token_stream.croak('Expecting variable name')
 
     def _parse_toplevel(self) -> ProgAst:
+        if self._diagnostics is not None:
+            return ProgAst(self._parse_statements_recovering(False))
         prog = []
         while not self._token_stream.eof():
             prog.append(self._parse_expression())
@@ -151,13 +158,70 @@ class Parser:
                 self._skip_punc(";")
         return ProgAst(prog)
 
+    def _at_statements_end(self, in_block: bool) -> bool:
+        return self._token_stream.eof() or in_block and self._is_punc('}')
+
+    def _parse_statements_recovering(self, in_block: bool) -> List[Ast]:
+        """
+        Parse expressions separated by ";" until the end of input, or until
+        the "}" closing the block. An expression with an error is recorded
+        in diagnostics and left out.
+        :param in_block:
+        :return:
+        """
+        prog = []
+        while True:
+            try:
+                if self._at_statements_end(in_block):
+                    return prog
+                prog.append(self._parse_expression())
+                if not self._at_statements_end(in_block):
+                    self._skip_punc(";")
+            except ParseError as error:
+                self._recover(error, in_block)
+
+    def _recover(self, error: ParseError, in_block: bool) -> None:
+        """
+        Record error, then skip tokens past the next ";", or up to the
+        next "}" closing the block, not counting those nested in brackets.
+        Unbalanced closing brackets are skipped. Lexing errors met while
+        skipping are recorded too.
+        :param error:
+        :param in_block:
+        :return:
+        """
+        diagnostics = cast(List[ParseError], self._diagnostics)
+        diagnostics.append(error)
+        depth = 0
+        while True:
+            try:
+                token = self._token_stream.peek()
+            except ParseError as lexing_error:
+                diagnostics.append(lexing_error)
+                continue
+            if token is NULL_TOKEN:
+                return
+            if token.kind == PUNC:
+                char = token.value
+                if char in '({[':
+                    depth += 1
+                elif char in ')]}':
+                    if depth:
+                        depth -= 1
+                    elif char == '}' and in_block:
+                        return
+                elif char == ';' and not depth:
+                    self._token_stream.next()
+                    return
+            self._token_stream.next()
+
     def _parse_if(self) -> IfAst:
         self._skip_kw("if")
         cond = self._parse_expression()
         if not self._is_punc('{'):
             self._skip_kw('then')
         then = self._parse_expression()
-        else_ = LiteralAst(False)
+        else_ = literal(False)
         if self._is_kw('else'):
             self._skip_kw('else')
             else_ = self._parse_expression()
@@ -190,19 +254,23 @@ class Parser:
                 return self._parse_lambda('λ')
             if self._is_kw('js'):
                 return self._parse_js_raw()
-            token = self._token_stream.next()
-            if token.type in ('str', 'num'):
-                return LiteralAst(token.value)
-            if token.type == 'var':
+            token = self._token_stream.peek()
+            if token.kind == STR or token.kind == NUM:
+                self._token_stream.next()
+                return literal(token.value)
+            if token.kind == VAR:
+                self._token_stream.next()
                 return VarAst(token.value)
-            self.unexpected()
+            return self.unexpected()
 
         return self._maybe_call(parser)
 
     def _parse_js_raw(self):
         self._token_stream.next()
-        token = self._token_stream.next()
-        assert token.type == 'str'
+        token = self._token_stream.peek()
+        if token.kind != STR:
+            return self._token_stream.croak('Expecting code string')
+        self._token_stream.next()
         return JsAst(token.value)
 
     def _parse_prog(self) -> ProgAst:
@@ -212,7 +280,12 @@ class Parser:
         Otherwise it returns a "prog" node containing the expressions.
         :return:
         """
-        prog = self._delimited("{", "}", ";", self._parse_expression)
+        if self._diagnostics is not None:
+            self._skip_punc('{')
+            prog = self._parse_statements_recovering(True)
+            self._skip_punc('}')
+        else:
+            prog = self._delimited("{", "}", ";", self._parse_expression)
         # if len(prog) == 0:
         #     return LiteralAst(False)
         # if len(prog) == 1:
@@ -221,8 +294,8 @@ class Parser:
 
     def _parse_bool(self) -> LiteralAst:
         token = self._token_stream.next()
-        assert token.type == 'kw'
-        return LiteralAst(token.value == 'true')
+        assert token.kind == KW
+        return literal(token.value == 'true')
 
     def _parse_expression(self) -> Ast:
         """
@@ -250,7 +323,7 @@ class Parser:
                                 binary_ast.right)),
                         [binary_ast.left])
                 elif binary_ast.operator == '&&':
-                    ast = IfAst(binary_ast.left, binary_ast.right, LiteralAst(False))
+                    ast = IfAst(binary_ast.left, binary_ast.right, literal(False))
             return ast
 
         return self._maybe_call(parser)
@@ -289,9 +362,11 @@ class Parser:
         :return:
         """
         token = self._token_stream.peek()
-        if token.type != 'op':
+        if token.kind != OP:
             return left
-        his_prec = self.PRECEDENCE[token.value]
+        his_prec = self.PRECEDENCE.get(token.value)
+        if his_prec is None:
+            return self.unexpected()
         if his_prec > my_prec:
             self._token_stream.next()
             right = self._maybe_binary(self._parse_atom(), his_prec)
@@ -305,6 +380,22 @@ class Parser:
     def __call__(self) -> ProgAst:
         return self._parse_toplevel()
 
+    def parse_recovering(self) -> Tuple[ProgAst, List[ParseError]]:
+        """
+        Parse the whole token stream without stopping at the first error.
+        An expression with an error is left out of the ast, and parsing
+        resumes after the next ";", or at the "}" closing the enclosing
+        block.
+        :return: the ast of the expressions without errors, and the errors
+        in source order
+        """
+        self._diagnostics = []
+        try:
+            ast = self._parse_toplevel()
+        finally:
+            diagnostics, self._diagnostics = self._diagnostics, None
+        return ast, diagnostics
+
     def unexpected(self):
         """
         raise exception with error msg and error location
@@ -314,8 +405,389 @@ class Parser:
             f'Unexpected token: {self._token_stream.peek()}')
 
 
+class PrattParser(Parser):
+    """
+    Parser whose atoms are dispatched through a table of prefix parsers
+    keyed by token, and whose binary operators are folded in a loop driven
+    by Parser.PRECEDENCE. It produces the same asts as Parser.
+    """
+    # prefix parsers of punctuation and keyword tokens; number, string and
+    # variable tokens are dispatched on token kind
+    PREFIX: Dict[Token, Callable[['PrattParser'], Ast]] = {
+        PUNCTUATION_TOKENS['(']: lambda parser: parser._parse_parenthesized(),
+        PUNCTUATION_TOKENS['{']: lambda parser: parser._parse_prog(),
+        KEYWORD_TOKENS['if']: lambda parser: parser._parse_if(),
+        KEYWORD_TOKENS['let']: lambda parser: parser._parse_let(),
+        KEYWORD_TOKENS['true']: lambda parser: parser._parse_bool(),
+        KEYWORD_TOKENS['false']: lambda parser: parser._parse_bool(),
+        KEYWORD_TOKENS['lambda']:
+            lambda parser: parser._parse_lambda('lambda'),
+        KEYWORD_TOKENS['λ']: lambda parser: parser._parse_lambda('λ'),
+        KEYWORD_TOKENS['js']: lambda parser: parser._parse_js_raw(),
+    }
+
+    def _parse_parenthesized(self) -> Ast:
+        self._skip_punc('(')
+        exp = self._parse_expression()
+        self._skip_punc(')')
+        return exp
+
+    def _parse_atom(self) -> Ast:
+        token_stream = self._token_stream
+        token = token_stream.peek()
+        kind = token.kind
+        if kind == VAR:
+            token_stream.next()
+            expr: Ast = VarAst(token.value)
+        elif kind == NUM or kind == STR:
+            token_stream.next()
+            expr = literal(token.value)
+        else:
+            prefix = self.PREFIX.get(token)
+            if prefix is None:
+                return self.unexpected()
+            expr = prefix(self)
+        if token_stream.peek() is LEFT_PAREN:
+            return self._parse_call(expr)
+        return expr
+
+    def _parse_expression(self) -> Ast:
+        ast = self._maybe_binary(self._parse_atom(), 0)
+        if isinstance(ast, BinaryAst):
+            if ast.operator == '||':
+                iife_param = gensym('left')
+                ast = CallAst(
+                    LambdaAst(
+                        '',
+                        [iife_param],
+                        IfAst(
+                            VarAst(iife_param),
+                            VarAst(iife_param),
+                            ast.right)),
+                    [ast.left])
+            elif ast.operator == '&&':
+                ast = IfAst(ast.left, ast.right, literal(False))
+        if self._token_stream.peek() is LEFT_PAREN:
+            return self._parse_call(ast)
+        return ast
+
+    def _maybe_binary(self, left: Ast, my_prec: int) -> Ast:
+        """
+        Fold operators binding tighter than my_prec into left.
+        Recursion only happens when precedence rises, so a chain of
+        operators of the same precedence is folded in one loop.
+        :param left:
+        :param my_prec:
+        :return:
+        """
+        token_stream = self._token_stream
+        precedence = self.PRECEDENCE
+        while True:
+            token = token_stream.peek()
+            if token.kind != OP:
+                return left
+            his_prec = precedence.get(token.value)
+            if his_prec is None:
+                return self.unexpected()
+            if his_prec <= my_prec:
+                return left
+            token_stream.next()
+            right = self._maybe_binary(self._parse_atom(), his_prec)
+            if token.value == '=':
+                left = AssignAst(left, right)
+            else:
+                left = BinaryAst(token.value, left, right)
+
+
+class StackParser(PrattParser):
+    """
+    Parser that keeps unfinished constructs on an explicit stack instead of
+    the Python call stack, so nesting depth is bounded only by memory.
+
+    Constructs containing sub-expressions are generators which yield the
+    generator of each sub-expression to _run and are sent back its ast.
+    Binary operators are folded by shunting-yard with an explicit operator
+    stack. It produces the same asts as Parser.
+    """
+    # generator parsers of tokens starting constructs that nest
+    # expressions; the other tokens are parsed by PrattParser.PREFIX
+    NESTED_PREFIX: Dict[Token, Callable[['StackParser'], Generator]] = {
+        PUNCTUATION_TOKENS['(']: lambda parser: parser._parenthesized(),
+        PUNCTUATION_TOKENS['{']: lambda parser: parser._prog(),
+        KEYWORD_TOKENS['if']: lambda parser: parser._if(),
+        KEYWORD_TOKENS['let']: lambda parser: parser._let(),
+        KEYWORD_TOKENS['lambda']: lambda parser: parser._lambda('lambda'),
+        KEYWORD_TOKENS['λ']: lambda parser: parser._lambda('λ'),
+    }
+
+    @staticmethod
+    def _run(parser: Generator) -> Any:
+        """
+        Drive parser and the sub-expression parsers it yields, innermost
+        on top of the stack.
+        :param parser:
+        :return: the value returned by parser
+        """
+        stack = [parser]
+        value = None
+        error: Optional[Exception] = None
+        while True:
+            try:
+                if error is None:
+                    child = stack[-1].send(value)
+                else:
+                    child = stack[-1].throw(error)
+                    error = None
+            except StopIteration as stop:
+                stack.pop()
+                if not stack:
+                    return stop.value
+                value = stop.value
+            # raised in the parser of a sub-expression like in a callee
+            except Exception as exception:  # pylint: disable=broad-except
+                stack.pop()
+                if not stack:
+                    raise
+                error = exception
+            else:
+                stack.append(child)
+                value = None
+
+    def _parse_expression(self) -> Ast:
+        return self._run(self._expression())
+
+    def _parse_atom(self) -> Ast:
+        return self._run(self._atom())
+
+    def _parse_if(self) -> IfAst:
+        return self._run(self._if())
+
+    def _parse_let(self) -> Union[CallAst, LetAst]:
+        return self._run(self._let())
+
+    def _parse_lambda(self, keyword: str) -> LambdaAst:
+        return self._run(self._lambda(keyword))
+
+    def _parse_vardef(self) -> VarDefAst:
+        return self._run(self._vardef())
+
+    def _parse_prog(self) -> ProgAst:
+        return self._run(self._prog())
+
+    def _parse_call(self, func: Ast) -> CallAst:
+        return self._run(self._call(func))
+
+    def _maybe_binary(self, left: Ast, my_prec: int) -> Ast:
+        return self._run(self._binary(left, my_prec))
+
+    # The generators below never delegate with "yield from" to a generator
+    # parsing a whole sub-expression, but yield it to _run, so that the
+    # depth of generator delegation stays bounded.
+    def _delimited_items(self, start: str, stop: str, separator: str,
+                         parser: Callable[[], Generator]) -> Generator:
+        """
+        Generator version of Parser._delimited
+        :return: a list of values returned by parser
+        """
+        ast_list: List = []
+        first = True
+        self._skip_punc(start)
+        while not self._token_stream.eof():
+            if self._is_punc(stop):
+                break
+            if first:
+                first = False
+            else:
+                self._skip_punc(separator)
+            if self._is_punc(stop):
+                break
+            ast_list.append((yield parser()))
+        self._skip_punc(stop)
+        return ast_list
+
+    def _parenthesized(self) -> Generator:
+        self._skip_punc('(')
+        exp = yield self._expression()
+        self._skip_punc(')')
+        return exp
+
+    def _prog(self) -> Generator:
+        if self._diagnostics is not None:
+            self._skip_punc('{')
+            prog = yield from self._statements_recovering()
+            self._skip_punc('}')
+        else:
+            prog = yield from self._delimited_items(
+                "{", "}", ";", self._expression)
+        return ProgAst(prog)
+
+    def _statements_recovering(self) -> Generator:
+        """
+        Generator version of Parser._parse_statements_recovering in a block
+        """
+        prog = []
+        while True:
+            try:
+                if self._at_statements_end(True):
+                    return prog
+                prog.append((yield self._expression()))
+                if not self._at_statements_end(True):
+                    self._skip_punc(";")
+            except ParseError as error:
+                self._recover(error, True)
+
+    def _if(self) -> Generator:
+        self._skip_kw("if")
+        cond = yield self._expression()
+        if not self._is_punc('{'):
+            self._skip_kw('then')
+        then = yield self._expression()
+        else_ = literal(False)
+        if self._is_kw('else'):
+            self._skip_kw('else')
+            else_ = yield self._expression()
+        return IfAst(cond, then, else_)
+
+    def _lambda(self, keyword: str) -> Generator:
+        self._skip_kw(keyword)
+        if self._token_stream.peek().kind == VAR:
+            name = self._token_stream.next().value
+        else:
+            name = ''
+        # parameter lists do not nest
+        params = self._delimited("(", ")", ",", self._parse_varname)
+        body = yield self._expression()
+        return LambdaAst(name, params, body)
+
+    def _let(self) -> Generator:
+        self._skip_kw('let')
+        if self._token_stream.peek().kind == VAR:
+            name = self._token_stream.next().value
+            vardefs = yield from self._delimited_items(
+                '(', ')', ',', self._vardef)
+            varnames = [vardef.name for vardef in vardefs]
+            defines = [vardef.define if vardef.define else literal(False)
+                       for vardef in vardefs]
+            body = yield self._expression()
+            return CallAst(LambdaAst(name, varnames, body), defines)
+        vardefs = yield from self._delimited_items(
+            '(', ')', ',', self._vardef)
+        body = yield self._expression()
+        return LetAst(vardefs, body)
+
+    def _vardef(self) -> Generator:
+        name = self._parse_varname()
+        define = None
+        if self._is_op('='):
+            self._token_stream.next()
+            define = yield self._expression()
+        return VarDefAst(name, define)
+
+    def _call(self, func: Ast) -> Generator:
+        args = yield from self._delimited_items(
+            '(', ')', ',', self._expression)
+        return CallAst(func, args)
+
+    def _atom(self) -> Generator:
+        token_stream = self._token_stream
+        token = token_stream.peek()
+        kind = token.kind
+        if kind == VAR:
+            token_stream.next()
+            expr: Ast = VarAst(token.value)
+        elif kind == NUM or kind == STR:
+            token_stream.next()
+            expr = literal(token.value)
+        else:
+            nested = self.NESTED_PREFIX.get(token)
+            if nested is not None:
+                expr = yield from nested(self)
+            else:
+                prefix = self.PREFIX.get(token)
+                if prefix is None:
+                    return self.unexpected()
+                expr = prefix(self)
+        if token_stream.peek() is LEFT_PAREN:
+            expr = yield from self._call(expr)
+        return expr
+
+    def _expression(self) -> Generator:
+        ast = yield from self._atom()
+        if self._token_stream.peek().kind == OP:
+            ast = yield from self._binary(ast, 0)
+        if isinstance(ast, BinaryAst):
+            if ast.operator == '||':
+                iife_param = gensym('left')
+                ast = CallAst(
+                    LambdaAst(
+                        '',
+                        [iife_param],
+                        IfAst(
+                            VarAst(iife_param),
+                            VarAst(iife_param),
+                            ast.right)),
+                    [ast.left])
+            elif ast.operator == '&&':
+                ast = IfAst(ast.left, ast.right, literal(False))
+        if self._token_stream.peek() is LEFT_PAREN:
+            ast = yield from self._call(ast)
+        return ast
+
+    def _binary(self, left: Ast, my_prec: int) -> Generator:
+        """
+        Fold operators binding tighter than my_prec into left by
+        shunting-yard. All operators are left associative, so an operator
+        on the stack is reduced before pushing one of lower or equal
+        precedence.
+        :param left:
+        :param my_prec:
+        :return:
+        """
+        token_stream = self._token_stream
+        precedence = self.PRECEDENCE
+        operands = [left]
+        operators: List[Tuple[str, int]] = []
+        while True:
+            token = token_stream.peek()
+            if token.kind != OP:
+                break
+            his_prec = precedence.get(token.value)
+            if his_prec is None:
+                return self.unexpected()
+            if his_prec <= my_prec:
+                break
+            while operators and operators[-1][1] >= his_prec:
+                self._reduce(operators, operands)
+            token_stream.next()
+            operators.append((token.value, his_prec))
+            operands.append((yield from self._atom()))
+        while operators:
+            self._reduce(operators, operands)
+        return operands[0]
+
+    @staticmethod
+    def _reduce(operators: List[Tuple[str, int]], operands: List[Ast]) \
+            -> None:
+        operator, _ = operators.pop()
+        right = operands.pop()
+        left = operands.pop()
+        if operator == '=':
+            operands.append(AssignAst(left, right))
+        else:
+            operands.append(BinaryAst(operator, left, right))
+
+
+def parse_files(paths: Iterable[str]) -> ProgAst:
+    """
+    parse the concatenated content of files
+    :param paths:
+    :return:
+    """
+    with FileChain(paths) as source:
+        return Parser(TokenStream(ChunkedInputStream(source)))()
+
+
 if __name__ == '__main__':
     with open(sys.argv[1]) as f:
-        code = f.read()
-    ast = Parser(TokenStream(InputStream(code)))()
+        ast = Parser(TokenStream(ChunkedInputStream(f)))()
     print(ast)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Quickening of the binary nodes evaluated by evaluator.py.
+
+A quickened BinaryAst runs its operator through a BinarySite. The site
+starts unspecialized, applying its operator with utils.apply_op, and on
+the first values it applies the operator to, rewrites itself to a handler
+specialized on the types of those values: for '+' on two floats, a
+handler adding two floats once it has checked that it was given two
+floats. When the check, its guard, fails, the site applies the operator
+with apply_op again and specializes on the new types; a site whose guard
+has failed RESPECIALIZATIONS times goes generic for good.
+
+Operators applying to values of any type, such as '==', specialize once
+to a handler without a guard. Operators applied to values they do not
+apply to raise from apply_op, as without quickening, and the site stays
+as it was.
+"""
+from typing import Any, Callable, List
+
+from ast import (AssignAst, Ast, BinaryAst, CallAst, IfAst, LambdaAst, LetAst,
+                 ProgAst)
+from compiler import expression_to_js
+from utils import (ANY_OPERATORS, DIVISION_OPERATORS, NUMBER,
+                   NUMERIC_OPERATORS, Dispatcher, apply_op)
+
+RESPECIALIZATIONS = 4
+
+Handler = Callable[[Any, Any], Any]
+
+
+class BinarySite:
+    """
+    The handler a quickened BinaryAst applies its operator with, and
+    statistics of its specializations
+    """
+    __slots__ = ('operator', 'handler', 'kind', 'specializations', 'misses')
+
+    def __init__(self, operator_: str):
+        self.operator: str = operator_
+        self.handler: Handler = self._unspecialized
+        # 'unspecialized', 'generic', or the types the handler applies to,
+        # e.g. 'float + float'
+        self.kind: str = 'unspecialized'
+        self.specializations: int = 0
+        # guard failures
+        self.misses: int = 0
+
+    def _unspecialized(self, left: Any, right: Any) -> Any:
+        value = apply_op(self.operator, left, right)
+        self._specialize(type(left), type(right))
+        return value
+
+    def miss(self, left: Any, right: Any) -> Any:
+        """
+        Apply the operator to operands the guard of the handler failed on
+        :param left:
+        :param right:
+        :return:
+        """
+        self.misses += 1
+        if self.misses >= RESPECIALIZATIONS:
+            self.handler, self.kind = self._generic, 'generic'
+            return apply_op(self.operator, left, right)
+        return self._unspecialized(left, right)
+
+    def _generic(self, left: Any, right: Any) -> Any:
+        return apply_op(self.operator, left, right)
+
+    def _specialize(self, left_type: type, right_type: type) -> None:
+        operator_ = self.operator
+        if operator_ in ANY_OPERATORS:
+            self.handler = ANY_OPERATORS[operator_]
+            self.kind = f"any {operator_} any"
+        elif left_type in NUMBER and right_type in NUMBER:
+            if operator_ in NUMERIC_OPERATORS:
+                self.handler = _numeric(
+                    self, NUMERIC_OPERATORS[operator_], left_type, right_type)
+            else:
+                self.handler = _division(
+                    self, DIVISION_OPERATORS[operator_], left_type, right_type)
+            self.kind = \
+                f"{left_type.__name__} {operator_} {right_type.__name__}"
+        else:
+            # e.g. bools, which apply_op takes for numbers
+            self.handler, self.kind = self._generic, 'generic'
+            return
+        self.specializations += 1
+
+
+def _numeric(site: BinarySite, function: Handler, left_type: type,
+             right_type: type) -> Handler:
+    def handler(left: Any, right: Any) -> Any:
+        if type(left) is left_type and type(right) is right_type:
+            return function(left, right)
+        return site.miss(left, right)
+
+    return handler
+
+
+def _division(site: BinarySite, function: Handler, left_type: type,
+              right_type: type) -> Handler:
+    def handler(left: Any, right: Any) -> Any:
+        if type(left) is left_type and type(right) is right_type and \
+                right != 0:
+            return function(left, right)
+        return site.miss(left, right)
+
+    return handler
+
+
+def quicken(ast: Ast) -> None:
+    """
+    Give every BinaryAst of a resolved ast an unspecialized site
+    :param ast:
+    :return:
+    """
+    for binary in binaries(ast):
+        binary.site = BinarySite(binary.operator)
+
+
+def binaries(ast: Ast) -> List[BinaryAst]:
+    """
+    The BinaryAsts of ast, in source order
+    :param ast:
+    :return:
+    """
+    found: List[BinaryAst] = []
+    _collect(ast, found)
+    return found
+
+
+def report(ast: Ast) -> str:
+    """
+    The specialization statistics of the quickened sites of ast, one site
+    per line
+    :param ast:
+    :return:
+    """
+    lines = []
+    for binary in binaries(ast):
+        site = binary.site
+        if site is not None:
+            lines.append(f"{expression_to_js(binary)}: {site.kind}, "
+                         f"{site.specializations} specializations, "
+                         f"{site.misses} misses")
+    return '\n'.join(lines)
+
+
+def _collect(ast: Ast, found: List[BinaryAst]) -> None:
+    _COLLECT[type(ast)](ast, found)
+
+
+def _collect_binary(ast: BinaryAst, found: List[BinaryAst]) -> None:
+    _collect(ast.left, found)
+    found.append(ast)
+    _collect(ast.right, found)
+
+
+def _collect_let(ast: LetAst, found: List[BinaryAst]) -> None:
+    for vardef in ast.vardefs:
+        if vardef.define is not None:
+            _collect(vardef.define, found)
+    _collect(ast.body, found)
+
+
+def _collect_prog(ast: ProgAst, found: List[BinaryAst]) -> None:
+    for expr in ast.prog:
+        _collect(expr, found)
+
+
+def _collect_call(ast: CallAst, found: List[BinaryAst]) -> None:
+    _collect(ast.func, found)
+    for arg in ast.args:
+        _collect(arg, found)
+
+
+def _collect_if(ast: IfAst, found: List[BinaryAst]) -> None:
+    _collect(ast.cond, found)
+    _collect(ast.then, found)
+    if ast.else_ is not None:
+        _collect(ast.else_, found)
+
+
+_COLLECT = Dispatcher({
+    BinaryAst: _collect_binary,
+    AssignAst: lambda ast, found: _collect(ast.right, found),
+    LambdaAst: lambda ast, found: _collect(ast.body, found),
+    LetAst: _collect_let,
+    IfAst: _collect_if,
+    ProgAst: _collect_prog,
+    CallAst: _collect_call,
+}, default=lambda ast, found: None)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Closure conversion of asts for the evaluators.
+
+A lambda call runs in one flat Frame, which holds in its slots
+1. the params, the first of them being the name of a named lambda when
+   the name is bound in each call frame, as the stack guard evaluator does
+2. the variables of enclosing lambdas and lets that the lambda refers to,
+   copied from the closure
+3. the variables of the lets in the lambda body, nested lambdas aside.
+Top level code runs in a frame holding the variables of its lets.
+
+A closure thus keeps alive the variables it refers to and nothing else of
+the frames around it. A copy would miss later assignments, so a variable
+that is both captured and assigned lives in an environment.Box, shared by
+the frames and closures that hold it; so does every assigned variable
+when frames are copied, as the vm copies the frame a continuation
+resumes. A named lambda that binds its name in a scope of its own, as
+evaluator.py does, captures itself.
+
+resolve sets, before evaluation:
+VarAst: slot, the index of its variable in the frame it is evaluated in,
+        or None for a variable bound by no lambda or let, which is looked
+        up in the global environment through an inline cache (cache);
+        boxed, whether the slot holds a Box; depth, the number of lambdas
+        and lets around it.
+VarDefAst: slot and boxed of the variable it defines.
+BinaryAst: site, None until quickening.quicken gives it one.
+LambdaAst: captures, the slots of the frame making the closure to copy
+           into it, SELF for the lambda function or BOXED_SELF for a Box
+           of it; boxed, the slots of the params to box on a call;
+           frame_size.
+"""
+from ast import (AssignAst, Ast, BinaryAst, CallAst, IfAst, LambdaAst, LetAst,
+                 ProgAst, VarAst, VarDefAst)
+from itertools import repeat
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from environment import Box
+from utils import Dispatcher
+
+SELF = -1
+BOXED_SELF = -2
+
+
+def capture(values: List[Any], captures: Tuple[int, ...], frame_size: int,
+            function: Callable, param_slots: int) -> List[Any]:
+    """
+    The slots after the params of the call frames of function, the closure
+    of a lambda made in a frame holding values: captured variables, then
+    False for the variables of lets
+    :param values:
+    :param captures: the captures of the LambdaAst
+    :param frame_size: the frame_size of the LambdaAst
+    :param function:
+    :param param_slots: number of slots of params
+    :return:
+    """
+    captured = []
+    for slot in captures:
+        if slot >= 0:
+            captured.append(values[slot])
+        else:
+            captured.append(function if slot == SELF else Box(function))
+    captured.extend(repeat(False, frame_size - param_slots - len(captured)))
+    return captured
+
+
+# pylint: disable=missing-docstring
+class _Binding:
+    def __init__(self, function: '_Function', box_assigned: bool):
+        # function whose frames hold the variable
+        self.function: '_Function' = function
+        self.box_assigned: bool = box_assigned
+        self.assigned: bool = False
+        self.captured: bool = False
+
+    @property
+    def boxed(self) -> bool:
+        return self.assigned and (self.captured or self.box_assigned)
+
+
+class _Function:
+    """
+    frame layout of the calls of a lambda, or of top level code
+    """
+
+    def __init__(self, lambda_ast: Optional[LambdaAst],
+                 parent: Optional['_Function']):
+        self.lambda_ast: Optional[LambdaAst] = lambda_ast
+        self.parent: Optional['_Function'] = parent
+        self.params: List[_Binding] = []
+        self.captures: List[_Binding] = []
+        self.lets: List[_Binding] = []
+        # the name of a named lambda that is not bound in call frames
+        self.self_binding: Optional[_Binding] = None
+        # slots are only known once all captures are
+        self.slots: Dict[_Binding, Optional[int]] = {}
+
+    def declare(self, binding: _Binding, variables: List[_Binding]) -> None:
+        variables.append(binding)
+        self.slots[binding] = None
+
+    def refer(self, binding: _Binding) -> None:
+        """
+        Make binding a variable of frames of self, capturing it from the
+        frame making the closure unless it is already one
+        """
+        if binding in self.slots:
+            return
+        if binding.function is not self:
+            self.parent.refer(binding)
+        binding.captured = True
+        self.captures.append(binding)
+        self.slots[binding] = None
+
+    def layout(self) -> None:
+        self.slots = {binding: slot for slot, binding in enumerate(
+            self.params + self.captures + self.lets)}
+
+
+class _Scope:
+    """
+    names bound around an ast, innermost last, and the function whose
+    frame the ast is evaluated in
+    """
+
+    def __init__(self, function: _Function, name_in_call_frame: bool,
+                 box_assigned: bool):
+        self.function: _Function = function
+        self.name_in_call_frame: bool = name_in_call_frame
+        self.box_assigned: bool = box_assigned
+        self.names: List[Tuple[str, _Binding]] = []
+        self.depth: int = 0
+        self.functions: List[_Function] = [function]
+        self.refs: List[Tuple[Union[VarAst, VarDefAst], _Function,
+                              _Binding]] = []
+
+    def extend(self, function: _Function) -> '_Scope':
+        scope = _Scope(function, self.name_in_call_frame,
+                       self.box_assigned)
+        scope.names = list(self.names)
+        scope.depth = self.depth + 1
+        scope.functions = self.functions
+        scope.refs = self.refs
+        return scope
+
+    def bind(self, name: str) -> _Binding:
+        binding = _Binding(self.function, self.box_assigned)
+        self.names.append((name, binding))
+        return binding
+
+    def lookup(self, name: str) -> Optional[_Binding]:
+        # a later variable of the same name shadows an earlier one
+        for bound_name, binding in reversed(self.names):
+            if bound_name == name:
+                return binding
+        return None
+
+
+def resolve(ast: Ast, name_in_call_frame: bool = False,
+            box_assigned: bool = False) -> int:
+    """
+    Closure convert ast, ast being evaluated outside of any lambda or let
+    :param ast:
+    :param name_in_call_frame: whether a named lambda binds its name in
+    its call frames rather than in a scope of its own
+    :param box_assigned: whether every assigned variable lives in a Box,
+    captured or not
+    :return: the size of the frame to evaluate ast in
+    """
+    scope = _Scope(_Function(None, None), name_in_call_frame, box_assigned)
+    _resolve_aux(ast, scope)
+    for function in scope.functions:
+        function.layout()
+    for var_ast, function, binding in scope.refs:
+        var_ast.slot = function.slots[binding]
+        var_ast.boxed = binding.boxed
+    for function in scope.functions[1:]:
+        _set_lambda(function)
+    return len(scope.functions[0].slots)
+
+
+def _set_lambda(function: _Function) -> None:
+    captures = []
+    for binding in function.captures:
+        if binding is function.self_binding:
+            captures.append(BOXED_SELF if binding.boxed else SELF)
+        else:
+            captures.append(function.parent.slots[binding])
+    lambda_ast = function.lambda_ast
+    lambda_ast.captures = tuple(captures)
+    lambda_ast.boxed = tuple(function.slots[binding]
+                             for binding in function.params
+                             if binding.boxed)
+    lambda_ast.frame_size = len(function.slots)
+
+
+def _resolve_aux(ast: Ast, scope: _Scope) -> None:
+    _RESOLVE[type(ast)](ast, scope)
+
+
+def _resolve_var(ast: VarAst, scope: _Scope) -> Optional[_Binding]:
+    ast.depth = scope.depth
+    binding = scope.lookup(ast.name)
+    if binding is None:
+        ast.slot, ast.boxed, ast.cache = None, False, None
+    else:
+        scope.function.refer(binding)
+        scope.refs.append((ast, scope.function, binding))
+    return binding
+
+
+def _resolve_lambda(ast: LambdaAst, scope: _Scope) -> None:
+    function = _Function(ast, scope.function)
+    scope.functions.append(function)
+    scope = scope.extend(function)
+    if ast.name:
+        if scope.name_in_call_frame:
+            function.declare(scope.bind(ast.name), function.params)
+        else:
+            # captured, by the lambda itself, once referred to
+            function.self_binding = scope.bind(ast.name)
+    for param in ast.params:
+        function.declare(scope.bind(param), function.params)
+    _resolve_aux(ast.body, scope)
+
+
+def _resolve_let(ast: LetAst, scope: _Scope) -> None:
+    if not ast.vardefs:
+        # binds nothing, so that its body is in the scope around it, where
+        # an assignment outside of any lambda defines a global variable
+        _resolve_aux(ast.body, scope)
+        return
+    scope = scope.extend(scope.function)
+    for vardef in ast.vardefs:
+        if vardef.define is not None:
+            _resolve_aux(vardef.define, scope)
+        binding = scope.bind(vardef.name)
+        scope.function.declare(binding, scope.function.lets)
+        scope.refs.append((vardef, scope.function, binding))
+    _resolve_aux(ast.body, scope)
+
+
+def _resolve_assign(ast: AssignAst, scope: _Scope) -> None:
+    if isinstance(ast.left, VarAst):
+        binding = _resolve_var(ast.left, scope)
+        if binding is not None:
+            binding.assigned = True
+    else:
+        _resolve_aux(ast.left, scope)
+    _resolve_aux(ast.right, scope)
+
+
+def _resolve_binary(ast: BinaryAst, scope: _Scope) -> None:
+    ast.site = None
+    _resolve_aux(ast.left, scope)
+    _resolve_aux(ast.right, scope)
+
+
+def _resolve_if(ast: IfAst, scope: _Scope) -> None:
+    _resolve_aux(ast.cond, scope)
+    _resolve_aux(ast.then, scope)
+    if ast.else_ is not None:
+        _resolve_aux(ast.else_, scope)
+
+
+def _resolve_prog(ast: ProgAst, scope: _Scope) -> None:
+    for prog in ast.prog:
+        _resolve_aux(prog, scope)
+
+
+def _resolve_call(ast: CallAst, scope: _Scope) -> None:
+    _resolve_aux(ast.func, scope)
+    for arg in ast.args:
+        _resolve_aux(arg, scope)
+
+
+_RESOLVE = Dispatcher({
+    VarAst: _resolve_var,
+    LambdaAst: _resolve_lambda,
+    LetAst: _resolve_let,
+    AssignAst: _resolve_assign,
+    BinaryAst: _resolve_binary,
+    IfAst: _resolve_if,
+    ProgAst: _resolve_prog,
+    CallAst: _resolve_call,
+}, default=lambda ast, scope: None)
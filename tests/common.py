@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+helpers shared by tests
+"""
+import io
+import os
+import re
+from contextlib import redirect_stdout
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from ast import Ast
+from callback_primitive import primitive as callback_primitive
+from environment import Environment
+from input_stream import InputStream
+from parse import Parser, parse_files
+from primitive import primitive
+from token_stream import TokenStream
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+# sample programs the evaluators are compared on
+SAMPLES = ('let_and_named_lambda.lambda', 'list.lambda', 'else_if.lambda',
+           'and_or_bug.lambda')
+
+
+def parse(code: str) -> Ast:
+    """
+    ast of code
+    """
+    return Parser(TokenStream(InputStream(code)))()
+
+
+def samples() -> Iterator[Tuple[str, Ast]]:
+    """
+    name and ast of each of SAMPLES
+    """
+    for name in SAMPLES:
+        yield name, parse_files([os.path.join(ROOT, name)])
+
+
+def normalize(ast: Ast) -> str:
+    """
+    repr of ast, but for the numbers of the names made by gensym, which
+    differ between parses
+    """
+    return re.sub(r'β_left\d+', 'β_left', repr(ast))
+
+
+def run(call: Callable[[Environment], Any],
+        primitives: Dict[str, Any] = primitive) -> str:
+    """
+    result and output of call, given a global environment holding
+    primitives, with the addresses of functions masked so that evaluators
+    can be compared
+    :param call: evaluation of a program in a global environment
+    :param primitives:
+    :return:
+    """
+    env = Environment()
+    for name, func in primitives.items():
+        env.define(name, func)
+    output = io.StringIO()
+    with redirect_stdout(output):
+        result = call(env)
+    return re.sub(r'<(function \S*|[\w.]+ object) at 0x[0-9a-f]+>',
+                  '<function>', repr((result, output.getvalue())))
+
+
+def run_module(module: ModuleType, ast: Ast) -> str:
+    """
+    result and output of running ast with module.evaluate, functions aside
+    """
+    return run(lambda env: module.evaluate(ast, env))
+
+
+def run_callback_module(module: ModuleType, ast: Ast) -> str:
+    """
+    results and output of running ast with module.evaluate, a callback
+    evaluator run by module.execute, functions aside
+    """
+    def call(env: Environment) -> List[Any]:
+        results = []
+        module.execute(module.evaluate, (ast, env, results.append))
+        return results
+
+    return run(call, callback_primitive)
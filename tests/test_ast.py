@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# pylint: disable=C0111
+import pickle
+from unittest import TestCase
+
+from ast import LambdaAst, LiteralAst, VarAst, VarDefine, literal
+from environment import Environment
+from input_stream import InputStream
+from optimize import Optimizer
+from parse import Parser
+from token_stream import TokenStream
+
+
+class TestAst(TestCase):
+    def test_slots(self):
+        var_ast = VarAst('a')
+        for node in (var_ast, VarDefine(), LambdaAst('', ['x'], var_ast)):
+            self.assertFalse(hasattr(node, '__dict__'))
+        with self.assertRaises(AttributeError):
+            var_ast.foo = 1
+
+    def test_env(self):
+        var_ast = VarAst('a')
+        self.assertIsNone(var_ast.env)
+        env = Environment()
+        var_ast.env = env
+        self.assertIs(var_ast.env, env)
+        # env is not a field
+        self.assertEqual(var_ast, VarAst('a'))
+
+    def test_defaults(self):
+        self.assertEqual(VarAst('a'), VarAst('a', None))
+        self.assertEqual(VarDefine(), VarDefine([], 0, 2, None))
+        first, second = LambdaAst('', [], VarAst('a')), LambdaAst(
+            '', [], VarAst('a'))
+        first.iife_params.append('x')
+        self.assertEqual(second.iife_params, [])
+        self.assertFalse(LiteralAst(False))
+
+    def test_pickle(self):
+        var_ast = VarAst('a', VarDefine(kind=1))
+        var_ast.env = Environment()
+        ast = LambdaAst('f', ['x'], var_ast)
+        copy = pickle.loads(pickle.dumps(ast, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(copy, ast)
+        self.assertIsInstance(copy.body.env, Environment)
+
+    def test_literal(self):
+        self.assertIs(literal(False), literal(False))
+        self.assertIs(literal('a'), literal('a'))
+        self.assertEqual(literal(1.0), LiteralAst(1.0))
+        # equal values of different types or signs are different literals
+        self.assertIsNot(literal(True), literal(1.0))
+        self.assertIs(literal(True).value, True)
+        self.assertEqual(str(literal(-0.0).value), '-0.0')
+        self.assertEqual(str(literal(0.0).value), '0.0')
+
+    def test_optimized_literal(self):
+        ast = Optimizer().optimize(Parser(TokenStream(InputStream('1 + 2')))())
+        self.assertEqual(ast, literal(3.0))
+        self.assertIsInstance(ast.env, Environment)
+        # the shared literal is left alone
+        self.assertIsNone(literal(3.0).env)
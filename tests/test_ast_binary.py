@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# pylint: disable=C0111
+import io
+import mmap
+import os
+import pickle
+import tempfile
+from unittest import TestCase
+
+from ast import (AssignAst, BinaryAst, CallAst, IfAst, JsAst, LambdaAst,
+                 LetAst, LiteralAst, ProgAst, VarAst, VarDefAst)
+from ast_binary import (FORMAT_VERSION, MAGIC, AstReader, AstWriter, dumps,
+                        load)
+from parse import parse_files
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+
+
+class TestAstBinary(TestCase):
+    def _assert_round_trip(self, ast):
+        copy = load(dumps(ast))
+        self.assertEqual(copy, ast)
+        self.assertEqual(repr(copy), repr(ast))
+        return copy
+
+    def test_nodes(self):
+        asts = [
+            JsAst('console.log("λ")'),
+            VarAst('a'),
+            VarDefAst('a', None),
+            LambdaAst('', [], VarAst('a')),
+            LambdaAst('f', ['x', 'y'], VarAst('x'), ['z', 'w']),
+            LetAst([VarDefAst('x', None), VarDefAst('y', LiteralAst(2.0))],
+                   VarAst('y')),
+            LetAst([], VarAst('a')),
+            CallAst(VarAst('f'), []),
+            CallAst(VarAst('f'), [VarAst('a'), JsAst('b')]),
+            ProgAst([]),
+            ProgAst([VarAst('a'), ProgAst([VarAst('b')])]),
+            IfAst(VarAst('a'), VarAst('b'), LiteralAst(False)),
+            IfAst(VarAst('a'), VarAst('b'), None),
+            BinaryAst('+', VarAst('a'), LiteralAst(1.0)),
+            AssignAst(VarAst('a'), LiteralAst('s')),
+        ]
+        for ast in asts:
+            self._assert_round_trip(ast)
+
+    def test_literals(self):
+        for value in (False, True, '', 'λ "x"\n', 0.0, -0.0, 1.0, 3.5,
+                      2.0 ** 53, 1e300, -2.0, float('inf'), 0, 7, -1,
+                      -300, 2 ** 70):
+            copy = self._assert_round_trip(LiteralAst(value))
+            self.assertIs(type(copy.value), type(value))
+        self.assertEqual(str(load(dumps(LiteralAst(-0.0))).value), '-0.0')
+
+    def test_samples(self):
+        for name in sorted(os.listdir(ROOT)):
+            if name.endswith('.lambda'):
+                self._assert_round_trip(
+                    parse_files([os.path.join(ROOT, name)]))
+
+    def test_deep(self):
+        ast = VarAst('x')
+        for _ in range(100000):
+            ast = LambdaAst('', ['x'], ast)
+        copy = load(dumps(ast))
+        depth = 0
+        while isinstance(copy, LambdaAst):
+            copy = copy.body
+            depth += 1
+        self.assertEqual(depth, 100000)
+        self.assertEqual(copy, VarAst('x'))
+
+    def test_stream(self):
+        asts = [VarAst(f'a{i}') for i in range(20000)]
+        file = io.BytesIO()
+        with AstWriter(file) as writer:
+            for ast in asts:
+                writer.write(ast)
+        reader = AstReader(file.getvalue())
+        self.assertEqual(reader.strings.decoded(), 0)
+        trees = iter(reader)
+        self.assertEqual(next(trees), asts[0])
+        # strings are decoded as they are used
+        self.assertEqual(reader.strings.decoded(), 1)
+        self.assertEqual(list(trees), asts[1:])
+        self.assertEqual(reader.strings.decoded(), len(asts))
+
+    def test_mmap(self):
+        ast = parse_files([os.path.join(ROOT, 'list.lambda')])
+        with tempfile.TemporaryFile() as file:
+            file.write(dumps(ast))
+            file.flush()
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                reader = AstReader(data)
+                self.assertEqual(list(reader), [ast])
+                del reader
+
+    def test_header(self):
+        self.assertTrue(dumps(VarAst('a')).startswith(MAGIC))
+        with self.assertRaises(Exception):
+            load(b'garbage' * 2)
+        data = bytearray(dumps(VarAst('a')))
+        data[len(MAGIC)] = FORMAT_VERSION + 1
+        with self.assertRaises(Exception) as context:
+            load(data)
+        self.assertIn('version', str(context.exception))
+
+    def test_smaller_than_pickle(self):
+        ast = parse_files([os.path.join(ROOT, 'list.lambda')])
+        self.assertLess(len(dumps(ast)) * 4,
+                        len(pickle.dumps(ast, pickle.HIGHEST_PROTOCOL)))
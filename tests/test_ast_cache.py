@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# pylint: disable=C0111
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from ast import BinaryAst, LiteralAst, ProgAst, VarAst
+from ast_cache import AstCache, source_digest
+from compiler import to_js
+from optimize import compile_files
+from parse import parse_files
+
+CODE = 'a = 1;\nprintln(a + 2);'
+
+
+class TestAstCache(TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+        self.cache = AstCache(os.path.join(self.directory, 'cache'),
+                              enabled=True)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _write(self, name, code):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as file:
+            file.write(code)
+        return path
+
+    def test_source_digest(self):
+        first = self._write('first.lambda', 'a = 1;')
+        second = self._write('second.lambda', 'b = 2;')
+        both = self._write('both.lambda', 'a = 1;b = 2;')
+        self.assertEqual(source_digest([first, second]),
+                         source_digest([both]))
+        self.assertNotEqual(source_digest([first]), source_digest([second]))
+
+    def test_get_and_put(self):
+        ast = ProgAst([BinaryAst('+', VarAst('a'), LiteralAst(1.0))])
+        digest = source_digest([self._write('a.lambda', 'a + 1')])
+        self.assertIsNone(self.cache.get(digest, 'parse'))
+        self.assertTrue(self.cache.put(digest, 'parse', ast))
+        self.assertEqual(self.cache.get(digest, 'parse'), ast)
+        # stages do not share entries
+        self.assertIsNone(self.cache.get(digest, 'optimize'))
+        self.assertIsNone(self.cache.get(source_digest([]), 'parse'))
+
+    def test_deep_ast(self):
+        ast = LiteralAst(0.0)
+        for _ in range(10000):
+            ast = BinaryAst('+', ast, LiteralAst(1.0))
+        digest = source_digest([self._write('a.lambda', '0' + ' + 1' * 10)])
+        self.assertTrue(self.cache.put(digest, 'parse', ast))
+        ast = self.cache.get(digest, 'parse')
+        depth = 0
+        while isinstance(ast, BinaryAst):
+            ast, depth = ast.left, depth + 1
+        self.assertEqual((depth, ast), (10000, LiteralAst(0.0)))
+
+    def test_disabled(self):
+        digest = source_digest([self._write('a.lambda', CODE)])
+        self.cache.put(digest, 'parse', ProgAst([]))
+        cache = AstCache(self.cache.directory, enabled=False)
+        self.assertIsNone(cache.get(digest, 'parse'))
+        self.assertFalse(cache.put(source_digest([]), 'parse', ProgAst([])))
+        self.assertEqual(len(self.cache.entries()), 1)
+        with mock.patch.dict(os.environ, PYLAMBDA_NO_CACHE='1'):
+            self.assertFalse(AstCache(self.cache.directory).enabled)
+
+    def test_load(self):
+        path = self._write('a.lambda', CODE)
+        digest = source_digest([path])
+        builds = []
+
+        def build():
+            builds.append(path)
+            return parse_files([path])
+
+        ast = self.cache.load(digest, 'parse', build)
+        self.assertEqual(self.cache.load(digest, 'parse', build), ast)
+        self.assertEqual(len(builds), 1)
+
+    def test_corrupted_entry(self):
+        digest = source_digest([self._write('a.lambda', CODE)])
+        self.cache.put(digest, 'parse', ProgAst([]))
+        (_, _, path), = self.cache.entries()
+        with open(path, 'wb') as file:
+            file.write(b'garbage')
+        self.assertIsNone(self.cache.get(digest, 'parse'))
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_evict_least_recently_used(self):
+        asts = [ProgAst([LiteralAst(str(i) * 1000)]) for i in range(3)]
+        digests = [source_digest([self._write(f'{i}.lambda', str(i))])
+                   for i in range(3)]
+        for i, (digest, ast) in enumerate(zip(digests, asts)):
+            self.cache.put(digest, 'parse', ast)
+            path = self.cache.entries()[-1][2]
+            os.utime(path, (i, i))
+        # reading entry 0 makes entry 1 the least recently used
+        self.cache.get(digests[0], 'parse')
+        self.cache.max_bytes = sum(
+            size for _, size, _ in self.cache.entries()[1:])
+        self.cache.evict()
+        self.assertEqual(self.cache.get(digests[0], 'parse'), asts[0])
+        self.assertIsNone(self.cache.get(digests[1], 'parse'))
+        self.assertEqual(self.cache.get(digests[2], 'parse'), asts[2])
+
+    def test_compile_files(self):
+        root = os.path.join(os.path.dirname(__file__), os.pardir)
+        paths = [os.path.join(root, 'primitive.lambda'),
+                 os.path.join(root, 'list.lambda')]
+        js_code = to_js(compile_files(paths, self.cache))
+        self.assertEqual(len(self.cache.entries()), 2)
+        self.assertEqual(to_js(compile_files(paths, self.cache)), js_code)
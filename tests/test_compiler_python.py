@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# pylint: disable=C0111
+from ast import JsAst
+
+import compiler_python
+import evaluator
+from compiler_python import global_name, to_python
+from environment import Environment
+from tests import test_evaluate
+from tests.common import parse, run_module, samples
+
+
+class TestCompilerPython(test_evaluate.TestEvaluate):
+    evaluate = staticmethod(compiler_python.evaluate)
+
+    def test_programs(self):
+        for code in (
+                'fib = λ(n) if n < 2 then n else fib(n - 1) + fib(n - 2);'
+                'fib(12)',
+                'λ loop(n) if n > 0 then n + loop(n - 1) else 0',
+                'let loop (n = 10) if n > 0 then n + loop(n - 1) else 0',
+                'count = let (n = 0) λ() n = n + 1; count(); count()',
+                'f = λ(a, b, c) c; f(1, 2)',
+                'let (x = 1) { let (x = x + 1) x = x * 3; x }',
+                'x = 3; { x = x * 2; x % 4 } / 2 - 1 <= 3 && x != 6',
+                'false || "a" || 1',
+                'a = 1; b = false; a || b && a',
+                'if 0 then "zero" else "false"',
+                'if "" then 1 + if false then 2 else 3',
+                'is-nil? = λ(x) x == false; is-nil?(false)',
+                'h = λ g(x) if x == 1 then g else { g = x; h(1) }; h(5)',
+                'make = λ(f) let (n = 0) f(λ() n = n + 1, λ() n);'
+                'make(λ(inc, get) { inc(); inc(); get() })',
+                # a let binding nothing is its body
+                'a = let () 1; a',
+                'x = let () (λ(n) n); x(3)'):
+            ast = parse(code)
+            self.assertEqual(run_module(compiler_python, ast),
+                             run_module(evaluator, ast), code)
+
+    def test_samples(self):
+        for name, ast in samples():
+            self.assertEqual(run_module(compiler_python, ast),
+                             run_module(evaluator, ast), name)
+
+    def test_else_if_chain(self):
+        chain = ' else '.join(f'if n == {i} then {i * i}' for i in range(105))
+        for code in (f'f = λ(n) {chain} else 0 - 1; f(104) + f(105)',
+                     f'n = 100; {chain}; n'):
+            ast = parse(code)
+            self.assertEqual(run_module(compiler_python, ast),
+                             run_module(evaluator, ast), code)
+
+    def test_globals(self):
+        env = Environment()
+        env.define('x', 1)
+        self.assertEqual(self.evaluate(parse('y = x + 1; x = 3; y'), env),
+                         2)
+        self.assertEqual((env.get('x'), env.get('y')), (3, 2))
+        # let variables stay local
+        self.evaluate(parse('let (z = 1) z = 2'), env)
+        self.assertIsNone(env.lookup('z'))
+
+    def test_python(self):
+        code = to_python(parse('f = λ(x) if x then x else 0 - 1; f(false)'))
+        self.assertIn('is not False', code)
+        self.assertIn(global_name('f'), code)
+        self.assertEqual(global_name('set-car!'), 'g_set_2dcar_21')
+        self.assertNotEqual(global_name('a_2d'), global_name('a-'))
+        with self.assertRaises(Exception):
+            to_python(JsAst('1'))
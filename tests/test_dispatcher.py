@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# pylint: disable=C0111
+from unittest import TestCase
+
+from ast import Ast, CallAst, LiteralAst, VarAst
+from utils import Dispatcher, has_side_effect
+
+
+class _Call(CallAst):
+    pass
+
+
+class TestDispatcher(TestCase):
+    def test_dispatch(self):
+        dispatcher = Dispatcher({Ast: lambda ast: 'ast',
+                                 CallAst: lambda ast: 'call'})
+        self.assertEqual(dispatcher[CallAst](None), 'call')
+        # the nearest base class wins, and is remembered
+        self.assertEqual(dispatcher[_Call](None), 'call')
+        self.assertIn(_Call, dispatcher)
+        self.assertEqual(dispatcher[VarAst](None), 'ast')
+        with self.assertRaises(KeyError):
+            _ = dispatcher[int]
+
+    def test_default(self):
+        dispatcher = Dispatcher({VarAst: lambda ast: 'var'},
+                                default=lambda ast: 'default')
+        self.assertEqual(dispatcher[LiteralAst](None), 'default')
+        self.assertEqual(dispatcher[type(None)](None), 'default')
+
+    def test_has_side_effect(self):
+        self.assertFalse(has_side_effect(VarAst('a')))
+        self.assertTrue(has_side_effect(_Call(VarAst('f'), [])))
+        self.assertTrue(has_side_effect(None))
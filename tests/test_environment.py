@@ -1,7 +1,15 @@
 #!/usr/bin/env python
 # encoding: utf-8
+from ast import VarAst
 from unittest import TestCase
-from environment import Environment
+
+import evaluator
+import evaluator_callback
+import evaluator_callback_stack_guard
+from environment import GLOBAL_CACHE_STATS, Environment, Frame
+from input_stream import InputStream
+from parse import Parser
+from token_stream import TokenStream
 
 
 class TestEnvironment(TestCase):
@@ -42,3 +50,136 @@ class TestEnvironment(TestCase):
             subscope.set('c', 'foo')
         global_scope.set('c', 'foo')
         self.assertEqual(global_scope.get('c'), 'foo')
+
+
+class TestInlineCache(TestCase):
+    def setUp(self):
+        GLOBAL_CACHE_STATS.reset()
+
+    def test_get_global(self):
+        env = Environment()
+        env.define('a', 1)
+        frame = Frame([], env)
+        var_ast = VarAst('a')
+        var_ast.cache = None
+        self.assertEqual(frame.get_global(var_ast), 1)
+        self.assertEqual(frame.get_global(var_ast), 1)
+        self.assertEqual((GLOBAL_CACHE_STATS.hits,
+                          GLOBAL_CACHE_STATS.misses), (1, 1))
+        env.set('a', 2)
+        self.assertEqual(frame.get_global(var_ast), 2)
+        self.assertEqual(GLOBAL_CACHE_STATS.misses, 2)
+        # the cache is for one global environment
+        other = Environment()
+        other.define('a', 3)
+        self.assertEqual(Frame([], other).get_global(var_ast), 3)
+        self.assertEqual(GLOBAL_CACHE_STATS.misses, 3)
+        self.assertAlmostEqual(GLOBAL_CACHE_STATS.hit_rate(), 0.25)
+        GLOBAL_CACHE_STATS.reset()
+        self.assertEqual(GLOBAL_CACHE_STATS.hit_rate(), 0.0)
+
+    def test_other_writes(self):
+        env = Environment()
+        env.define('a', 1)
+        frame = Frame([], env)
+        var_ast = VarAst('a')
+        var_ast.cache = None
+        frame.get_global(var_ast)
+        # writes to scopes other than the global environment of the frame
+        # leave its caches valid
+        env.extend().define('a', 2)
+        Environment().define('a', 3)
+        self.assertEqual(frame.get_global(var_ast), 1)
+        self.assertEqual((GLOBAL_CACHE_STATS.hits,
+                          GLOBAL_CACHE_STATS.misses), (1, 1))
+
+    def test_evaluators(self):
+        code = '''
+        x = 1;
+        f = λ() x;
+        fib = λ(n) if n < 2 then n else fib(n - 1) + fib(n - 2);
+        a = f();
+        x = 2;
+        a + f() * 10 + fib(5) * 100
+        '''
+        for module in (evaluator, evaluator_callback,
+                       evaluator_callback_stack_guard):
+            GLOBAL_CACHE_STATS.reset()
+            ast = Parser(TokenStream(InputStream(code)))()
+            if module is evaluator:
+                result = evaluator.evaluate(ast, Environment())
+            else:
+                results = []
+                evaluator_callback_stack_guard.execute(
+                    module.evaluate, (ast, Environment(), results.append))
+                result, = results
+            self.assertEqual(result, 521)
+            # fib is looked up 15 times at 3 sites, each of which misses
+            # only the first time
+            self.assertGreaterEqual(GLOBAL_CACHE_STATS.hits, 12)
+            self.assertLess(GLOBAL_CACHE_STATS.misses, 10)
+
+
+class TestFork(TestCase):
+    PRELUDE = '''
+    cons = λ(a, b) λ(f) f(a, b);
+    car = λ(cell) cell(λ(a, b) a);
+    cdr = λ(cell) cell(λ(a, b) b);
+    NIL = λ(f) f(NIL, NIL);
+    sum = λ(list) if list == NIL then 0 else car(list) + sum(cdr(list));
+    '''
+
+    def test_fork(self):
+        env = Environment()
+        env.define('a', 1)
+        with self.assertRaises(Exception):
+            env.fork()
+        with self.assertRaises(Exception):
+            env.extend().freeze()
+        self.assertIs(env.freeze(), env)
+        self.assertTrue(env.is_frozen())
+        with self.assertRaises(TypeError):
+            env.define('b', 2)
+        with self.assertRaises(TypeError):
+            env.set('a', 2)
+        fork, other = env.fork(), env.fork()
+        self.assertTrue(fork.is_global())
+        self.assertFalse(fork.is_frozen())
+        self.assertIs(fork.lookup('a'), fork)
+        fork.set('a', 2)
+        fork.set('b', 3)
+        self.assertEqual((fork.get('a'), fork.get('b')), (2, 3))
+        self.assertEqual(env.get('a'), 1)
+        self.assertEqual(other.get('a'), 1)
+        self.assertIsNone(other.lookup('b'))
+        # a frozen fork can be forked in turn
+        self.assertEqual(fork.freeze().fork().get('b'), 3)
+
+    def test_evaluators(self):
+        request = 'x = cons(1, cons(2, NIL)); sum(x) + n'
+        for module in (evaluator, evaluator_callback_stack_guard):
+            env = Environment()
+            if module is evaluator:
+                evaluator.evaluate(self._parse(self.PRELUDE), env)
+            else:
+                evaluator_callback_stack_guard.execute(
+                    module.evaluate,
+                    (self._parse(self.PRELUDE), env, lambda _: None))
+            env.freeze()
+            for number in range(3):
+                fork = env.fork()
+                fork.define('n', number)
+                if module is evaluator:
+                    result = evaluator.evaluate(self._parse(request), fork)
+                else:
+                    results = []
+                    evaluator_callback_stack_guard.execute(
+                        module.evaluate,
+                        (self._parse(request), fork, results.append))
+                    result, = results
+                self.assertEqual(result, 3 + number)
+                self.assertIsNone(env.lookup('x'))
+
+    @staticmethod
+    def _parse(code: str):
+        return Parser(TokenStream(InputStream(code)))()
@@ -8,51 +8,57 @@ from unittest import TestCase
 
 from environment import Environment
 from evaluator import evaluate
+from input_stream import InputStream
+from parse import Parser
+from primitive import primitive
+from token_stream import TokenStream
 
 
 class TestEvaluate(TestCase):
+    evaluate = staticmethod(evaluate)
+
     def test_evaluate(self):
         ast = LiteralAst(1.0)
         environment = Environment()
-        self.assertEqual(evaluate(ast, environment), 1.0)
+        self.assertEqual(self.evaluate(ast, environment), 1.0)
         ast = LiteralAst(True)
         environment = Environment()
-        self.assertEqual(evaluate(ast, environment), True)
+        self.assertEqual(self.evaluate(ast, environment), True)
         ast = LiteralAst(False)
         environment = Environment()
-        self.assertEqual(evaluate(ast, environment), False)
+        self.assertEqual(self.evaluate(ast, environment), False)
         ast = LiteralAst("aaa")
-        self.assertEqual(evaluate(ast, Environment()), "aaa")
+        self.assertEqual(self.evaluate(ast, Environment()), "aaa")
         ast = BinaryAst(
             '+',
             LiteralAst(1),
             LiteralAst(2))
-        self.assertEqual(evaluate(ast, Environment()), 3.0)
+        self.assertEqual(self.evaluate(ast, Environment()), 3.0)
         ast = ProgAst([])
-        self.assertEqual(evaluate(ast, Environment()), False)
+        self.assertEqual(self.evaluate(ast, Environment()), False)
         ast = ProgAst([LiteralAst(1)])
-        self.assertEqual(evaluate(ast, Environment()), 1.0)
+        self.assertEqual(self.evaluate(ast, Environment()), 1.0)
         ast = ProgAst([LiteralAst(1), LiteralAst(2)])
-        self.assertEqual(evaluate(ast, Environment()), 2.0)
+        self.assertEqual(self.evaluate(ast, Environment()), 2.0)
         ast = AssignAst(LiteralAst(1), LiteralAst("a"))
         with self.assertRaises(Exception):
-            evaluate(ast, Environment())
+            self.evaluate(ast, Environment())
         ast = ProgAst(
             [AssignAst(VarAst('a'), LiteralAst("foo")), VarAst('a')])
-        self.assertEqual(evaluate(ast, Environment()), "foo")
+        self.assertEqual(self.evaluate(ast, Environment()), "foo")
         ast = AssignAst(VarAst("a"), LiteralAst("foo"))
         with self.assertRaises(Exception):
-            evaluate(ast, Environment(Environment()))
+            self.evaluate(ast, Environment(Environment()))
         ast = CallAst(
             LambdaAst("", ["a"], VarAst("a")),
             [LiteralAst(1)],
         )
-        self.assertEqual(evaluate(ast, Environment()), 1.0)
+        self.assertEqual(self.evaluate(ast, Environment()), 1.0)
         ast = CallAst(
             LambdaAst("", ["a"], VarAst("a")),
             [LiteralAst("abc")],
         )
-        self.assertEqual(evaluate(ast, Environment()), "abc")
+        self.assertEqual(self.evaluate(ast, Environment()), "abc")
         # (λ loop (n) if n > 0 then n + loop(n - 1) else 0) (10)
         ast = CallAst(
             LambdaAst(
@@ -71,10 +77,10 @@ class TestEvaluate(TestCase):
                     LiteralAst(0), ), ),
             [LiteralAst(10)]
         )
-        self.assertEqual(evaluate(ast, Environment()), 55.0)
+        self.assertEqual(self.evaluate(ast, Environment()), 55.0)
         # let (x) x;
         ast = LetAst([VarDefAst("x", None)], VarAst("x"))
-        self.assertEqual(evaluate(ast, Environment()), False)
+        self.assertEqual(self.evaluate(ast, Environment()), False)
         # let (x = 2, y = x + 1, z = x + y) x + y + z
         ast = LetAst(
             [
@@ -94,7 +100,7 @@ class TestEvaluate(TestCase):
                 VarAst("z"),
             )
         )
-        self.assertEqual(evaluate(ast, Environment()), 10.0)
+        self.assertEqual(self.evaluate(ast, Environment()), 10.0)
         # the second expression will result an errors,
         # since x, y, z are bound to the let body
         # let (x = 2, y = x + 1, z = x + y) x + y + z; x + y + z
@@ -120,25 +126,62 @@ class TestEvaluate(TestCase):
             ),
         ])
         with self.assertRaises(Exception):
-            evaluate(ast, Environment())
+            self.evaluate(ast, Environment())
         ast = IfAst(
             LiteralAst(""),
             LiteralAst(1),
             None,
         )
-        self.assertEqual(evaluate(ast, Environment()), 1.0)
+        self.assertEqual(self.evaluate(ast, Environment()), 1.0)
         ast = IfAst(
             LiteralAst(False),
             LiteralAst(1),
             LiteralAst(2),
         )
-        self.assertEqual(evaluate(ast, Environment()), 2.0)
+        self.assertEqual(self.evaluate(ast, Environment()), 2.0)
         ast = IfAst(
             LiteralAst(False),
             LiteralAst(1),
             LiteralAst(False),
         )
-        self.assertEqual(evaluate(ast, Environment()), False)
+        self.assertEqual(self.evaluate(ast, Environment()), False)
         ast = {"type": "foo", "value": 'foo'}
         with self.assertRaises(Exception):
-            evaluate(ast, Environment())
+            self.evaluate(ast, Environment())
+
+
+class TestTailCalls(TestCase):
+    @staticmethod
+    def _run(code: str):
+        env = Environment()
+        for name, func in primitive.items():
+            env.define(name, func)
+        return evaluate(Parser(TokenStream(InputStream(code)))(), env)
+
+    def test_tail_recursion(self):
+        # deeper than the python stack allows for non tail calls
+        self.assertEqual(self._run(
+            'sum = λ(n, ret) if n == 0 then ret else sum(n - 1, ret + n);'
+            'sum(50000, 0)'), 1250025000)
+        self.assertEqual(self._run(
+            'let loop (n = 50000) if n > 0 then loop(n - 1) else "done"'),
+            'done')
+        self.assertEqual(self._run(
+            'even = λ(n) if n == 0 then true else odd(n - 1);'
+            'odd = λ(n) if n == 0 then false else even(n - 1);'
+            'even(50001)'), False)
+        self.assertEqual(self._run(
+            'f = λ(n) { n = n + 1; let (m = n) if m < 50000 then f(m) '
+            'else m }; f(0)'), 50000)
+
+    def test_non_tail_calls(self):
+        self.assertEqual(self._run(
+            'f = λ(n) if n == 0 then 0 else 1 + f(n - 1); f(100)'), 100)
+        # tail calls from a lambda called in a non tail position
+        self.assertEqual(self._run(
+            'f = λ(g, x) g(x); f(λ(x) x * 2, 3) + f(λ(y) f(λ(x) x, y), 4)'),
+            10)
+        # a primitive in tail position is called right away
+        self.assertEqual(self._run('f = λ(n) fibPY(n); f(10)'), 55)
+        with self.assertRaises(RecursionError):
+            self._run('f = λ(n) if n == 0 then 0 else 1 + f(n - 1); f(50000)')
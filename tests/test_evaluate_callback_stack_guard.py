@@ -14,65 +14,73 @@ from token_stream import TokenStream
 
 
 class TestEvaluate(TestCase):
+    execute = staticmethod(execute)
+    evaluate = staticmethod(evaluate)
+
     # pylint: disable=too-many-statements
     def test_evaluate(self):
         ast = LiteralAst(1.0)
-        execute(evaluate, [ast, Environment(),
-                           lambda value: self.assertEqual(value, 1.0)])
+        self.execute(self.evaluate,
+                     [ast, Environment(),
+                      lambda value: self.assertEqual(value, 1.0)])
         ast = LiteralAst(True)
-        execute(evaluate,
-                [ast, Environment(), self.assertTrue])
+        self.execute(self.evaluate,
+                     [ast, Environment(), self.assertTrue])
         ast = LiteralAst(False)
-        execute(evaluate,
-                [ast, Environment(), self.assertFalse])
+        self.execute(self.evaluate,
+                     [ast, Environment(), self.assertFalse])
         ast = LiteralAst("aaa")
-        execute(evaluate, [ast, Environment(),
-                           lambda value: self.assertEqual(value, "aaa")])
+        self.execute(self.evaluate,
+                     [ast, Environment(),
+                      lambda value: self.assertEqual(value, "aaa")])
         ast = BinaryAst(
             '+',
             LiteralAst(1),
             LiteralAst(2))
-        execute(evaluate,
-                [ast,
-                 Environment(),
-                 lambda value: self.assertEqual(value, 3.0)])
+        self.execute(self.evaluate,
+                     [ast,
+                      Environment(),
+                      lambda value: self.assertEqual(value, 3.0)])
         ast = ProgAst([])
-        execute(evaluate,
-                [ast, Environment(), self.assertFalse])
+        self.execute(self.evaluate,
+                     [ast, Environment(), self.assertFalse])
         ast = ProgAst([LiteralAst(1)])
-        execute(evaluate,
-                [ast,
-                 Environment(),
-                 lambda value: self.assertEqual(value, 1.0)])
+        self.execute(self.evaluate,
+                     [ast,
+                      Environment(),
+                      lambda value: self.assertEqual(value, 1.0)])
         ast = ProgAst([LiteralAst(1), LiteralAst(2)])
-        evaluate(ast,
-                 Environment(),
-                 lambda value: self.assertEqual(value, 2.0))
+        self.evaluate(ast,
+                      Environment(),
+                      lambda value: self.assertEqual(value, 2.0))
         ast = AssignAst(LiteralAst(1), LiteralAst("a"))
         with self.assertRaises(Exception):
-            execute(evaluate, [ast, Environment(), lambda value: value])
+            self.execute(self.evaluate, [ast, Environment(),
+                                         lambda value: value])
         ast = ProgAst(
             [AssignAst(VarAst('a'), LiteralAst("foo")), VarAst('a')])
-        execute(evaluate,
-                [ast,
-                 Environment(),
-                 lambda value: self.assertEqual(value, "foo")])
+        self.execute(self.evaluate,
+                     [ast,
+                      Environment(),
+                      lambda value: self.assertEqual(value, "foo")])
         ast = AssignAst(VarAst("a"), LiteralAst("foo"))
         with self.assertRaises(Exception):
-            execute(evaluate, [ast, Environment(
+            self.execute(self.evaluate, [ast, Environment(
                 Environment()), lambda value: value])
         ast = CallAst(
             LambdaAst("", ["a"], VarAst("a")),
             [LiteralAst(1)],
         )
-        execute(evaluate, [ast, Environment(),
-                           lambda value: self.assertEqual(value, 1.0)])
+        self.execute(self.evaluate,
+                     [ast, Environment(),
+                      lambda value: self.assertEqual(value, 1.0)])
         ast = CallAst(
             LambdaAst("", ["a"], VarAst("a")),
             [LiteralAst("abc")],
         )
-        execute(evaluate, [ast, Environment(),
-                           lambda value: self.assertEqual(value, "abc")])
+        self.execute(self.evaluate,
+                     [ast, Environment(),
+                      lambda value: self.assertEqual(value, "abc")])
         # (λ loop (n) if n > 0 then n + loop(n - 1) else 0) (10)
         ast = CallAst(
             LambdaAst(
@@ -91,11 +99,12 @@ class TestEvaluate(TestCase):
                     LiteralAst(0), ), ),
             [LiteralAst(10)]
         )
-        execute(evaluate, [ast, Environment(),
-                           lambda value: self.assertEqual(value, 55.0)])
+        self.execute(self.evaluate,
+                     [ast, Environment(),
+                      lambda value: self.assertEqual(value, 55.0)])
         # let (x) x;
         ast = LetAst([VarDefAst("x", None)], VarAst("x"))
-        execute(evaluate, [ast, Environment(), self.assertFalse])
+        self.execute(self.evaluate, [ast, Environment(), self.assertFalse])
         # let (x = 2, y = x + 1, z = x + y) x + y + z
         ast = LetAst(
             [
@@ -115,8 +124,9 @@ class TestEvaluate(TestCase):
                 VarAst("z"),
             )
         )
-        execute(evaluate, [ast, Environment(),
-                           lambda value: self.assertEqual(value, 10.0)])
+        self.execute(self.evaluate,
+                     [ast, Environment(),
+                      lambda value: self.assertEqual(value, 10.0)])
         # the second expression will result an errors,
         # since x, y, z are bound to the let body
         # let (x = 2, y = x + 1, z = x + y) x + y + z; x + y + z
@@ -142,25 +152,29 @@ class TestEvaluate(TestCase):
             ),
         ])
         with self.assertRaises(Exception):
-            execute(evaluate, [ast, Environment(), lambda value: value])
+            self.execute(self.evaluate, [ast, Environment(),
+                                         lambda value: value])
         ast = IfAst(LiteralAst(""), LiteralAst(1), None)
-        execute(evaluate, [ast, Environment(),
-                           lambda value: self.assertEqual(value, 1.0)])
+        self.execute(self.evaluate,
+                     [ast, Environment(),
+                      lambda value: self.assertEqual(value, 1.0)])
         ast = IfAst(
             LiteralAst(False),
             LiteralAst(1),
             LiteralAst(2))
-        execute(evaluate, [ast, Environment(),
-                           lambda value: self.assertEqual(value, 2.0)])
+        self.execute(self.evaluate,
+                     [ast, Environment(),
+                      lambda value: self.assertEqual(value, 2.0)])
         ast = IfAst(
             LiteralAst(False),
             LiteralAst(1),
             LiteralAst(False),
         )
-        execute(evaluate, [ast, Environment(), self.assertFalse])
+        self.execute(self.evaluate, [ast, Environment(), self.assertFalse])
         ast = {"type": "foo", "value": 'foo'}
         with self.assertRaises(Exception):
-            execute(evaluate, [ast, Environment(), lambda value: value])
+            self.execute(self.evaluate, [ast, Environment(),
+                                         lambda value: value])
         # fib = λ(n) if n < 2 then n else fib(n - 1) + fib(n - 2);
         # fib(6);
         #
@@ -193,8 +207,9 @@ class TestEvaluate(TestCase):
             ),
             CallAst(VarAst('fib'), [LiteralAst(6)]),
         ])
-        execute(evaluate, [ast, Environment(),
-                           lambda value: self.assertEqual(value, 8.0)])
+        self.execute(self.evaluate,
+                     [ast, Environment(),
+                      lambda value: self.assertEqual(value, 8.0)])
         # Recursion is unlimited since we implement CPS
         # fib = λ(n) if n < 2 then n else fib(n - 1) + fib(n - 2);fib(20);
         ast = ProgAst([
@@ -226,20 +241,21 @@ class TestEvaluate(TestCase):
             ),
             CallAst(VarAst('fib'), [LiteralAst(20)]),
         ])
-        execute(evaluate, [ast, Environment(),
-                           lambda value: self.assertEqual(value, 6765.0)])
+        self.execute(self.evaluate,
+                     [ast, Environment(),
+                      lambda value: self.assertEqual(value, 6765.0)])
         ast = IfAst(
             LiteralAst(False),
             LiteralAst(1),
             LiteralAst(False),
         )
-        execute(evaluate, [ast, Environment(), self.assertFalse])
+        self.execute(self.evaluate, [ast, Environment(), self.assertFalse])
         ast = CallAst(
             LiteralAst(1),
             [],
         )
         with self.assertRaises(Exception):
-            execute(evaluate, [ast, Environment(), self.assertFalse])
+            self.execute(self.evaluate, [ast, Environment(), self.assertFalse])
         global_env = Environment()
         for name, func in primitive.items():
             global_env.define(name, func)
@@ -247,8 +263,8 @@ class TestEvaluate(TestCase):
         2 + twice(3, 4);
         """
         parser = Parser(TokenStream(InputStream(code)))
-        execute(
-            evaluate,
+        self.execute(
+            self.evaluate,
             (parser(),
              global_env,
              lambda result: result))
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# pylint: disable=C0111
+import evaluator
+import evaluator_closure
+from environment import Environment
+from resolver import resolve
+from tests import test_evaluate
+from tests.common import parse, run_module, samples
+
+
+class TestEvaluatorClosure(test_evaluate.TestEvaluate):
+    evaluate = staticmethod(evaluator_closure.evaluate)
+
+    def test_programs(self):
+        for code in (
+                'fib = λ(n) if n < 2 then n else fib(n - 1) + fib(n - 2);'
+                'fib(12)',
+                'λ loop(n) if n > 0 then n + loop(n - 1) else 0',
+                'let loop (n = 10) if n > 0 then n + loop(n - 1) else 0',
+                'count = let (n = 0) λ() n = n + 1; count(); count()',
+                'f = λ(a, b, c, d, e) a + d; f(1, 2, 3, 4)',
+                'f = λ(a, b, c, d) d; f(1, 2)',
+                'x = 3; { x = x * 2; x % 4 } / 2 - 1 <= 3 && x != 6',
+                'false || "a" || 1',
+                'h = λ g(x) if x == 1 then g else { g = x; h(1) }; h(5)'):
+            ast = parse(code)
+            self.assertEqual(run_module(evaluator_closure, ast),
+                             run_module(evaluator, ast), code)
+
+    def test_errors(self):
+        for code in ('1 + "a"', '1 / 0', '"a" % 2', 'f = λ() y = 1; f()',
+                     'λ() 1 + "a"', 'λ(a) a', 'if false then 1 else g'):
+            ast = parse(code)
+            try:
+                expected = evaluator.evaluate(ast, Environment())
+            except Exception as error:  # pylint: disable=broad-except
+                with self.assertRaises(Exception) as context:
+                    evaluator_closure.evaluate(ast, Environment())
+                self.assertEqual(str(context.exception), str(error), code)
+            else:
+                self.assertEqual(
+                    callable(evaluator_closure.evaluate(ast, Environment())),
+                    callable(expected), code)
+
+    def test_compile_once(self):
+        run = evaluator_closure.compile_ast(parse('x = x + 1'))
+        for value in range(3):
+            env = Environment()
+            env.define('x', value)
+            self.assertEqual(run(env), value + 1)
+
+    def test_resolved_again(self):
+        ast = parse('f = λ(a) λ loop(n) if n == 0 then a else loop(n - 1);'
+                    'f(7)(3)')
+        run = evaluator_closure.compile_ast(ast)
+        # as the stack guard evaluator does, binding loop in its frames
+        resolve(ast, name_in_call_frame=True)
+        self.assertEqual(run(Environment()), 7)
+
+    def test_samples(self):
+        for name, ast in samples():
+            self.assertEqual(run_module(evaluator_closure, ast),
+                             run_module(evaluator, ast), name)
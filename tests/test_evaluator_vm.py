@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# pylint: disable=C0111
+import evaluator_callback_stack_guard
+import evaluator_vm
+from bytecode import compile_ast, disassemble
+from environment import Environment
+from tests import test_evaluate_callback_stack_guard
+from tests.common import parse, run_callback_module
+
+
+class TestEvaluatorVm(test_evaluate_callback_stack_guard.TestEvaluate):
+    execute = staticmethod(evaluator_vm.execute)
+    evaluate = staticmethod(evaluator_vm.evaluate)
+
+    def test_programs(self):
+        for code in (
+                'fib = λ(n) if n < 2 then n else fib(n - 1) + fib(n - 2);'
+                'fib(12)',
+                'let loop (n = 10) if n > 0 then n + loop(n - 1) else 0',
+                'count = let (n = 0) λ() n = n + 1; count(); count()',
+                'f = λ(a, b, c, d, e) a + d; f(1, 2, 3, 4)',
+                'f = λ(a, b, c, d) d; f(1, 2)',
+                'x = 3; { x = x * 2; x % 4 } / 2 - 1 <= 3 && x != 6',
+                'false || "a" || 1',
+                'h = λ g(x) if x == 1 then g else { g = x; h(1) }; h(5)',
+                'f = λ(a, b) { a = b; b = a + 1; a + b }; f(1, 2)',
+                'print(2 + twice(3, 4)); println("done")',
+                'foo = λ(return) { println("foo"); return("DONE");'
+                ' println("bar") }; CallCC(foo)',
+                'println("foo"); halt(); println("bar")',
+                'k = false; n = 0; println(CallCC(λ(c) { k = c; 0 }) + 1);'
+                'if (n = n + 1) < 3 then k(n)',
+                'f = λ() let (n = 0, k = false) { k = CallCC(λ(c) c);'
+                ' n = n + 1; if n < 3 then k(k) else n }; f()'):
+            ast = parse(code)
+            self.assertEqual(
+                run_callback_module(evaluator_vm, ast),
+                run_callback_module(evaluator_callback_stack_guard, ast), code)
+
+    def test_errors(self):
+        for code in ('1 + "a"', '1 / 0', 'f = λ() y = 1; f()',
+                     'f = λ(a) a; f(1, 2)', '1()'):
+            with self.assertRaises(Exception, msg=code):
+                run_callback_module(evaluator_vm, parse(code))
+
+    def test_deep_recursion(self):
+        ast = parse('sum = λ(n) if n == 0 then 0 else n + sum(n - 1);'
+                    'sum(100000)')
+        self.assertEqual(run_callback_module(evaluator_vm, ast),
+                         repr(([5000050000.0], '')))
+
+    def test_tail_call(self):
+        code = compile_ast(parse('λ(f, n) if n == 0 then 0 else f(n - 1)'))
+        lambda_code = code.consts[0]
+        self.assertIn('TAIL_CALL', disassemble(lambda_code))
+        self.assertNotIn(' CALL ', disassemble(lambda_code))
+
+    def test_closure_from_python(self):
+        env = Environment()
+        results = []
+        evaluator_vm.evaluate(parse('λ(a, b) a * b'), env, results.append)
+        closure, = results
+        closure(results.append, 6, 7)
+        self.assertEqual(results[1:], [42])
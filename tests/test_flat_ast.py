@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# pylint: disable=C0111
+import os
+from multiprocessing import shared_memory
+from unittest import TestCase
+
+from ast import (AssignAst, BinaryAst, CallAst, IfAst, LambdaAst, LetAst,
+                 LiteralAst, ProgAst, VarAst, VarDefAst)
+from compiler import to_js
+from cps_transformer import to_cps
+from flat_ast import (BINARY, CALL, LITERAL, PROG, VAR, FlatAst, flatten,
+                      make_scope)
+from flat_ast import to_js as flat_to_js
+from input_stream import InputStream
+from optimize import Optimizer, _make_scope
+from parse import Parser
+from token_stream import RegexTokenStream
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+
+
+def _parse(code):
+    return Parser(RegexTokenStream(InputStream(code)))()
+
+
+def _optimize(code):
+    ast = to_cps(_parse(code),
+                 lambda ast: CallAst(VarAst('β_TOPLEVEL'), [ast]))
+    return Optimizer().optimize(ast)
+
+
+def _read(name):
+    with open(os.path.join(ROOT, name)) as file:
+        return file.read()
+
+
+class TestFlatAst(TestCase):
+    def test_layout(self):
+        flat = flatten(ProgAst([
+            CallAst(VarAst('f'), [LiteralAst(1.0)]),
+            BinaryAst('+', VarAst('f'), LiteralAst(True))]))
+        self.assertEqual(list(flat.kinds),
+                         [PROG, CALL, BINARY, VAR, LITERAL, VAR, LITERAL])
+        self.assertEqual(list(flat.children(0)), [1, 2])
+        self.assertEqual(list(flat.children(1)), [3, 4])
+        self.assertEqual(list(flat.children(2)), [5, 6])
+        self.assertEqual(list(flat.children(3)), [])
+        self.assertEqual(list(flat.walk()), [0, 1, 3, 4, 2, 5, 6])
+        self.assertEqual(list(flat.walk(2)), [2, 5, 6])
+        # names are pooled, True and 1.0 are not merged
+        self.assertEqual(flat.values[3], flat.values[5])
+        self.assertIs(flat.value(6), True)
+        self.assertEqual(flat.value(4), 1.0)
+        self.assertIsNone(flat.value(0))
+
+    def test_round_trip(self):
+        asts = [
+            LetAst([VarDefAst('x', None), VarDefAst('y', LiteralAst('s'))],
+                   AssignAst(VarAst('x'), VarAst('y'))),
+            LambdaAst('f', ['a', 'b'],
+                      IfAst(VarAst('a'), LiteralAst(-0.0), VarAst('b')),
+                      ['c']),
+            ProgAst([]),
+        ]
+        for ast in asts:
+            self.assertEqual(flatten(ast).to_ast(), ast)
+        for name in ('list.lambda', 'let_and_named_lambda.lambda',
+                     'js_raw.lambda'):
+            ast = _parse(_read(name))
+            self.assertEqual(flatten(ast).to_ast(), ast)
+
+    def test_buffer(self):
+        ast = _parse(_read('list.lambda') + '\nλ f(x, y) x')
+        data = flatten(ast).to_bytes()
+        self.assertEqual(FlatAst.from_buffer(data).to_ast(), ast)
+        memory = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            memory.buf[:len(data)] = data
+            flat = FlatAst.from_buffer(memory.buf)
+            self.assertEqual(flat.to_ast(), ast)
+            del flat
+        finally:
+            memory.close()
+            memory.unlink()
+        with self.assertRaises(Exception):
+            FlatAst.from_buffer(b'garbage' * 4)
+
+    def test_make_scope(self):
+        ast = _optimize(_read('primitive.lambda') + _read('list.lambda'))
+        flat = flatten(ast)
+        scope = make_scope(flat)
+        global_names = list(ast.env.vars)
+        self.assertEqual(list(scope.global_environment.vars), global_names)
+        for index, node in zip(flat.walk(), _walk(ast)):
+            if isinstance(node, VarAst):
+                variable = scope.variables[index]
+                self.assertEqual(scope.names[variable], node.name)
+                self.assertEqual(scope.kinds[variable], node.define.kind)
+                self.assertEqual(scope.refs[variable], len(node.define.refs))
+                self.assertEqual(scope.assigned[variable],
+                                 node.define.assigned)
+
+    def test_to_js(self):
+        for code in (_read('primitive.lambda') + _read('list.lambda'),
+                     'a = 1; b = a < 2 && a > 0; if b then a else 2',
+                     'let (x, y = 2) x + y'):
+            ast = _optimize(code)
+            self.assertEqual(flat_to_js(flatten(ast)), to_js(ast))
+        # lets are gone after cps
+        ast = _parse('let (x, y = 2, z) x + y; let () 1')
+        _make_scope(ast)
+        self.assertEqual(flat_to_js(flatten(ast)), to_js(ast))
+
+
+def _walk(ast):
+    """
+    the same nodes as FlatAst.walk, from ast
+    """
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        yield node
+        if node is None:
+            continue
+        children = {
+            LetAst: lambda: [*node.vardefs, node.body],
+            VarDefAst: lambda: [node.define],
+            LambdaAst: lambda: [node.body],
+            CallAst: lambda: [node.func, *node.args],
+            ProgAst: lambda: node.prog,
+            IfAst: lambda: [node.cond, node.then, node.else_],
+            BinaryAst: lambda: [node.left, node.right],
+            AssignAst: lambda: [node.left, node.right],
+        }.get(type(node), list)()
+        stack.extend(reversed(children))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# pylint: disable=C0111
+import os
+from random import Random
+from unittest import TestCase
+
+from incremental import IncrementalParser
+from input_stream import InputStream
+from parse import Parser
+from tests.common import normalize
+from token_stream import RegexTokenStream
+
+
+def _parse(code):
+    return Parser(RegexTokenStream(InputStream(code)))()
+
+
+class TestIncrementalParser(TestCase):
+    CODE = 'a = 1;\nb = λ(x) x + a;  # comment\nprintln(b(2));\nc = "s;"'
+
+    def _assert_edit(self, incremental_parser, start, end, text):
+        source = incremental_parser.source
+        source = source[:start] + text + source[end:]
+        ast = incremental_parser.edit(start, end, text)
+        self.assertEqual(incremental_parser.source, source)
+        self.assertEqual(normalize(ast), normalize(_parse(source)))
+        buffer = RegexTokenStream(InputStream(source)).tokenize_all()
+        self.assertEqual(incremental_parser.buffer.kinds, buffer.kinds)
+        tokens = range(len(buffer))
+        self.assertEqual([incremental_parser.buffer.start(i) for i in tokens],
+                         list(buffer.starts))
+        self.assertEqual([incremental_parser.buffer.end(i) for i in tokens],
+                         list(buffer.ends))
+        self.assertEqual(incremental_parser.buffer.values, buffer.values)
+        return ast
+
+    def test_reuse(self):
+        incremental_parser = IncrementalParser(self.CODE)
+        old_prog = list(incremental_parser.ast.prog)
+        start = self.CODE.index('x + a')
+        prog = self._assert_edit(
+            incremental_parser, start, start + 1, 'x * 2').prog
+        self.assertIs(prog[0], old_prog[0])
+        self.assertIsNot(prog[1], old_prog[1])
+        self.assertIs(prog[2], old_prog[2])
+        self.assertIs(prog[3], old_prog[3])
+
+    def test_edits(self):
+        incremental_parser = IncrementalParser(self.CODE)
+        # split a statement in two
+        self._assert_edit(incremental_parser, 5, 5, ';d = 2')
+        # join them again
+        self._assert_edit(incremental_parser, 5, 11, '')
+        # comment out the rest of a line
+        start = incremental_parser.source.index('println')
+        self._assert_edit(incremental_parser, start, start, '#')
+        self._assert_edit(incremental_parser, start, start + 1, '')
+        # grow an identifier
+        self._assert_edit(incremental_parser, 1, 1, 'aa')
+        # open and close a string
+        self._assert_edit(incremental_parser, 0, 0, 'd = "x";')
+        # edit at both ends
+        self._assert_edit(incremental_parser, 0, 0, '\n')
+        end = len(incremental_parser.source)
+        self._assert_edit(incremental_parser, end, end, ';\ne = 3')
+        end = len(incremental_parser.source)
+        self._assert_edit(incremental_parser, 0, end, '')
+        self._assert_edit(incremental_parser, 0, 0, self.CODE)
+
+    def test_invalid_edit(self):
+        incremental_parser = IncrementalParser(self.CODE)
+        ast = incremental_parser.ast
+        prog = list(ast.prog)
+        with self.assertRaises(Exception):
+            incremental_parser.edit(0, 0, '"')
+        with self.assertRaises(Exception):
+            incremental_parser.edit(0, 0, '(')
+        self.assertIs(incremental_parser.ast, ast)
+        self.assertEqual(ast.prog, prog)
+        self.assertEqual(incremental_parser.source, self.CODE)
+        # the tokens are spliced back
+        self._assert_edit(incremental_parser, 1, 1, 'a')
+        with self.assertRaises(Exception):
+            incremental_parser.edit(7, 8, '(')
+        self._assert_edit(incremental_parser, 0, 0, '\n')
+
+    def test_random_edits(self):
+        root = os.path.join(os.path.dirname(__file__), os.pardir)
+        with open(os.path.join(root, 'list.lambda')) as file:
+            code = file.read()
+        random = Random(0)
+        incremental_parser = IncrementalParser(code)
+        for _ in range(200):
+            source = incremental_parser.source
+            start = random.randrange(len(source) + 1)
+            end = min(start + random.randrange(4), len(source))
+            text = random.choice(['', ' ', 'x', ';', '1', '#', '\n', '"'])
+            new_source = source[:start] + text + source[end:]
+            try:
+                _parse(new_source)
+            except Exception:  # pylint: disable=broad-except
+                continue
+            self._assert_edit(incremental_parser, start, end, text)
@@ -1,10 +1,17 @@
 #!/usr/bin/env python
 # encoding: utf-8
+import os
+import pickle
+import re
+from io import StringIO
 from random import choice
 from string import printable
+from tempfile import TemporaryDirectory
 from unittest import TestCase
 
-from input_stream import InputStream
+from input_stream import ChunkedInputStream, FileChain, InputStream, \
+    ParseError
+from token_stream import RegexTokenStream, TokenStream
 
 
 class TestInputStream(TestCase):
@@ -39,3 +46,98 @@ class TestInputStream(TestCase):
                 self.assertFalse(input_stream.eof())
                 input_stream.next()
             self.assertTrue(input_stream.eof())
+
+    def test_position(self):
+        input_stream = InputStream('ab\ncd\n\nef')
+        self.assertEqual(input_stream.position(), (1, 0))
+        expected = [(1, 1), (1, 2), (2, 0), (2, 1), (2, 2), (3, 0), (4, 0),
+                    (4, 1), (4, 2), (4, 3)]
+        for line_and_col in expected:
+            input_stream.next()
+            self.assertEqual(input_stream.position(), line_and_col)
+        self.assertEqual(input_stream.position(4), (2, 1))
+        self.assertEqual(input_stream.position(0), (1, 0))
+
+    def test_croak(self):
+        input_stream = InputStream('ab\ncd')
+        for _ in range(4):
+            input_stream.next()
+        with self.assertRaisesRegex(ParseError, r'^foo \(2:1\)$') as context:
+            input_stream.croak('foo')
+        error = context.exception
+        self.assertEqual((error.message, error.line, error.col), ('foo', 2, 1))
+        self.assertEqual(str(pickle.loads(pickle.dumps(error))), str(error))
+
+
+class TestChunkedInputStream(TestCase):
+    def test_next_and_peek(self):
+        for chunk_size in range(1, 5):
+            input_ = 'ab\ncd\n\nef'
+            input_stream = ChunkedInputStream(StringIO(input_), chunk_size)
+            for char in input_:
+                self.assertFalse(input_stream.eof())
+                self.assertEqual(input_stream.peek(), char)
+                self.assertEqual(input_stream.next(), char)
+            self.assertTrue(input_stream.eof())
+            self.assertEqual(input_stream.next(), '')
+            self.assertEqual(input_stream.peek(), '')
+
+    def test_position(self):
+        input_stream = ChunkedInputStream(StringIO('ab\ncd\n\nef'), 2)
+        for _ in range(8):
+            input_stream.next()
+        self.assertEqual(input_stream.offset, 8)
+        self.assertEqual(input_stream.position(), (4, 1))
+        self.assertEqual(input_stream.position(4), (2, 1))
+        with self.assertRaisesRegex(Exception, r'^foo \(4:1\)$'):
+            input_stream.croak('foo')
+
+    def test_match_across_chunks(self):
+        pattern = re.compile('[a-z]+')
+        input_stream = ChunkedInputStream(StringIO('abcdefg1'), 3)
+        self.assertEqual(input_stream.match(pattern).group(), 'abcdefg')
+        self.assertIsNone(input_stream.match(pattern))
+        self.assertEqual(input_stream.next(), '1')
+        self.assertTrue(input_stream.eof())
+
+    def test_long_match(self):
+        reader = StringIO('a' * 100000 + '1')
+        sizes = []
+        read = reader.read
+        reader.read = lambda size: sizes.append(size) or read(size)
+        input_stream = ChunkedInputStream(reader, 16)
+        self.assertEqual(len(input_stream.match(re.compile('a+')).group()),
+                         100000)
+        # the window doubles on each refill rather than growing by a chunk
+        self.assertLess(len(sizes), 20)
+
+    def test_tokens(self):
+        code = '# comment\nfoo = λ(x) "a\\"b" + x;\nfoo(1.5)'
+        expected = []
+        token_stream = TokenStream(InputStream(code))
+        while not token_stream.eof():
+            expected.append(token_stream.next())
+        for token_stream_class in (TokenStream, RegexTokenStream):
+            for chunk_size in (1, 2, 7):
+                token_stream = token_stream_class(
+                    ChunkedInputStream(StringIO(code), chunk_size))
+                tokens = []
+                while not token_stream.eof():
+                    tokens.append(token_stream.next())
+                self.assertEqual(tokens, expected)
+
+
+class TestFileChain(TestCase):
+    def test_read(self):
+        with TemporaryDirectory() as directory:
+            paths = []
+            for i, content in enumerate(['abc', '', 'de\nf']):
+                paths.append(os.path.join(directory, f'{i}.lambda'))
+                with open(paths[-1], 'w') as file:
+                    file.write(content)
+            with FileChain(paths) as source:
+                input_stream = ChunkedInputStream(source, 2)
+                chars = []
+                while not input_stream.eof():
+                    chars.append(input_stream.next())
+            self.assertEqual(''.join(chars), 'abcde\nf')
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# pylint: disable=C0111
+import os
+import re
+from unittest import TestCase
+
+from input_stream import InputStream
+from parallel_parse import parse_parallel, split_toplevel
+from parse import Parser
+from tests.common import normalize
+from token_stream import RegexTokenStream
+from utils import gensym_counter
+
+
+def _parse(code):
+    return Parser(RegexTokenStream(InputStream(code)))()
+
+
+class TestSplitToplevel(TestCase):
+    def _pieces(self, code, chunks):
+        bounds = split_toplevel(code, chunks)
+        self.assertEqual(bounds[0][0], 0)
+        self.assertEqual(bounds[-1][1], len(code))
+        for (_, end), (start, _) in zip(bounds, bounds[1:]):
+            self.assertEqual(end, start)
+        return [code[start:end] for start, end in bounds]
+
+    def test_split(self):
+        self.assertEqual(self._pieces('a; b; c; d', 4),
+                         ['a;', ' b;', ' c;', ' d'])
+        self.assertEqual(self._pieces('a; b; c; d', 2), ['a; b;', ' c; d'])
+        self.assertEqual(self._pieces('a; b', 1), ['a; b'])
+        self.assertEqual(self._pieces('', 3), [''])
+
+    def test_nested(self):
+        self.assertEqual(self._pieces('{a; b}; f(λ() {c; d}); [e; f]', 8),
+                         ['{a; b};', ' f(λ() {c; d});', ' [e; f]'])
+
+    def test_strings_and_comments(self):
+        self.assertEqual(
+            self._pieces('a = "x;\\";{"; # b; (\nc; d', 8),
+            ['a = "x;\\";{";', ' # b; (\nc;', ' d'])
+
+
+class TestParseParallel(TestCase):
+    def _assert_same_ast(self, code, workers=2):
+        counter = gensym_counter()
+        ast = parse_parallel(code, workers, min_chunk_size=1)
+        self.assertEqual(normalize(ast), normalize(_parse(code)))
+        self.assertGreaterEqual(gensym_counter(), counter)
+        return ast
+
+    def test_samples(self):
+        root = os.path.join(os.path.dirname(__file__), os.pardir)
+        for name in sorted(os.listdir(root)):
+            if name.endswith('.lambda'):
+                with open(os.path.join(root, name)) as file:
+                    self._assert_same_ast(file.read())
+
+    def test_unique_gensym(self):
+        code = ';\n'.join(f'f(a{i} || b)' for i in range(50))
+        names = re.findall(r'β_left\d+', repr(self._assert_same_ast(code)))
+        self.assertEqual(len(set(names)), 50)
+
+    def test_sequential(self):
+        self._assert_same_ast('a = 1; b = a || 2', workers=1)
+
+    def test_syntax_error(self):
+        code = 'a = 1;\nb = 2;\nc = (3;\nd = 4'
+        with self.assertRaises(Exception) as context:
+            parse_parallel(code, 2, min_chunk_size=1)
+        with self.assertRaises(Exception) as sequential_context:
+            _parse(code)
+        self.assertEqual(str(context.exception),
+                         str(sequential_context.exception))
@@ -11,99 +11,104 @@ from ast import ProgAst, LiteralAst, VarAst, BinaryAst, AssignAst, CallAst, \
     IfAst, LambdaAst, LetAst, VarDefAst, JsAst
 from parse import Parser
 from token_stream import TokenStream
-from input_stream import InputStream
+from input_stream import InputStream, ParseError
 
 
 class TestParser(TestCase):
+    parser_class = Parser
+
+    def _parser(self, code):
+        return self.parser_class(TokenStream(InputStream(code)))
+
     def test_skip_punc(self):
-        parser = Parser(TokenStream(InputStream(';')))
+        parser = self._parser(';')
         parser._skip_punc(';')
         self.assertTrue(parser._token_stream.eof())
-        parser = Parser(TokenStream(InputStream(';')))
+        parser = self._parser(';')
         with self.assertRaises(Exception):
             parser._skip_punc('e')
 
     def test_is_punc(self):
-        parser = Parser(TokenStream(InputStream(';')))
+        parser = self._parser(';')
         self.assertTrue(parser._is_punc(';'))
 
     def test_skip_kw(self):
-        parser = Parser(TokenStream(InputStream('else')))
+        parser = self._parser('else')
         parser._skip_kw('else')
         self.assertTrue(parser._token_stream.eof())
-        parser = Parser(TokenStream(InputStream('else')))
+        parser = self._parser('else')
         with self.assertRaises(Exception):
             parser._skip_kw('e')
 
     def test_is_kw(self):
-        parser = Parser(TokenStream(InputStream('if')))
+        parser = self._parser('if')
         self.assertTrue(parser._is_kw('if'))
 
     def test_skip_op(self):
-        parser = Parser(TokenStream(InputStream('>')))
+        parser = self._parser('>')
         parser._skip_op('>')
         self.assertTrue(parser._token_stream.eof())
-        parser = Parser(TokenStream(InputStream('>')))
+        parser = self._parser('>')
         with self.assertRaises(Exception):
             parser._skip_op('<')
 
     def test_is_op(self):
-        parser = Parser(TokenStream(InputStream('>')))
+        parser = self._parser('>')
         self.assertTrue(parser._is_op('>'))
 
     def test_parse_varname(self):
-        parser = Parser(TokenStream(InputStream('foo')))
+        parser = self._parser('foo')
         self.assertEqual(parser._parse_varname(), 'foo')
 
-        parser = Parser(TokenStream(InputStream('1')))
+        parser = self._parser('1')
         with self.assertRaises(Exception):
             parser._parse_varname()
 
     def test_delimited(self):
-        parser = Parser(TokenStream(InputStream('{a, b, c}')))
+        parser = self._parser('{a, b, c}')
         self.assertEqual(
             parser._delimited('{', '}', ',', parser._parse_varname),
             ['a', 'b', 'c'])
-        parser = Parser(TokenStream(InputStream('{}')))
+        parser = self._parser('{}')
         self.assertEqual(parser._delimited('{', '}', ',',
                                            parser._parse_varname), [])
-        parser = Parser(TokenStream(InputStream('{a,}')))
+        parser = self._parser('{a,}')
         self.assertEqual(parser._delimited('{', '}', ',',
                                            parser._parse_varname), ['a'])
-        parser = Parser(TokenStream(InputStream('{a,b,}')))
+        parser = self._parser('{a,b,}')
         self.assertEqual(parser._delimited('{', '}', ',',
                                            parser._parse_varname), ['a', 'b'])
 
     def test_parse_js_raw(self):
-        parser = Parser(TokenStream(InputStream('js "abc"')))
+        parser = self._parser('js "abc"')
         self.assertEqual(
             parser._parse_js_raw(),
             JsAst("abc"))
         # js must followed by code string
         with self.assertRaises(Exception):
-            parser = Parser(TokenStream(InputStream('js')))
+            parser = self._parser('js')
             parser._parse_js_raw(),
         with self.assertRaises(Exception):
-            parser = Parser(TokenStream(InputStream('js 1')))
+            parser = self._parser('js 1')
             parser._parse_js_raw(),
 
     def test_parse_lambda(self):
-        parser = Parser(TokenStream(InputStream('lambda (a, b) 1')))
+        parser = self._parser('lambda (a, b) 1')
         self.assertEqual(
             parser._parse_lambda('lambda'),
             LambdaAst('', ['a', 'b'], LiteralAst(1)))
-        parser = Parser(TokenStream(InputStream('lambda foo () "abc"')))
+        parser = self._parser('lambda foo () "abc"')
         self.assertEqual(
             parser._parse_lambda('lambda'),
             LambdaAst('foo', [], LiteralAst('abc')))
 
     def test_parse_let(self):
-        parser = Parser(TokenStream(InputStream('let (a = 1, b = 2) 1')))
+        parser = self._parser('let (a = 1, b = 2) 1')
         self.assertEqual(parser._parse_let(),
                          LetAst([VarDefAst("a", LiteralAst(1.0)),
                                  VarDefAst("b", LiteralAst(2.0)), ],
                                 LiteralAst(1.0), ))
-        parser = Parser(TokenStream(InputStream('let foo (a = 1, b = 2) foo')))
+        parser = self._parser('let foo (a = 1, b = 2) foo')
         self.assertEqual(parser._parse_let(),
                          CallAst(
                              LambdaAst(
@@ -111,12 +116,12 @@ class TestParser(TestCase):
                                  ['a', 'b'],
                                  VarAst('foo')),
                              [LiteralAst(1), LiteralAst(2), ]))
-        parser = Parser(TokenStream(InputStream('let foo (a, b = 2) foo')))
+        parser = self._parser('let foo (a, b = 2) foo')
         self.assertEqual(parser._parse_let(),
                          CallAst(
                              LambdaAst('foo', ['a', 'b'], VarAst('foo'), ),
                              [LiteralAst(False), LiteralAst(2), ]))
-        parser = Parser(TokenStream(InputStream('let (a, b = 2) 1')))
+        parser = self._parser('let (a, b = 2) 1')
         self.assertEqual(
             parser._parse_let(),
             LetAst(
@@ -124,70 +129,70 @@ class TestParser(TestCase):
                 LiteralAst(1), ))
 
     def test_parse_vardef(self):
-        parser = Parser(TokenStream(InputStream('a = 1')))
+        parser = self._parser('a = 1')
         self.assertEqual(
             parser._parse_vardef(),
             VarDefAst('a', LiteralAst(1.0)))
 
-        parser = Parser(TokenStream(InputStream('a')))
+        parser = self._parser('a')
         self.assertEqual(parser._parse_vardef(), VarDefAst('a', None))
 
     def test_parse_toplevel(self):
-        parser = Parser(TokenStream(InputStream('1;"a";foo')))
+        parser = self._parser('1;"a";foo')
         self.assertEqual(
             parser._parse_toplevel(),
             ProgAst([
                 LiteralAst(1.0),
                 LiteralAst("a"),
                 VarAst('foo')]))
-        parser = Parser(TokenStream(InputStream('1;"a";foo;')))
+        parser = self._parser('1;"a";foo;')
         self.assertEqual(
             parser._parse_toplevel(),
             ProgAst([
                 LiteralAst(1.0),
                 LiteralAst("a"),
                 VarAst('foo')]))
-        parser = Parser(TokenStream(InputStream('')))
+        parser = self._parser('')
         self.assertEqual(parser._parse_toplevel(), ProgAst([]))
-        parser = Parser(TokenStream(InputStream('a 1 2')))
+        parser = self._parser('a 1 2')
         with self.assertRaises(Exception):
             parser._parse_toplevel()
 
     def test_call(self):
-        parser = Parser(TokenStream(InputStream('1;"a";foo')))
+        parser = self._parser('1;"a";foo')
         self.assertEqual(
             parser(),
             ProgAst([
                 LiteralAst(1.0),
                 LiteralAst('a'),
                 VarAst('foo')]))
-        parser = Parser(TokenStream(InputStream('1;"a";foo;')))
+        parser = self._parser('1;"a";foo;')
         self.assertEqual(
             parser(),
             ProgAst([
                 LiteralAst(1.0),
                 LiteralAst('a'),
                 VarAst('foo')]))
-        parser = Parser(TokenStream(InputStream('')))
+        parser = self._parser('')
         self.assertEqual(parser(), ProgAst([]))
-        parser = Parser(TokenStream(InputStream('a 1 2')))
+        parser = self._parser('a 1 2')
         with self.assertRaises(Exception):
             parser()
 
     def test_parse_prog(self):
-        parser = Parser(TokenStream(InputStream('{}')))
+        parser = self._parser('{}')
         self.assertEqual(
             parser._parse_prog(),
             ProgAst([]))
-        parser = Parser(TokenStream(InputStream('{1;}')))
+        parser = self._parser('{1;}')
         self.assertEqual(parser._parse_prog(), ProgAst([LiteralAst(1)]))
-        parser = Parser(TokenStream(InputStream('{1;"bc"}')))
+        parser = self._parser('{1;"bc"}')
         self.assertEqual(parser._parse_prog(), ProgAst([
             LiteralAst(1),
             LiteralAst("bc")]))
 
     def test_parse_if(self):
-        parser = Parser(TokenStream(InputStream('if 1 then 2 else 3')))
+        parser = self._parser('if 1 then 2 else 3')
         self.assertEqual(
             parser._parse_if(),
             IfAst(
@@ -195,7 +200,7 @@ class TestParser(TestCase):
                 LiteralAst(2.0),
                 LiteralAst(3.0)))
 
-        parser = Parser(TokenStream(InputStream('if 1 {2} else 3')))
+        parser = self._parser('if 1 {2} else 3')
         self.assertEqual(
             parser._parse_if(),
             IfAst(
@@ -203,74 +208,74 @@ class TestParser(TestCase):
                 ProgAst([LiteralAst(2.0)]),
                 LiteralAst(3.0)))
 
-        parser = Parser(TokenStream(InputStream('if 1 then 2')))
+        parser = self._parser('if 1 then 2')
         self.assertEqual(
             parser._parse_if(),
             IfAst(LiteralAst(1.0), LiteralAst(2.0), LiteralAst(False)))
 
     def test_parse_atom(self):
-        parser = Parser(TokenStream(InputStream('js "abc"')))
+        parser = self._parser('js "abc"')
         self.assertEqual(parser._parse_atom(), JsAst("abc"))
-        parser = Parser(TokenStream(InputStream('(1)')))
+        parser = self._parser('(1)')
         self.assertEqual(parser._parse_atom(), LiteralAst(1))
-        parser = Parser(TokenStream(InputStream('{1;2}')))
+        parser = self._parser('{1;2}')
         self.assertEqual(parser._parse_atom(), ProgAst(
             [LiteralAst(1), LiteralAst(2), ]))
-        parser = Parser(TokenStream(InputStream('if 1 then 2 else 3')))
+        parser = self._parser('if 1 then 2 else 3')
         self.assertEqual(parser._parse_atom(), IfAst(
             LiteralAst(1.0), LiteralAst(2.0), LiteralAst(3.0)))
-        # parser = Parser(TokenStream(InputStream('let (x = 1) 2')))
+        # parser = self._parser('let (x = 1) 2')
         # self.assertEqual(parser.parse_atom(),
         #                 {"type": "let", }
-        parser = Parser(TokenStream(InputStream('true')))
+        parser = self._parser('true')
         self.assertEqual(parser._parse_atom(), LiteralAst(True))
-        parser = Parser(TokenStream(InputStream('false')))
+        parser = self._parser('false')
         self.assertEqual(parser._parse_atom(),
                          LiteralAst(False))
-        parser = Parser(TokenStream(InputStream('lambda (n) 1')))
+        parser = self._parser('lambda (n) 1')
         self.assertEqual(parser._parse_atom(),
                          LambdaAst('', ['n'], LiteralAst(1), ))
-        parser = Parser(TokenStream(InputStream('λ (n) 1')))
+        parser = self._parser('λ (n) 1')
         self.assertEqual(parser._parse_atom(),
                          LambdaAst('', ['n'], LiteralAst(1), ))
-        parser = Parser(TokenStream(InputStream('let (a = 1, b = 2) 1')))
+        parser = self._parser('let (a = 1, b = 2) 1')
         self.assertEqual(
             parser._parse_atom(),
             LetAst(
                 [VarDefAst('a', LiteralAst(1)), VarDefAst('b', LiteralAst(2))],
                 LiteralAst(1)))
-        parser = Parser(TokenStream(InputStream('123.1')))
+        parser = self._parser('123.1')
         self.assertEqual(parser._parse_atom(), LiteralAst(123.1))
-        parser = Parser(TokenStream(InputStream('a')))
+        parser = self._parser('a')
         self.assertEqual(parser._parse_atom(), VarAst('a'))
-        parser = Parser(TokenStream(InputStream('"a"')))
+        parser = self._parser('"a"')
         self.assertEqual(parser._parse_atom(), LiteralAst("a"))
-        parser = Parser(TokenStream(InputStream('')))
+        parser = self._parser('')
         with self.assertRaises(Exception):
             parser._parse_atom()
-        parser = Parser(TokenStream(InputStream('&')))
+        parser = self._parser('&')
         with self.assertRaises(Exception):
             parser._parse_atom()
 
     def test_parse_bool(self):
-        parser = Parser(TokenStream(InputStream('true')))
+        parser = self._parser('true')
         self.assertEqual(parser._parse_bool(), LiteralAst(True))
-        parser = Parser(TokenStream(InputStream('false')))
+        parser = self._parser('false')
         self.assertEqual(parser._parse_bool(), LiteralAst(False))
 
     def test_parse_expression(self):
-        parser = Parser(TokenStream(InputStream('js "1" + 1')))
+        parser = self._parser('js "1" + 1')
         self.assertEqual(
             parser._parse_expression(),
             BinaryAst("+", JsAst("1"), LiteralAst(1)))
-        parser = Parser(TokenStream(InputStream('1() + "ab"()(1, "ab")')))
+        parser = self._parser('1() + "ab"()(1, "ab")')
         self.assertEqual(
             parser._parse_expression(),
             CallAst(
                 BinaryAst('+', CallAst(LiteralAst(1), []),
                           CallAst(LiteralAst('ab'), [])),
                 [LiteralAst(1), LiteralAst('ab')]))
-        parser = Parser(TokenStream(InputStream('if 1 then 2()()()')))
+        parser = self._parser('if 1 then 2()()()')
         self.assertEqual(
             parser._parse_expression(),
             CallAst(
@@ -280,43 +285,43 @@ class TestParser(TestCase):
                     LiteralAst(False)),
                 []))
 
-        parser = Parser(TokenStream(InputStream('1 + ')))
+        parser = self._parser('1 + ')
         with self.assertRaises(Exception):
             parser._parse_expression()
 
     def test_parse_call(self):
-        parser = Parser(TokenStream(InputStream('(b, c)')))
+        parser = self._parser('(b, c)')
         func = VarAst('a')
         self.assertEqual(parser._parse_call(func), CallAst(
             func, [VarAst('b'), VarAst('c'), ]))
 
     def test_maybe_call(self):
-        parser = Parser(TokenStream(InputStream('a(b, c)')))
+        parser = self._parser('a(b, c)')
         self.assertTrue(parser._maybe_call(parser._parse_atom),
                         CallAst(VarAst('a'), [VarAst('b'), VarAst('c'), ]))
-        parser = Parser(TokenStream(InputStream('a')))
+        parser = self._parser('a')
         self.assertTrue(parser._maybe_call(parser._parse_atom),
                         VarAst('a'))
 
     def test_maybe_binary(self):
-        parser = Parser(TokenStream(InputStream('js "1" + 1')))
+        parser = self._parser('js "1" + 1')
         self.assertEqual(
             parser._maybe_binary(parser._parse_atom(), 0),
             BinaryAst('+', JsAst("1"), LiteralAst(1)))
-        parser = Parser(TokenStream(InputStream('a + b * c')))
+        parser = self._parser('a + b * c')
         self.assertEqual(
             parser._maybe_binary(parser._parse_atom(), 0),
             BinaryAst(
                 '+',
                 VarAst('a'),
                 BinaryAst('*', VarAst('b'), VarAst('c'))))
-        parser = Parser(TokenStream(InputStream('a + b = c')))
+        parser = self._parser('a + b = c')
         self.assertEqual(
             parser._maybe_binary(parser._parse_atom(), 0),
             AssignAst(
                 BinaryAst('+', VarAst('a'), VarAst('b')),
                 VarAst('c')))
-        parser = Parser(TokenStream(InputStream('a + b + c')))
+        parser = self._parser('a + b + c')
         self.assertEqual(
             parser._maybe_binary(parser._parse_atom(), 0),
             BinaryAst(
@@ -325,6 +330,56 @@ class TestParser(TestCase):
                 VarAst('c')))
 
     def test_unexpected(self):
-        parser = Parser(TokenStream(InputStream('a + b * c')))
+        parser = self._parser('a + b * c')
         with self.assertRaises(Exception):
             parser.unexpected()
+
+    def _recover(self, code):
+        ast, diagnostics = self._parser(code).parse_recovering()
+        return ast, [(error.message, error.line, error.col)
+                     for error in diagnostics]
+
+    def test_parse_recovering(self):
+        code = 'a = 1;\nb = (2;\nc = 3 4;\nd = 5'
+        self.assertEqual(self._recover(code), (
+            ProgAst([AssignAst(VarAst('a'), LiteralAst(1)),
+                     AssignAst(VarAst('c'), LiteralAst(3)),
+                     AssignAst(VarAst('d'), LiteralAst(5))]),
+            [('Expecting punctuation: ")"', 2, 6),
+             ('Expecting punctuation: ";"', 3, 6)]))
+        code = 'f(λ(x) 1, 2); g(1)'
+        ast, diagnostics = self._parser(code).parse_recovering()
+        self.assertEqual(ast, self._parser(code)())
+        self.assertEqual(diagnostics, [])
+
+    def test_parse_recovering_block(self):
+        ast, diagnostics = self._recover(
+            'f = λ() { x = ; g(1 2); y = 2; }; h(1)')
+        self.assertEqual(ast, ProgAst([
+            AssignAst(VarAst('f'), LambdaAst('', [], ProgAst([
+                AssignAst(VarAst('y'), LiteralAst(2))]))),
+            CallAst(VarAst('h'), [LiteralAst(1)])]))
+        self.assertEqual([col for _, _, col in diagnostics], [14, 20])
+        ast, diagnostics = self._recover('a; { b; c +')
+        self.assertEqual(ast, ProgAst([VarAst('a')]))
+        self.assertEqual(len(diagnostics), 2)
+
+    def test_parse_recovering_lexing(self):
+        self.assertEqual(self._recover('a = 1 $ 2; b; "c'), (
+            ProgAst([VarAst('b')]),
+            [("Can't handle character: $", 1, 6),
+             ('Has no enclosing double quote for string', 1, 16)]))
+
+    def test_parse_recovering_stray_brace(self):
+        ast, diagnostics = self._recover('a }; b')
+        self.assertEqual(ast, ProgAst([VarAst('a'), VarAst('b')]))
+        self.assertEqual(diagnostics,
+                         [('Expecting punctuation: ";"', 1, 2)])
+
+    def test_unknown_operator(self):
+        parser = self._parser('a ! b')
+        with self.assertRaises(ParseError):
+            parser()
+        ast, diagnostics = self._recover('a ! b; c')
+        self.assertEqual(ast, ProgAst([VarAst('c')]))
+        self.assertEqual(len(diagnostics), 1)
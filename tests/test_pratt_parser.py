@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# pylint: disable=C0111
+import os
+from random import Random
+
+from input_stream import InputStream
+from parse import Parser, PrattParser
+from tests import test_parser
+from tests.common import normalize
+from token_stream import RegexTokenStream
+
+
+def _parse(parser_class, code):
+    return parser_class(RegexTokenStream(InputStream(code)))()
+
+
+class TestPrattParser(test_parser.TestParser):
+    parser_class = PrattParser
+
+    def _assert_same_ast(self, code):
+        self.assertEqual(normalize(_parse(PrattParser, code)),
+                         normalize(_parse(Parser, code)), code)
+
+    def test_same_ast_on_samples(self):
+        root = os.path.join(os.path.dirname(__file__), os.pardir)
+        for name in sorted(os.listdir(root)):
+            if name.endswith('.lambda'):
+                with open(os.path.join(root, name)) as file:
+                    self._assert_same_ast(file.read())
+
+    def test_same_ast(self):
+        for code in ('a = b = c', 'a || b || c && d', 'a = b || c',
+                     'f(1) + g(3)(4)', '(a)(b)', '{}(1)', 'if a then b(1)(2)',
+                     'x = λ f(n) n * f(n - 1)', 'a < b == c + d % e - f',
+                     'let (a = 1) a; let g (b) g(b)', 'js "1" + 2 * 3'):
+            self._assert_same_ast(code)
+
+    def test_same_ast_random(self):
+        random = Random(7)
+        operators = list(Parser.PRECEDENCE)
+        atoms = ['a', '1', '"s"', 'f(x)', '(b || c)', 'true']
+        for _ in range(200):
+            code = random.choice(atoms)
+            for _ in range(random.randrange(8)):
+                code += f' {random.choice(operators)} {random.choice(atoms)}'
+            self._assert_same_ast(code)
+
+    def test_unknown_operator(self):
+        for parser_class in (Parser, PrattParser):
+            with self.assertRaises(Exception):
+                _parse(parser_class, 'a ! b')
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# pylint: disable=C0111
+from functools import partial
+from unittest import TestCase
+
+from environment import Environment
+from evaluator import evaluate
+from input_stream import InputStream
+from parse import Parser
+from primitive import primitive
+from quickening import RESPECIALIZATIONS, binaries, report
+from tests import test_evaluate
+from token_stream import TokenStream
+
+
+def _parse(code: str):
+    return Parser(TokenStream(InputStream(code)))()
+
+
+def _global_env() -> Environment:
+    env = Environment()
+    for name, func in primitive.items():
+        env.define(name, func)
+    return env
+
+
+class TestQuickenedEvaluate(test_evaluate.TestEvaluate):
+    evaluate = staticmethod(partial(evaluate, quicken=True))
+
+
+class TestQuickening(TestCase):
+    def test_specialize(self):
+        ast = _parse('fib = λ(n) if n < 2 then n else fib(n - 1) + fib(n - 2);'
+                     'fib(10) == 55')
+        self.assertTrue(evaluate(ast, _global_env(), quicken=True))
+        self.assertEqual(
+            [(binary.operator, binary.site.kind, binary.site.misses)
+             for binary in binaries(ast)],
+            [('<', 'float < float', 0), ('-', 'float - float', 0),
+             ('+', 'float + float', 0), ('-', 'float - float', 0),
+             ('==', 'any == any', 0)])
+        self.assertIn('(n < 2.0): float < float, 1 specializations, 0 misses',
+                      report(ast))
+
+    def test_respecialize(self):
+        ast = _parse('f = λ(a, b) a * b; f(2, 3) + f(2, one())')
+        env = _global_env()
+        env.define('one', lambda: 1)
+        self.assertEqual(evaluate(ast, env, quicken=True), 8)
+        site = binaries(ast)[0].site
+        self.assertEqual((site.kind, site.specializations, site.misses),
+                         ('float * int', 2, 1))
+
+    def test_generic(self):
+        ast = _parse('f = λ(a) a + 1; f(1)')
+        evaluate(ast, _global_env(), quicken=True)
+        site = binaries(ast)[0].site
+        for number in [2, 3.0, 4, 5.0]:
+            self.assertEqual(site.handler(number, 1.0), number + 1)
+        self.assertEqual((site.kind, site.misses),
+                         ('generic', RESPECIALIZATIONS))
+        self.assertEqual(site.handler(True, 1), 2)
+
+    def test_errors(self):
+        for code in ('f = λ(a, b) a / b; f(1, 2); f(1, 0)',
+                     'f = λ(a, b) a - b; f(1, 2); f(1, "a")',
+                     'f = λ(a, b) a < b; f(1, 2); f("a", 1)'):
+            with self.assertRaises(Exception, msg=code):
+                evaluate(_parse(code), _global_env(), quicken=True)
+
+    def test_not_quickened(self):
+        ast = _parse('1 + 2')
+        evaluate(ast, _global_env(), quicken=True)
+        self.assertEqual(evaluate(ast, _global_env()), 3)
+        self.assertIsNone(binaries(ast)[0].site)
+        self.assertEqual(report(ast), '')
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# pylint: disable=C0111
+import gc
+import tracemalloc
+from ast import LambdaAst, VarAst
+from unittest import TestCase
+
+import evaluator_callback_stack_guard
+from environment import Box, Environment, Frame
+from evaluator import evaluate
+from input_stream import InputStream
+from parse import Parser
+from resolver import SELF, resolve
+from token_stream import TokenStream
+
+CONS = '''
+cons = λ(a, b) λ(f) f(a, b);
+car = λ(cell) cell(λ(a, b) a);
+NIL = λ(f) f(NIL, NIL);
+'''
+
+
+def _parse(code: str):
+    return Parser(TokenStream(InputStream(code)))()
+
+
+def _nodes(ast, node_type):
+    found = []
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif hasattr(node, '__dataclass_fields__'):
+            if isinstance(node, node_type):
+                found.append(node)
+            stack.extend(reversed([getattr(node, field)
+                                   for field in node.__dataclass_fields__]))
+    return found
+
+
+def _slots(ast, name):
+    return [(var.slot, var.boxed) for var in _nodes(ast, VarAst)
+            if var.name == name]
+
+
+class TestResolver(TestCase):
+    def test_lambda(self):
+        ast = _parse('λ(a, b) λ(c) a + b + c + d')
+        self.assertEqual(resolve(ast), 0)
+        self.assertEqual(_slots(ast, 'a'), [(1, False)])
+        self.assertEqual(_slots(ast, 'b'), [(2, False)])
+        self.assertEqual(_slots(ast, 'c'), [(0, False)])
+        self.assertEqual(_slots(ast, 'd'), [(None, False)])
+        outer, inner = _nodes(ast, LambdaAst)
+        self.assertEqual((outer.captures, outer.frame_size), ((), 2))
+        self.assertEqual((inner.captures, inner.frame_size), ((0, 1), 3))
+        ast = _parse('λ(a, a) a')
+        resolve(ast)
+        self.assertEqual(_slots(ast, 'a'), [(1, False)])
+
+    def test_free_variables(self):
+        # the middle lambda captures a for the inner one
+        ast = _parse('λ(a, b) λ(c) λ() a')
+        resolve(ast)
+        _, middle, inner = _nodes(ast, LambdaAst)
+        self.assertEqual(middle.captures, (0,))
+        self.assertEqual(inner.captures, (1,))
+        self.assertEqual(_slots(ast, 'a'), [(0, False)])
+
+    def test_named_lambda(self):
+        code = 'λ f(n) f(n)'
+        ast = _parse(code)
+        resolve(ast)
+        self.assertEqual(_slots(ast, 'f'), [(1, False)])
+        self.assertEqual(_slots(ast, 'n'), [(0, False)])
+        self.assertEqual(_nodes(ast, LambdaAst)[0].captures, (SELF,))
+        ast = _parse(code)
+        resolve(ast, name_in_call_frame=True)
+        self.assertEqual(_slots(ast, 'f'), [(0, False)])
+        self.assertEqual(_slots(ast, 'n'), [(1, False)])
+        self.assertEqual(_nodes(ast, LambdaAst)[0].captures, ())
+
+    def test_let(self):
+        ast = _parse('let (x = x, y = x, x = x + y) λ() x')
+        self.assertEqual(resolve(ast), 3)
+        self.assertEqual(_slots(ast, 'x'), [(None, False), (0, False),
+                                            (0, False), (0, False)])
+        self.assertEqual(_slots(ast, 'y'), [(1, False)])
+        # the lambda captures the last x only
+        self.assertEqual(_nodes(ast, LambdaAst)[0].captures, (2,))
+
+    def test_boxed(self):
+        ast = _parse('λ(a, b) { λ() a = 1; λ() b; a = 2; b }')
+        resolve(ast)
+        self.assertEqual(_slots(ast, 'a'), [(0, True), (0, True)])
+        self.assertEqual(_slots(ast, 'b'), [(0, False), (1, False)])
+        self.assertEqual(_nodes(ast, LambdaAst)[0].boxed, (0,))
+
+    def test_frame(self):
+        env = Environment()
+        frame = Frame([Box(2)], env)
+        self.assertEqual(frame.values[0].value, 2)
+        var_ast = VarAst('b')
+        resolve(var_ast)
+        self.assertEqual(frame.set_global(var_ast, 4), 4)
+        self.assertEqual(env.get('b'), 4)
+        # inside a lambda, only defined globals may be assigned
+        lambda_ast = _parse('λ() c')
+        resolve(lambda_ast)
+        with self.assertRaises(Exception):
+            frame.set_global(lambda_ast.body, 6)
+
+    def test_evaluate(self):
+        code = '''
+        x = 1;
+        count = let (x = 10, f = λ() x = x + 1) { f(); f(); x };
+        make = λ(f) let (n = 0) f(λ() n = n + 1, λ() n);
+        x + count + make(λ(inc, get) { inc(); inc(); get() })
+        '''
+        self.assertEqual(evaluate(_parse(code), Environment()), 15)
+        self.assertEqual(evaluate(_parse('y = 1; y'), Environment()), 1)
+        # only top level code defines globals by assignment
+        with self.assertRaises(Exception):
+            evaluate(_parse('f = λ() y = 1; f()'), Environment())
+
+    def test_empty_let(self):
+        # a let binding nothing opens no scope: its body is top level code
+        for code, value in (('let () (f = 2); f', 2),
+                            ('let () { y = 1 }; y', 1)):
+            self.assertEqual(evaluate(_parse(code), Environment()), value)
+            results = []
+            evaluator_callback_stack_guard.execute(
+                evaluator_callback_stack_guard.evaluate,
+                (_parse(code), Environment(), results.append))
+            self.assertEqual(results, [value])
+        with self.assertRaises(Exception):
+            evaluate(_parse('f = λ() let () y = 1; f()'), Environment())
+
+    def test_named_lambda_assign(self):
+        code = 'h = λ g(x) if x == 1 then g else { g = x; h(1) }; h(5)'
+        # evaluator.py binds g once per lambda
+        self.assertEqual(evaluate(_parse(code), Environment()), 5)
+        # the stack guard evaluator binds g once per call
+        results = []
+        evaluator_callback_stack_guard.execute(
+            evaluator_callback_stack_guard.evaluate,
+            (_parse(code), Environment(), results.append))
+        self.assertTrue(callable(results[0]))
+
+    def test_retained(self):
+        env = Environment()
+        evaluate(_parse(CONS + 'keep = λ(list, n) λ() n'), env)
+        cons, car = env.get('cons'), env.get('car')
+        gc.collect()
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            head = env.get('NIL')
+            for i in range(50000):
+                head = cons(i, head)
+            built = tracemalloc.get_traced_memory()[0] - baseline
+            self.assertEqual(car(head), 49999)
+            callback = env.get('keep')(head, 3)
+            head = None
+            gc.collect()
+            retained = tracemalloc.get_traced_memory()[0] - baseline
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(callback(), 3)
+        # the callback keeps n but not the list
+        self.assertLess(retained * 100, built)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# pylint: disable=C0111
+import os
+
+from ast import BinaryAst, CallAst, IfAst, LambdaAst, LetAst, LiteralAst, \
+    ProgAst, VarAst
+from input_stream import InputStream
+from parse import Parser, StackParser
+from tests import test_parser
+from tests.common import normalize
+from token_stream import RegexTokenStream
+
+DEPTH = 100000
+
+
+def _parse(parser_class, code):
+    return parser_class(RegexTokenStream(InputStream(code)))()
+
+
+class TestStackParser(test_parser.TestParser):
+    parser_class = StackParser
+
+    def _assert_same_ast(self, code):
+        self.assertEqual(normalize(_parse(StackParser, code)),
+                         normalize(_parse(Parser, code)), code)
+
+    def _assert_depth(self, ast, child, leaf):
+        """
+        walk down ast through child without recursion, as comparing or
+        printing asts this deep would exceed the recursion limit
+        """
+        for _ in range(DEPTH):
+            ast = child(ast)
+        self.assertEqual(ast, leaf)
+
+    def test_same_ast_on_samples(self):
+        root = os.path.join(os.path.dirname(__file__), os.pardir)
+        for name in sorted(os.listdir(root)):
+            if name.endswith('.lambda'):
+                with open(os.path.join(root, name)) as file:
+                    self._assert_same_ast(file.read())
+
+    def test_same_ast(self):
+        for code in ('a = b = c', 'a || b || c && d', 'a = b || c',
+                     'f(1) + g(3)(4)', '(a)(b)', '{}(1)', 'if a then b(1)(2)',
+                     'x = λ f(n) n * f(n - 1)', 'a < b == c + d % e - f',
+                     'a * b + c * d = e - f / g % h', 'a + (b = c) * d',
+                     'let (a = 1) a; let g (b, c = 2) g(b)', 'js "1" + 2 * 3',
+                     'if a || b then { c; d } else e && f'):
+            self._assert_same_ast(code)
+
+    def test_errors(self):
+        for code in ('a ! b', '1 +', '(1', '{1 2}', 'if 1 2', 'f(1', ')'):
+            with self.assertRaises(Exception):
+                _parse(StackParser, code)
+
+    def test_long_binary(self):
+        code = ' + '.join(['1'] * (DEPTH + 1))
+        with self.assertRaises(RecursionError):
+            _parse(Parser, code)
+        self._assert_depth(_parse(StackParser, code).prog[0],
+                           lambda ast: ast.left, LiteralAst(1))
+
+    def test_long_assign(self):
+        code = ' = '.join(['a'] * (DEPTH + 1))
+        self._assert_depth(_parse(StackParser, code).prog[0],
+                           lambda ast: ast.left, VarAst('a'))
+
+    def test_nested_parentheses(self):
+        code = '(' * DEPTH + '1 - 2' + ')' * DEPTH
+        self.assertEqual(
+            _parse(StackParser, code).prog[0],
+            BinaryAst('-', LiteralAst(1), LiteralAst(2)))
+
+    def test_nested_right_operands(self):
+        code = '1 * (' * DEPTH + '2' + ')' * DEPTH
+        self._assert_depth(_parse(StackParser, code).prog[0],
+                           lambda ast: ast.right, LiteralAst(2))
+
+    def test_nested_if(self):
+        code = 'if a then ' * DEPTH + 'b'
+        ast = _parse(StackParser, code).prog[0]
+        self.assertIsInstance(ast, IfAst)
+        self._assert_depth(ast, lambda ast: ast.then, VarAst('b'))
+
+    def test_nested_lambda(self):
+        code = 'λ(x) ' * DEPTH + 'x'
+        ast = _parse(StackParser, code).prog[0]
+        self.assertIsInstance(ast, LambdaAst)
+        self._assert_depth(ast, lambda ast: ast.body, VarAst('x'))
+
+    def test_nested_let(self):
+        code = 'let (x = 1) ' * DEPTH + 'x'
+        ast = _parse(StackParser, code).prog[0]
+        self.assertIsInstance(ast, LetAst)
+        self._assert_depth(ast, lambda ast: ast.body, VarAst('x'))
+
+    def test_nested_prog(self):
+        code = '{' * DEPTH + '1' + '}' * DEPTH
+        self._assert_depth(_parse(StackParser, code).prog[0],
+                           lambda ast: ast.prog[0], LiteralAst(1))
+
+    def test_nested_call(self):
+        code = 'f(' * DEPTH + 'x' + ')' * DEPTH
+        ast = _parse(StackParser, code).prog[0]
+        self.assertIsInstance(ast, CallAst)
+        self._assert_depth(ast, lambda ast: ast.args[0], VarAst('x'))
+
+    def test_nested_or(self):
+        code = 'a || (' * DEPTH + 'b' + ')' * DEPTH
+        ast = _parse(StackParser, code)
+        self.assertIsInstance(ast, ProgAst)
+        self._assert_depth(ast.prog[0], lambda ast: ast.func.body.else_,
+                           VarAst('b'))
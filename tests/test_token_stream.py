@@ -2,10 +2,36 @@
 # encoding: utf-8
 # pylint: disable=W0212
 # pylint: disable=C0111
+import os
+from io import StringIO
 from unittest import TestCase
 
-from input_stream import InputStream
-from token_stream import Token, TokenStream
+import utils
+from input_stream import ChunkedInputStream, InputStream
+from parse import Parser
+from token_stream import KEYWORD_TOKENS, NULL_TOKEN, NUM, OPERATOR_TOKENS, \
+    PUNCTUATION_TOKENS, RegexTokenStream, Token, TokenStream
+
+
+class TestToken(TestCase):
+    def test_kind(self):
+        token = Token('num', 1.0)
+        self.assertEqual(token.kind, NUM)
+        self.assertEqual(token.type, 'num')
+        self.assertEqual(token, Token(NUM, 1.0))
+        self.assertNotEqual(token, Token('str', 1.0))
+        self.assertEqual(hash(token), hash(Token(NUM, 1.0)))
+        self.assertEqual(repr(token), "Token(type='num', value=1.0)")
+
+    def test_singletons(self):
+        for token_stream_class in (TokenStream, RegexTokenStream):
+            token_stream = token_stream_class(InputStream('if ( >= ; λ'))
+            self.assertIs(token_stream.next(), KEYWORD_TOKENS['if'])
+            self.assertIs(token_stream.next(), PUNCTUATION_TOKENS['('])
+            self.assertIs(token_stream.next(), OPERATOR_TOKENS['>='])
+            self.assertIs(token_stream.next(), PUNCTUATION_TOKENS[';'])
+            self.assertIs(token_stream.next(), KEYWORD_TOKENS['λ'])
+            self.assertIs(token_stream.next(), NULL_TOKEN)
 
 
 class TestTokenStream(TestCase):
@@ -143,3 +169,136 @@ class TestTokenStream(TestCase):
         token_stream = TokenStream(InputStream(' # comment\n'))
         with self.assertRaises(Exception):
             token_stream.croak('foo')
+
+
+class TestRegexTokenStream(TestCase):
+    @staticmethod
+    def _tokens(token_stream):
+        tokens = []
+        while not token_stream.eof():
+            tokens.append(token_stream.next())
+        return tokens
+
+    def _assert_same_tokens(self, code):
+        self.assertEqual(
+            self._tokens(RegexTokenStream(InputStream(code))),
+            self._tokens(TokenStream(InputStream(code))))
+
+    def test_read_next(self):
+        token_stream = RegexTokenStream(
+            InputStream(' # comment\n123 abc "nba" let a=2  >= js;'))
+        self.assertEqual(token_stream._read_next(), Token('num', 123.0))
+        self.assertEqual(token_stream._read_next(), Token('var', 'abc'))
+        self.assertEqual(token_stream._read_next(), Token('str', 'nba'))
+        self.assertEqual(token_stream._read_next(), Token('kw', 'let'))
+        self.assertEqual(token_stream._read_next(), Token('var', 'a=2'))
+        self.assertEqual(token_stream._read_next(), Token('op', '>='))
+        self.assertEqual(token_stream._read_next(), Token('kw', 'js'))
+        self.assertEqual(token_stream._read_next(), Token('punc', ';'))
+        self.assertEqual(token_stream._read_next(), Token('null', 'null'))
+        token_stream = RegexTokenStream(InputStream('\x08'))
+        with self.assertRaises(Exception):
+            token_stream._read_next()
+        token_stream = RegexTokenStream(InputStream('"abc'))
+        with self.assertRaises(Exception):
+            token_stream._read_next()
+
+    def test_same_tokens(self):
+        self._assert_same_tokens('')
+        self._assert_same_tokens('# only comment')
+        self._assert_same_tokens('λ (n) 1; λn')
+        self._assert_same_tokens('"ab\\c" "a\\"b" "a\\\\" "multi\nline"')
+        self._assert_same_tokens('12 1.5 3. x1-y? a<=b c <= d')
+        self._assert_same_tokens('a+-b!==c||d&&e;[1,2]{}')
+
+    def test_same_tokens_on_samples(self):
+        root = os.path.join(os.path.dirname(__file__), os.pardir)
+        for name in sorted(os.listdir(root)):
+            if name.endswith('.lambda'):
+                with open(os.path.join(root, name)) as file:
+                    self._assert_same_tokens(file.read())
+
+    def test_croak_position(self):
+        token_stream = RegexTokenStream(InputStream('a\n  bc $'))
+        token_stream.next()
+        token_stream.next()
+        with self.assertRaisesRegex(Exception, r'\(2:5\)'):
+            token_stream.next()
+
+    def test_resume_after_error(self):
+        for token_stream_class in (TokenStream, RegexTokenStream):
+            token_stream = token_stream_class(InputStream('a $$ b'))
+            self.assertEqual(token_stream.next(), Token('var', 'a'))
+            for col in (2, 3):
+                with self.assertRaisesRegex(Exception, rf'\(1:{col}\)'):
+                    token_stream.next()
+            self.assertEqual(token_stream.next(), Token('var', 'b'))
+            self.assertTrue(token_stream.eof())
+
+
+class TestTokenBuffer(TestCase):
+    CODE = '# comment\nfoo = λ(x) "a\\"b" + x;\nfoo(1.5)'
+
+    def test_tokenize_all(self):
+        expected = TestRegexTokenStream._tokens(
+            TokenStream(InputStream(self.CODE)))
+        for token_stream_class in (TokenStream, RegexTokenStream):
+            for input_stream in (InputStream(self.CODE),
+                                 ChunkedInputStream(StringIO(self.CODE), 3)):
+                buffer = token_stream_class(input_stream).tokenize_all()
+                self.assertEqual(
+                    [buffer.token(i) for i in range(len(buffer))], expected)
+                self.assertEqual(
+                    [self.CODE[start:end] for start, end
+                     in zip(buffer.starts, buffer.ends)],
+                    ['foo', '=', 'λ', '(', 'x', ')', '"a\\"b"', '+', 'x',
+                     ';', 'foo', '(', '1.5', ')'])
+
+    def test_tokenize_all_after_peek(self):
+        token_stream = RegexTokenStream(InputStream('a b'))
+        token_stream.peek()
+        buffer = token_stream.tokenize_all()
+        self.assertEqual(list(buffer.starts), [0, 2])
+        self.assertEqual(buffer.values, ['a', 'b'])
+
+    def test_lazy_string(self):
+        buffer = RegexTokenStream(InputStream('"a\\"b" "cd"')).tokenize_all()
+        self.assertEqual(buffer.values, [None, None])
+        self.assertEqual(buffer.value(0), 'a"b')
+        self.assertEqual(buffer.value(1), 'cd')
+
+    def test_cursor(self):
+        buffer = RegexTokenStream(InputStream(self.CODE)).tokenize_all()
+        self.assertEqual(buffer.peek(), Token('var', 'foo'))
+        self.assertIs(buffer.peek(2), KEYWORD_TOKENS['λ'])
+        self.assertIs(buffer.peek(100), NULL_TOKEN)
+        self.assertEqual(buffer.next(), Token('var', 'foo'))
+        self.assertIs(buffer.next(), OPERATOR_TOKENS['='])
+        buffer.seek(len(buffer) - 1)
+        self.assertIs(buffer.next(), PUNCTUATION_TOKENS[')'])
+        self.assertTrue(buffer.eof())
+        self.assertIs(buffer.next(), NULL_TOKEN)
+        buffer.seek(0)
+        self.assertFalse(buffer.eof())
+
+    def test_croak(self):
+        buffer = RegexTokenStream(InputStream(self.CODE)).tokenize_all()
+        buffer.seek(3)
+        with self.assertRaisesRegex(Exception, r'^foo \(2:7\)$'):
+            buffer.croak('foo')
+        with self.assertRaises(Exception):
+            RegexTokenStream(InputStream('a $')).tokenize_all()
+
+    def test_parse(self):
+        root = os.path.join(os.path.dirname(__file__), os.pardir)
+        for name in sorted(os.listdir(root)):
+            if name.endswith('.lambda'):
+                with open(os.path.join(root, name)) as file:
+                    code = file.read()
+                utils._GENSYM = 0
+                expected = Parser(TokenStream(InputStream(code)))()
+                buffer = RegexTokenStream(InputStream(code)).tokenize_all()
+                for _ in range(2):
+                    utils._GENSYM = 0
+                    buffer.seek(0)
+                    self.assertEqual(Parser(buffer)(), expected)
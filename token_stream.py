@@ -3,21 +3,77 @@
 """
 parse input stream into token stream
 """
+import re
 import string
-from collections import namedtuple
-from typing import Callable, List
+import sys
+from array import array
+from typing import Any, Callable, Dict, Iterator, List, Match, Tuple, Union
 
 from input_stream import InputStream
+from utils import bisect_shifted, shift_slice
 
-Token = namedtuple('Token', 'type value')
-NULL_TOKEN = Token('null', 'null')
+# token kinds
+NULL, NUM, STR, KW, VAR, PUNC, OP = range(7)
+KIND_NAMES = ('null', 'num', 'str', 'kw', 'var', 'punc', 'op')
+_KIND_CODES = {name: kind for kind, name in enumerate(KIND_NAMES)}
+
+
+class Token:
+    """
+    token with a small-int kind.
+    Punctuation, keyword and operator tokens produced by token streams are
+    preallocated singletons, so they can be compared by identity.
+    """
+    __slots__ = ('kind', 'value')
+
+    def __init__(self, kind: Union[int, str], value: Any):
+        # kind may also be given by name, e.g. Token('num', 1.0)
+        self.kind: int = _KIND_CODES[kind] if isinstance(kind, str) else kind
+        self.value: Any = value
+
+    @property
+    def type(self) -> str:
+        """
+        name of token kind
+        """
+        return KIND_NAMES[self.kind]
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Token):
+            return self.kind == other.kind and self.value == other.value
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((self.kind, self.value))
+
+    def __repr__(self) -> str:
+        return f"Token(type={self.type!r}, value={self.value!r})"
+
+
+NULL_TOKEN = Token(NULL, 'null')
+PUNCTUATION_TOKENS: Dict[str, Token] = {
+    char: Token(PUNC, char) for char in ",;(){}[]"}
+KEYWORD_TOKENS: Dict[str, Token] = {
+    word: Token(KW, word)
+    for word in "if then let else lambda λ true false js".split()}
+OPERATOR_TOKENS: Dict[str, Token] = {
+    operator: Token(OP, operator)
+    for operator in "= || && < > <= >= == != + - * / %".split()}
+
+
+def operator_token(operator: str) -> Token:
+    """
+    the singleton token of a known operator, or a new token otherwise
+    """
+    token = OPERATOR_TOKENS.get(operator)
+    return Token(OP, operator) if token is None else token
 
 
 class TokenStream:
     """
     token stream
     """
-    KEYWORDS = set("if then let else lambda λ true false js".split())
+    KEYWORDS = set(KEYWORD_TOKENS)
     IDENTIFIER_START = set(string.ascii_letters + 'λ_')
     IDENTIFIER = set(string.ascii_letters + string.digits + 'λ_?!-<>=')
     OPERATOR = set("+-*/%=&|<>!")
@@ -28,6 +84,8 @@ class TokenStream:
     def __init__(self, input_stream: InputStream):
         self._input_stream: InputStream = input_stream
         self.current: Token = NULL_TOKEN
+        # start offset of the last token read
+        self._start: int = 0
 
     # pylint: disable=C0111
     @classmethod
@@ -96,15 +154,14 @@ class TokenStream:
 
         has_dot = False
         number = self._read_while(predicate)
-        return Token("num", float(number))
+        return Token(NUM, float(number))
 
     def _read_identifier(self) -> Token:
         id_ = self._read_while(self.is_identifier)
-        return Token(
-            # identifier is either language keyword or variable
-            'kw' if self.is_keyword(id_) else "var",
-            id_,
-        )
+        # identifier is either language keyword or variable
+        if self.is_keyword(id_):
+            return KEYWORD_TOKENS[id_]
+        return Token(VAR, id_)
 
     def _read_string(self) -> Token:
         self._input_stream.next()
@@ -118,10 +175,7 @@ class TokenStream:
             elif char == '\\':
                 escaped = True
             elif char == '"':
-                return Token(
-                    'str',
-                    ''.join(buffer)
-                )
+                return Token(STR, ''.join(buffer))
             else:
                 buffer.append(char)
         self._input_stream.croak("Has no enclosing double quote for string")
@@ -145,6 +199,7 @@ class TokenStream:
         if char == '#':
             self._skip_comment()
             return self._read_next()
+        self._start = self._input_stream.offset
         if char == '"':
             return self._read_string()
         if self.is_digit(char):
@@ -152,22 +207,19 @@ class TokenStream:
         if self.is_identifier_start(char):
             return self._read_identifier()
         if self.is_punctuation(char):
-            return Token(
-                'punc',
-                self._input_stream.next()
-            )
+            return PUNCTUATION_TOKENS[self._input_stream.next()]
         if self.is_operator(char):
-            return Token(
-                'op',
-                self._read_while(self.is_operator)
-            )
-        self._input_stream.croak(f"Can't handle character: {char}")
+            return operator_token(self._read_while(self.is_operator))
+        # skip the character, so that lexing can resume after the error
+        self._input_stream.next()
+        self._input_stream.croak(f"Can't handle character: {char}",
+                                 self._start)
 
     def peek(self) -> Token:
         """
         peek next token
         """
-        if self.current.type == 'null':
+        if self.current is NULL_TOKEN:
             self.current = self._read_next()
         return self.current
 
@@ -176,7 +228,7 @@ class TokenStream:
         read next token
         """
         current, self.current = self.current, NULL_TOKEN
-        if current.type == 'null':
+        if current is NULL_TOKEN:
             return self._read_next()
         return current
 
@@ -184,11 +236,315 @@ class TokenStream:
         """
         end of token stream
         """
-        return self.peek().type == 'null'
+        return self.peek() is NULL_TOKEN
+
+    def scan(self) -> Iterator[Tuple[int, Any, int, int]]:
+        """
+        lex the rest of the input stream
+        :return: iterator of (kind, value, start, end) of each token,
+        where source[start:end] is the text of the token
+        """
+        input_stream = self._input_stream
+        token = self.next()
+        while token is not NULL_TOKEN:
+            yield token.kind, token.value, self._start, input_stream.offset
+            token = self._read_next()
+
+    def tokenize_all(self) -> 'TokenBuffer':
+        """
+        lex the rest of the input stream into a TokenBuffer
+        """
+        buffer = TokenBuffer(self._input_stream)
+        append = buffer.append
+        for kind, value, start, end in self.scan():
+            append(kind, value, start, end)
+        return buffer
 
     def croak(self, msg: str):
         """
         raise exception with error msg and error location
-        whenever encountered error.
+        whenever encountered error. The location is the start of the peeked
+        token if any.
+        """
+        # None for the current offset of the input stream
+        offset = None if self.current is NULL_TOKEN else self._start
+        self._input_stream.croak(msg, offset)
+
+
+class RegexTokenStream(TokenStream):
+    """
+    token stream that recognizes each token with a single compiled master
+    regex, walking the source in one pass instead of character by character.
+    It yields the same tokens as TokenStream, so it is a drop-in for
+    Parser(TokenStream(...)).
+    """
+    TOKEN = re.compile(r'''
+        (?:[ \t\n]+|\#[^\n]*\n?)*
+        (?:
+            (?P<punc>[,;(){}\[\]])
+          | (?P<id>[A-Za-zλ_][A-Za-z0-9λ_?!<>=-]*)
+          | (?P<op>[-+*/%=&|<>!]+)
+          | (?P<num>[0-9]+(?:\.[0-9]*)?)
+          | (?P<str>"(?:[^"\\]|\\.?)*(?P<close>")?)
+        )?
+    ''', re.VERBOSE | re.DOTALL)
+    ESCAPE = re.compile(r'\\(.)', re.DOTALL)
+
+    def _read_next(self) -> Token:
+        """
+        read next token
+        :return:
+        """
+        match = self._input_stream.match(self.TOKEN)
+        group = match.lastgroup
+        if group is not None:
+            self._start = self._input_stream.offset - (
+                match.end() - match.start(group))
+        return self._make_token(match)
+
+    def _make_token(self, match: Match[str]) -> Token:
+        """
+        make token from a match of master regex
+        """
+        kind = match.lastgroup
+        if kind == 'punc':
+            return PUNCTUATION_TOKENS[match.group(kind)]
+        if kind == 'id':
+            id_ = match.group(kind)
+            token = KEYWORD_TOKENS.get(id_)
+            return Token(VAR, id_) if token is None else token
+        if kind == 'op':
+            return operator_token(match.group(kind))
+        if kind == 'num':
+            return Token(NUM, float(match.group(kind)))
+        if kind == 'str':
+            # an unterminated string runs to the end of input
+            if match.group('close') is None:
+                self._input_stream.croak(
+                    "Has no enclosing double quote for string")
+            return Token(STR, self.ESCAPE.sub(r'\1', match.group(kind)[1:-1]))
+        if self._input_stream.eof():
+            return NULL_TOKEN
+        # skip the character, so that lexing can resume after the error
+        offset = self._input_stream.offset
+        char = self._input_stream.next()
+        self._input_stream.croak(f"Can't handle character: {char}", offset)
+
+    def scan(self) -> Iterator[Tuple[int, Any, int, int]]:
+        """
+        When the whole source is in memory, string literals are yielded with
+        None as value instead of being unescaped here; TokenBuffer slices
+        them from the source on access.
+        """
+        input_stream = self._input_stream
+        if self.current is not NULL_TOKEN:
+            token = self.next()
+            yield token.kind, token.value, self._start, input_stream.offset
+        lazy = input_stream.source is not None
+        while True:
+            match = input_stream.match(self.TOKEN)
+            group = match.lastgroup
+            if group is None:
+                # either end of input, or croak on a bad character
+                self._make_token(match)
+                return
+            end = input_stream.offset
+            start = end - (match.end() - match.start(group))
+            if lazy and group == 'str' and match.group('close') is not None:
+                yield STR, None, start, end
+            else:
+                token = self._make_token(match)
+                yield token.kind, token.value, start, end
+
+
+class TokenBuffer:
+    """
+    The whole token stream lexed up front into parallel arrays: kind codes,
+    start and end offsets in the source, and values. Variable names are
+    interned. A string literal may have None as value, in which case it is
+    sliced from the source and unescaped only when accessed.
+
+    TokenBuffer also serves as the token stream of Parser. Its cursor
+    `index` can look ahead arbitrarily with peek(ahead) and can be moved
+    with seek(), so one buffer can be reused across parse attempts.
+
+    splice replaces tokens in place, and shifts the offsets of the tokens
+    after them lazily: the starts and ends of the tokens from an index on
+    may be short of their offsets by a shift, so that offsets are read
+    with start(), end() and the bisect methods.
+    """
+
+    def __init__(self, input_stream: InputStream):
+        self.kinds = array('b')
+        self.starts = array('l')
+        self.ends = array('l')
+        self.values: List[Any] = []
+        self.index: int = 0
+        self._input_stream: InputStream = input_stream
+        self._cached_index: int = -1
+        self._cached_token: Token = NULL_TOKEN
+        # the starts and ends of the tokens from _shifted_from on are
+        # _shift short of their offsets
+        self._shifted_from: int = 0
+        self._shift: int = 0
+
+    def append(self, kind: int, value: Any, start: int, end: int) -> None:
+        """
+        append a token spanning source[start:end]
+        """
+        if kind == VAR:
+            value = sys.intern(value)
+        self.kinds.append(kind)
+        self.values.append(value)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def start(self, index: int) -> int:
+        """
+        start offset of the token at index
+        """
+        if index >= self._shifted_from:
+            return self.starts[index] + self._shift
+        return self.starts[index]
+
+    def end(self, index: int) -> int:
+        """
+        end offset of the token at index
+        """
+        if index >= self._shifted_from:
+            return self.ends[index] + self._shift
+        return self.ends[index]
+
+    def bisect_start(self, offset: int, lo: int = 0) -> int:
+        """
+        index of the first token from lo on starting at or after offset
+        """
+        return bisect_shifted(self.starts, offset, self._shifted_from,
+                              self._shift, lo)
+
+    def bisect_end(self, offset: int) -> int:
+        """
+        index of the first token ending at or after offset
+        """
+        return bisect_shifted(self.ends, offset, self._shifted_from,
+                              self._shift)
+
+    def splice(self, first: int, stop: int, tokens: 'TokenBuffer',
+               delta: int) -> 'TokenBuffer':
+        """
+        Replace the tokens from first to stop with tokens, lexed from the
+        source of tokens, which becomes the source of self, and shift the
+        offsets of the tokens after them by delta. Only the offsets between
+        first and the tokens already shifted lazily are rewritten.
+        :return: the tokens replaced, to splice them back
+        """
+        self._shift_from(first)
+        replaced = TokenBuffer(self._input_stream)
+        replaced.kinds = self.kinds[first:stop]
+        replaced.values = self.values[first:stop]
+        replaced.starts = self.starts[first:stop]
+        replaced.ends = self.ends[first:stop]
+        shift_slice(replaced.starts, 0, stop - first, self._shift)
+        shift_slice(replaced.ends, 0, stop - first, self._shift)
+        self.kinds[first:stop] = tokens.kinds
+        self.values[first:stop] = tokens.values
+        self.starts[first:stop] = tokens.starts
+        self.ends[first:stop] = tokens.ends
+        # the offsets of tokens are not shifted, those after them are
+        # shifted by delta more
+        self._shifted_from = first + len(tokens)
+        self._shift += delta
+        self._input_stream = tokens._input_stream
+        self._cached_index = -1
+        return replaced
+
+    def _shift_from(self, index: int) -> None:
+        """
+        make the tokens shifted lazily those from index on
+        """
+        low, high = self._shifted_from, index
+        delta = self._shift
+        if low > high:
+            low, high, delta = high, low, -delta
+        shift_slice(self.starts, low, high, delta)
+        shift_slice(self.ends, low, high, delta)
+        self._shifted_from = index
+
+    def value(self, index: int) -> Any:
+        """
+        value of the token at index
+        """
+        value = self.values[index]
+        if value is None:
+            value = self._input_stream.source[
+                self.start(index) + 1:self.end(index) - 1]
+            if '\\' in value:
+                value = RegexTokenStream.ESCAPE.sub(r'\1', value)
+        return value
+
+    def token(self, index: int) -> Token:
+        """
+        token at index. Punctuation, keyword and operator tokens are the
+        usual singletons.
+        """
+        if index == self._cached_index:
+            return self._cached_token
+        kind = self.kinds[index]
+        if kind == PUNC:
+            token = PUNCTUATION_TOKENS[self.values[index]]
+        elif kind == KW:
+            token = KEYWORD_TOKENS[self.values[index]]
+        elif kind == OP:
+            token = operator_token(self.values[index])
+        else:
+            token = Token(kind, self.value(index))
+        self._cached_index = index
+        self._cached_token = token
+        return token
+
+    def peek(self, ahead: int = 0) -> Token:
+        """
+        token ahead of the cursor, NULL_TOKEN past the end
+        """
+        index = self.index + ahead
+        if index == self._cached_index:
+            return self._cached_token
+        if index < len(self.kinds):
+            return self.token(index)
+        return NULL_TOKEN
+
+    def next(self) -> Token:
+        """
+        token under the cursor, advancing the cursor
+        """
+        index = self.index
+        if index < len(self.kinds):
+            self.index = index + 1
+            return self.token(index)
+        return NULL_TOKEN
+
+    def eof(self) -> bool:
+        """
+        whether the cursor is past the last token
+        """
+        return self.index >= len(self.kinds)
+
+    def seek(self, index: int) -> None:
+        """
+        move the cursor to token index
+        """
+        self.index = index
+
+    def croak(self, msg: str):
+        """
+        raise exception with error msg and the location of the token
+        under the cursor.
         """
-        self._input_stream.croak(msg)
+        if self.index < len(self.kinds):
+            offset = self.start(self.index)
+        else:
+            offset = self._input_stream.offset
+        self._input_stream.croak(msg, offset)
@@ -3,11 +3,40 @@
 """
 helper function
 """
-from typing import Any, Dict, Callable
+from array import array
+from bisect import bisect_left
+from operator import add, eq, ge, gt, le, lt, mod, mul, ne, sub, truediv
+from typing import Any, Callable, Dict, Optional, Sequence
 
 from ast import (AssignAst, Ast, BinaryAst, CallAst, IfAst, LambdaAst, LetAst,
                  LiteralAst, ProgAst, VarAst)
 
+Operation = Callable[[Any, Any], Any]
+
+NUMBER = (int, float)
+# operators applying to numbers, and those also requiring a divisor other
+# than zero
+NUMERIC_OPERATORS: Dict[str, Operation] = {
+    '+': add,
+    '-': sub,
+    '*': mul,
+    '<': lt,
+    '>': gt,
+    '<=': le,
+    '>=': ge,
+}
+DIVISION_OPERATORS: Dict[str, Operation] = {
+    '/': truediv,
+    '%': mod,
+}
+# operators applying to values of any type
+ANY_OPERATORS: Dict[str, Operation] = {
+    '==': eq,
+    '!=': ne,
+    '&&': lambda left, right: False if left is False else right,
+    '||': lambda left, right: right if left is False else left,
+}
+
 
 def apply_op(operator: str, left_operand: Any, right_operand: Any) -> Any:
     """
@@ -22,35 +51,105 @@ def apply_op(operator: str, left_operand: Any, right_operand: Any) -> Any:
     :param right_operand:
     :return:
     """
+    function = _OPERATORS.get(operator)
+    if function is None:
+        raise Exception(f"Can't apply operator {operator}")
+    return function(left_operand, right_operand)
 
-    def num(operand):
-        if isinstance(operand, (int, float)):
-            return operand
-        raise Exception(f"Expected int or float but got {operand}")
 
-    def div(operand):
-        if num(operand) == 0:
-            raise Exception("Divide by zero")
+def num(operand: Any) -> Any:
+    """
+    operand, if it is a number an operator may apply to
+    :param operand:
+    :return:
+    """
+    if isinstance(operand, NUMBER):
         return operand
+    raise Exception(f"Expected int or float but got {operand}")
+
+
+def _div(operand: Any) -> Any:
+    if num(operand) == 0:
+        raise Exception("Divide by zero")
+    return operand
+
+
+def _numeric(function: Operation) -> Operation:
+    return lambda left, right: function(num(left), num(right))
+
+
+def _division(function: Operation) -> Operation:
+    return lambda left, right: function(num(left), _div(right))
+
+
+# built once rather than on each apply_op
+_OPERATORS: Dict[str, Operation] = {
+    **{operator: _numeric(function)
+       for operator, function in NUMERIC_OPERATORS.items()},
+    **{operator: _division(function)
+       for operator, function in DIVISION_OPERATORS.items()},
+    **ANY_OPERATORS,
+}
+
+
+def bisect_shifted(values: Sequence[int], value: int, split: int,
+                   shift: int, lo: int = 0) -> int:
+    """
+    bisect_left of value in sorted values shifted lazily: those from index
+    split on are shift short of what they stand for
+    :param values:
+    :param value:
+    :param split:
+    :param shift:
+    :param lo:
+    :return:
+    """
+    if lo < split:
+        index = bisect_left(values, value, lo, split)
+        if index < split:
+            return index
+        lo = split
+    return bisect_left(values, value - shift, lo)
+
+
+def shift_slice(values: array, low: int, high: int, delta: int) -> None:
+    """
+    add delta to values[low:high]
+    """
+    if delta and low < high:
+        values[low:high] = array(values.typecode,
+                                 map(delta.__add__, values[low:high]))
+
 
-    mapping: Dict[str, Callable[[Any, Any], Any]] = {
-        '+': lambda left, right: num(left) + num(right),
-        '-': lambda left, right: num(left) - num(right),
-        '*': lambda left, right: num(left) * num(right),
-        '/': lambda left, right: num(left) / div(right),
-        '%': lambda left, right: num(left) % div(right),
-        '&&': lambda left, right: False if left is False else right,
-        '||': lambda left, right: right if left is False else left,
-        '<': lambda left, right: num(left) < num(right),
-        '>': lambda left, right: num(left) > num(right),
-        '<=': lambda left, right: num(left) <= num(right),
-        '>=': lambda left, right: num(left) >= num(right),
-        '==': lambda left, right: left == right,
-        '!=': lambda left, right: left != right,
-    }
-    if operator in mapping:
-        return mapping[operator](left_operand, right_operand)
-    raise Exception(f"Can't apply operator {operator}")
+class Dispatcher(dict):
+    """
+    Functions of an ast walker keyed by ast type, so that a walker finds the
+    function for a node with one dict lookup on type(node) rather than a
+    chain of isinstance tests. A type without a function of its own gets
+    the function of its nearest base class, else default, and keeps it.
+    """
+
+    def __init__(self, functions: Dict[type, Callable],
+                 default: Optional[Callable] = None):
+        """
+        :param functions: function of each ast type
+        :param default: function for types without one, e.g. to raise an
+        exception
+        """
+        super().__init__(functions)
+        self.default = default
+
+    def __missing__(self, ast_type: type) -> Callable:
+        for base in ast_type.__mro__[1:]:
+            if base in self:
+                function = self[base]
+                break
+        else:
+            if self.default is None:
+                raise KeyError(ast_type)
+            function = self.default
+        self[ast_type] = function
+        return function
 
 
 def has_side_effect(ast: Ast) -> bool:
@@ -59,21 +158,38 @@ def has_side_effect(ast: Ast) -> bool:
     other than last expression has no side effect, we can omit it at compile
     time.
     """
-    if isinstance(ast, (LiteralAst, VarAst, LambdaAst)):
-        return False
-    if isinstance(ast, (CallAst, AssignAst)):
-        return True
-    if isinstance(ast, BinaryAst):
-        return has_side_effect(ast.left) or has_side_effect(ast.right)
-    if isinstance(ast, IfAst):
-        return has_side_effect(ast.cond) or has_side_effect(ast.then) \
-               or has_side_effect(ast.else_)
-    if isinstance(ast, LetAst):
-        return any(has_side_effect(vardef.define) if vardef.define else False for vardef in
-                   ast.vardefs) or has_side_effect(ast.body)
-    if isinstance(ast, ProgAst):
-        return any(has_side_effect(prog) for prog in ast.prog)
-    return True
+    return _HAS_SIDE_EFFECT[type(ast)](ast)
+
+
+def _binary_has_side_effect(ast: BinaryAst) -> bool:
+    return has_side_effect(ast.left) or has_side_effect(ast.right)
+
+
+def _if_has_side_effect(ast: IfAst) -> bool:
+    return has_side_effect(ast.cond) or has_side_effect(ast.then) \
+           or has_side_effect(ast.else_)
+
+
+def _let_has_side_effect(ast: LetAst) -> bool:
+    return any(has_side_effect(vardef.define) if vardef.define else False for vardef in
+               ast.vardefs) or has_side_effect(ast.body)
+
+
+def _prog_has_side_effect(ast: ProgAst) -> bool:
+    return any(has_side_effect(prog) for prog in ast.prog)
+
+
+_HAS_SIDE_EFFECT = Dispatcher({
+    LiteralAst: lambda ast: False,
+    VarAst: lambda ast: False,
+    LambdaAst: lambda ast: False,
+    CallAst: lambda ast: True,
+    AssignAst: lambda ast: True,
+    BinaryAst: _binary_has_side_effect,
+    IfAst: _if_has_side_effect,
+    LetAst: _let_has_side_effect,
+    ProgAst: _prog_has_side_effect,
+}, default=lambda ast: True)
 
 
 _GENSYM = 0
@@ -88,3 +204,19 @@ def gensym(name):
         name = ""
     _GENSYM += 1
     return f"β_{name}{_GENSYM}"
+
+
+def gensym_counter() -> int:
+    """
+    the global counter used by gensym
+    """
+    return _GENSYM
+
+
+def set_gensym_counter(counter: int) -> None:
+    """
+    Set the global counter used by gensym, e.g. so that names generated in
+    different processes do not clash.
+    """
+    global _GENSYM
+    _GENSYM = counter